@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# модели tracker доступны только после setup() внутри get_asgi_application()
+from tracker.live import expose_receive  # noqa: E402
+
+application = expose_receive(django_application)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,11 +42,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'tracker.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'tracker.middleware.ReadYourWritesMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -56,13 +59,20 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # шаблоны разбираются один раз на процесс; при DEBUG автоперезагрузка
+            # сбрасывает кэш загрузчика после правки файла
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
@@ -75,12 +85,94 @@ WSGI_APPLICATION = 'config.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # sqlite3 Django с транзакциями BEGIN IMMEDIATE: запись из воркера
+        # очереди не роняет параллельные транзакции веб-процесса
+        'ENGINE': 'tracker.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    # только для чтения — тяжёлые аналитические запросы не держат блокировку
+    # записи (в режиме WAL читатели не мешают писателю)
+    'analytics': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        # по умолчанию — тот же файл; TRACKER_ANALYTICS_DB_PATH указывает на копию,
+        # которую обновляет manage.py replicate_sqlite
+        'NAME': f'file:{os.environ.get("TRACKER_ANALYTICS_DB_PATH", BASE_DIR / "db.sqlite3")}?mode=ro',
+        'OPTIONS': {'uri': True},
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+# Аналитические чтения StudyDay/StudyMetric идут на псевдоним analytics;
+# после записи клиент TRACKER_STICKY_SECONDS секунд читает с default
+DATABASE_ROUTERS = ['tracker.routers.AnalyticsRouter']
+TRACKER_ANALYTICS_DATABASE = 'analytics'
+TRACKER_STICKY_SECONDS = int(os.environ.get('TRACKER_STICKY_SECONDS', 5))
+
+# Метрики производительности (/metrics) и лог запросов дольше порога; 0 — выключен
+TRACKER_SLOW_REQUEST_MS = int(os.environ.get('TRACKER_SLOW_REQUEST_MS', 0))
+# сколько самых дорогих SQL (по суммарному времени) показать в записи лога
+TRACKER_SLOW_REQUEST_TOP_QUERIES = int(os.environ.get('TRACKER_SLOW_REQUEST_TOP_QUERIES', 5))
+# /metrics доступен персоналу, запросам с заголовком "Authorization: Bearer <токен>"
+# и адресам из списка (через запятую) — например, для сборщика Prometheus
+TRACKER_METRICS_TOKEN = os.environ.get('TRACKER_METRICS_TOKEN', '')
+TRACKER_METRICS_ALLOWED_IPS = [
+    ip.strip() for ip in os.environ.get('TRACKER_METRICS_ALLOWED_IPS', '').split(',') if ip.strip()
+]
+
+# PRAGMA для каждого нового соединения SQLite (tracker.db.configure_sqlite)
+TRACKER_SQLITE_PRAGMAS = {
+    'journal_mode': os.environ.get('TRACKER_SQLITE_JOURNAL_MODE', 'wal'),
+    'synchronous': os.environ.get('TRACKER_SQLITE_SYNCHRONOUS', 'normal'),
+    # отрицательное значение — размер в КиБ
+    'cache_size': int(os.environ.get('TRACKER_SQLITE_CACHE_SIZE', -64000)),
+    'mmap_size': int(os.environ.get('TRACKER_SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'temp_store': os.environ.get('TRACKER_SQLITE_TEMP_STORE', 'memory'),
+    'busy_timeout': int(os.environ.get('TRACKER_SQLITE_BUSY_TIMEOUT', 5000)),
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+
+# Фрагменты шаблонов ({% cache %}) — отдельный кэш: куски таблицы не вытесняют
+# версии данных и результаты аналитики. Ключи фрагментов не зависят от текста
+# шаблона: после его правки каталог fragments в TRACKER_CACHE_DIR нужно очистить
+if os.environ.get('TRACKER_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['TRACKER_CACHE_DIR'],
+            'OPTIONS': {'MAX_ENTRIES': 1000},
+        },
+        'template_fragments': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(os.environ['TRACKER_CACHE_DIR'], 'fragments'),
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'tracker',
+            'OPTIONS': {'MAX_ENTRIES': 1000},
+        },
+        'template_fragments': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'tracker-fragments',
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        },
+    }
+
+# Кэш аналитики: псевдоним из CACHES и предельное число записей (LRU)
+TRACKER_CACHE_ALIAS = 'default'
+TRACKER_CACHE_MAX_ENTRIES = int(os.environ.get('TRACKER_CACHE_MAX_ENTRIES', 256))
+
+# Вход: у каждого пользователя свои учебные дни, гости видят общие данные
+LOGIN_REDIRECT_URL = 'study_days_list'
+LOGOUT_REDIRECT_URL = 'study_days_list'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -117,8 +209,6 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
-import os
-
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),
 ]
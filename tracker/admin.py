@@ -1,11 +1,71 @@
+from datetime import date
+
 from django.contrib import admin
-from .models import StudyDay, StudyMetric, Recommendation
+from django.db.models import F, Max, Min, QuerySet
+
+from . import fulltext, rollups
+from .models import Job, StudyDay, StudyMetric, Recommendation
+from .pagination import EstimatedCountPaginator
+
+
+class IndexedDatesQuerySet(QuerySet):
+    """
+    Запросы навигации date_hierarchy, переписанные под индекс на date.
+    Django строит список лет как DISTINCT по функции от каждой строки,
+    а границы — одним запросом MIN и MAX, который SQLite тоже считает
+    полным проходом. Здесь каждый год или месяц находится поиском по индексу.
+    """
+
+    def aggregate(self, *args, **kwargs):
+        # одиночный MIN или MAX SQLite берёт из края индекса — считаем по одному
+        if args or len(kwargs) < 2 or not all(map(self._is_plain_min_max, kwargs.values())):
+            return super().aggregate(*args, **kwargs)
+        result = {}
+        for alias, expression in kwargs.items():
+            result.update(super().aggregate(**{alias: expression}))
+        return result
+
+    @staticmethod
+    def _is_plain_min_max(expression):
+        return (
+            isinstance(expression, (Min, Max))
+            and expression.filter is None
+            and isinstance(expression.get_source_expressions()[0], F)
+        )
+
+    def dates(self, field_name, kind, order='ASC'):
+        if field_name != 'date' or kind not in ('year', 'month'):
+            return super().dates(field_name, kind, order)
+
+        # O(лет или месяцев × log n): первая дата, затем первая дата после начала следующего периода
+        ordered = self.order_by('date').values_list('date', flat=True)
+        found = []
+        current = ordered.first()
+        while current is not None:
+            start = current.replace(month=1 if kind == 'year' else current.month, day=1)
+            found.append(start)
+            if kind == 'year' or start.month == 12:
+                following = date(start.year + 1, 1, 1)
+            else:
+                following = start.replace(month=start.month + 1)
+            current = ordered.filter(date__gte=following).first()
+
+        if order == 'DESC':
+            found.reverse()
+        return found
+
+
+class StudyDayPaginator(EstimatedCountPaginator):
+    def estimate_count(self):
+        # помесячные метрики обновляются сигналами при каждой записи
+        return rollups.total_days()
 
 
 @admin.register(StudyDay)
 class StudyDayAdmin(admin.ModelAdmin):
     list_display = (
         'date',
+        'user',
         'mood',
         'fatigue',
         'productivity',
@@ -24,30 +84,87 @@ class StudyDayAdmin(admin.ModelAdmin):
         'comment',
     )
 
+    raw_id_fields = ('user',)
+
+    list_select_related = ('user',)
+
+    # навигация по годам и месяцам — диапазон по индексу на date
+    date_hierarchy = 'date'
+
     ordering = ('-date',)
 
+    # без COUNT(*) по всей таблице на каждой странице
+    paginator = StudyDayPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return IndexedDatesQuerySet(self.model, query=queryset.query, using=queryset._db)
+
+    def get_search_results(self, request, queryset, search_term):
+        # поиск по комментариям через FTS5 вместо LIKE '%...%'
+        return fulltext.search_days(queryset, search_term), False
+
 
 @admin.register(StudyMetric)
 class StudyMetricAdmin(admin.ModelAdmin):
     list_display = (
         'date',
+        'period',
+        'user',
+        'days_count',
         'avg_mood',
         'avg_fatigue',
         'avg_productivity',
     )
 
+    list_filter = (
+        'period',
+    )
+
     ordering = ('-date',)
 
 
 @admin.register(Recommendation)
 class RecommendationAdmin(admin.ModelAdmin):
     list_display = (
+        'rule',
+        'recommendation_type',
+        'range_from',
+        'range_to',
+        'user',
         'study_day',
         'created_at',
     )
 
+    list_filter = (
+        'rule',
+        'recommendation_type',
+    )
+
     search_fields = (
         'text',
     )
 
-    ordering = ('-created_at',)
\ No newline at end of file
+    # __str__ и колонка study_day читают день — одним JOIN вместо запроса на строку
+    list_select_related = ('study_day', 'user')
+
+    ordering = ('-created_at',)
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'name',
+        'key',
+        'status',
+        'attempts',
+        'run_after',
+        'created_at',
+    )
+
+    list_filter = (
+        'status',
+        'name',
+    )
+
+    ordering = ('run_after',)
@@ -0,0 +1,118 @@
+from array import array
+from collections import namedtuple
+
+from .models import StudyDay
+from .stats import SeriesStats
+
+ROW_FIELDS = ('id', 'date', 'mood', 'fatigue', 'productivity', 'comment')
+
+
+class DayRow(namedtuple('DayRow', ROW_FIELDS)):
+    __slots__ = ()
+
+    # та же классификация, что и StudyDay.effectiveness_level
+    effectiveness_level = StudyDay.effectiveness_level
+
+
+class DaysAnalytics:
+    """
+    Результат одного прохода по учебным дням: строки для таблицы,
+    средние, влияние настроения и усталости, min/max и ряды оценок
+    (array) для скользящей статистики.
+    """
+
+    def __init__(self):
+        self.days = []
+        self.count = 0
+        self.mood_sum = 0
+        self.fatigue_sum = 0
+        self.productivity_sum = 0
+        self.min_productivity = None
+        self.max_productivity = None
+        self.moods = array('b')
+        self.fatigues = array('b')
+        self.productivities = array('b')
+        self._series_stats = None
+        # индекс — значение фактора 1..5: [количество дней, сумма продуктивности]
+        self.by_mood = [[0, 0] for _ in range(6)]
+        self.by_fatigue = [[0, 0] for _ in range(6)]
+
+    def add(self, row):
+        _, _, mood, fatigue, productivity, _ = row
+
+        self.days.append(row)
+        self.count += 1
+        self.mood_sum += mood
+        self.fatigue_sum += fatigue
+        self.productivity_sum += productivity
+
+        if self.min_productivity is None or productivity < self.min_productivity:
+            self.min_productivity = productivity
+        if self.max_productivity is None or productivity > self.max_productivity:
+            self.max_productivity = productivity
+
+        self.moods.append(mood)
+        self.fatigues.append(fatigue)
+        self.productivities.append(productivity)
+
+        self.by_mood[mood][0] += 1
+        self.by_mood[mood][1] += productivity
+        self.by_fatigue[fatigue][0] += 1
+        self.by_fatigue[fatigue][1] += productivity
+
+    # ---------- СРЕДНИЕ ----------
+    @property
+    def avg_mood(self):
+        return self.mood_sum / self.count if self.count else None
+
+    @property
+    def avg_fatigue(self):
+        return self.fatigue_sum / self.count if self.count else None
+
+    @property
+    def avg_productivity(self):
+        return self.productivity_sum / self.count if self.count else None
+
+    @property
+    def averages(self):
+        return {
+            'avg_productivity': self.avg_productivity,
+            'avg_mood': self.avg_mood,
+            'avg_fatigue': self.avg_fatigue,
+        }
+
+    @property
+    def series(self):
+        if self._series_stats is None:
+            self._series_stats = SeriesStats(self.moods, self.fatigues, self.productivities)
+        return self._series_stats
+
+    # ---------- ВЛИЯНИЕ ФАКТОРОВ ----------
+    @staticmethod
+    def _impact(table, name):
+        return [
+            {name: score, 'avg_productivity': total / count}
+            for score, (count, total) in enumerate(table)
+            if count
+        ]
+
+    @property
+    def mood_stats(self):
+        return self._impact(self.by_mood, 'mood')
+
+    @property
+    def fatigue_stats(self):
+        return self._impact(self.by_fatigue, 'fatigue')
+
+
+def analyze(rows):
+    result = DaysAnalytics()
+    for row in rows:
+        result.add(DayRow._make(row))
+    return result
+
+
+def analyze_queryset(days_qs):
+    # один запрос: компактные кортежи вместо экземпляров модели
+    # (date, id) — тот же порядок, что у курсоров постраничной выдачи
+    return analyze(days_qs.order_by('date', 'id').values_list(*ROW_FIELDS))
@@ -1,4 +1,8 @@
 from django.apps import AppConfig
 
 class TrackerConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
     name = 'tracker'
+
+    def ready(self):
+        from . import db, signals  # noqa: F401
@@ -0,0 +1,16 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite, у которого транзакции начинаются с BEGIN IMMEDIATE (в Django 5.1
+    это OPTIONS['transaction_mode']). Обычный BEGIN откладывает блокировку
+    записи до первого INSERT/UPDATE; если транзакция начала с чтения
+    (select_for_update в rollups.apply_deltas и cube.apply), а другой процесс
+    — воркер очереди — успел записать, SQLite сразу отвечает «database is
+    locked», не дожидаясь busy_timeout. IMMEDIATE берёт блокировку в начале
+    и ждёт её по busy_timeout.
+    """
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
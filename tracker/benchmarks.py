@@ -0,0 +1,59 @@
+import statistics
+
+from django.db import connection
+
+
+def model_sql(*models):
+    """
+    DDL моделей в виде (таблицы, индексы) — замеры во временной SQLite-базе
+    идут по реальной схеме и индексам без миграций.
+    """
+    with connection.schema_editor(collect_sql=True, atomic=False) as editor:
+        for model in models:
+            editor.create_model(model)
+
+    statements = [sql.rstrip(';') for sql in editor.collected_sql]
+    tables = [sql for sql in statements if not sql.upper().startswith('CREATE INDEX')]
+    indexes = [sql for sql in statements if sql.upper().startswith('CREATE INDEX')]
+    return tables, indexes
+
+
+def percentiles(timings):
+    # (p50, p95) в тех же единицах, что и замеры
+    timings = sorted(timings)
+    if len(timings) < 2:
+        return timings[0], timings[0]
+    return statistics.median(timings), statistics.quantiles(timings, n=20)[-1]
+
+
+def summarize(timings):
+    # сводка замеров (мс) для JSON-отчёта manage.py bench
+    # inclusive: при нескольких повторах хвостовые перцентили не выходят за максимум
+    timings = sorted(timings)
+    cuts = statistics.quantiles(timings, n=100, method='inclusive') if len(timings) > 1 else None
+    p95, p99 = (cuts[94], cuts[98]) if cuts else (timings[0], timings[0])
+    return {
+        'runs': len(timings),
+        'min': round(timings[0], 3),
+        'p50': round(statistics.median(timings), 3),
+        'p95': round(p95, 3),
+        'p99': round(p99, 3),
+        'max': round(timings[-1], 3),
+        'mean': round(statistics.fmean(timings), 3),
+    }
+
+
+def regressions(results, baseline, threshold):
+    """
+    Сравнивает p50 с прошлым отчётом: [(размер, замер, было, стало)] для
+    замеров, ставших медленнее более чем на threshold (0.2 = 20 %).
+    """
+    found = []
+    for size, cases in results.items():
+        for case, current in cases.items():
+            previous = baseline.get(size, {}).get(case)
+            if not previous or 'p50' not in current or 'p50' not in previous:
+                continue
+            if current['p50'] > previous['p50'] * (1 + threshold):
+                found.append((size, case, previous['p50'], current['p50']))
+    return found
@@ -0,0 +1,281 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import DataVersion, StudyDay
+
+# псевдоним кэша, который тег {% cache %} берёт для фрагментов шаблонов
+FRAGMENTS_ALIAS = 'template_fragments'
+# версия сводки по всем пользователям меняется при любой записи
+ALL_USERS = 'all'
+MISSING = object()
+
+# области версий в DataVersion: все данные владельца и сводка по всем пользователям;
+# месяцы таблицы дней хранятся под своим 'YYYY-MM'
+SCOPE_DATA = 'data'
+SCOPE_ALL_USERS = 'all-users'
+# сохранённые рекомендации меняет задача очереди, а не запись дня
+SCOPE_RECOMMENDATIONS = 'recommendations'
+
+
+def get_backend():
+    return caches[getattr(settings, 'TRACKER_CACHE_ALIAS', 'default')]
+
+
+# =========================
+# ВЕРСИЯ ДАННЫХ
+# =========================
+# Версии живут в базе, а не в кэше Django: locmem у каждого процесса свой,
+# и запись из импорта, воркера или соседнего процесса сервера не дошла бы
+# до кэша веб-процесса. Меняются версии в транзакции записи.
+def _now_version():
+    # версия — миллисекунды с эпохи, поэтому из неё же получается Last-Modified
+    return time.time_ns() // 1_000_000
+
+
+def _owner_scope(user_id=None):
+    if user_id == ALL_USERS:
+        return None, SCOPE_ALL_USERS
+    return user_id, SCOPE_DATA
+
+
+def _versions(user_id, scopes=None):
+    # поиск по тому же выражению, что в уникальном индексе, — индекс используется и для NULL
+    versions = DataVersion.objects.alias(owner=Coalesce('user', Value(0))).filter(owner=user_id or 0)
+    if scopes is not None:
+        versions = versions.filter(scope__in=scopes)
+    return versions
+
+
+def read_versions(user_id, scopes):
+    """
+    {область: версия} одним запросом. Чтение ничего не пишет (оно может
+    идти с копии analytics): область без строки с появления DataVersion
+    не менялась — миграция завела версии всем владельцам с данными, —
+    и её версия 0.
+    """
+    scopes = list(scopes)
+    versions = dict(_versions(user_id, scopes).values_list('scope', 'version'))
+    return {scope: versions.get(scope, 0) for scope in scopes}
+
+
+def bump(user_id, scopes):
+    # новая версия не меньше текущего времени и строго больше прежней
+    scopes = list(scopes)
+    with transaction.atomic():
+        existing = set(_versions(user_id, scopes).values_list('scope', flat=True))
+        DataVersion.objects.bulk_create(
+            [DataVersion(user_id=user_id, scope=scope, version=0) for scope in scopes if scope not in existing],
+            ignore_conflicts=True,
+        )
+        _versions(user_id, scopes).update(version=Greatest(Value(_now_version()), F('version') + 1))
+
+
+def data_version(user_id=None):
+    owner, scope = _owner_scope(user_id)
+    return read_versions(owner, [scope])[scope]
+
+
+def owner_versions(user_id=None):
+    """
+    Все версии владельца одним запросом: данные целиком и каждый месяц
+    таблицы. Читаются до самих данных — иначе запись между чтением строк
+    и чтением версий сохранила бы старые строки под новым ключом.
+    """
+    versions = dict(_versions(user_id, None).values_list('scope', 'version'))
+    versions.setdefault(SCOPE_DATA, 0)
+    return versions
+
+
+# то же для асинхронных представлений (ASGI)
+async def adata_version(user_id=None):
+    owner, scope = _owner_scope(user_id)
+    versions = _versions(owner, [scope]).values_list('version', flat=True)
+    return (await versions.afirst()) or 0
+
+
+async def aowner_versions(user_id=None):
+    rows = _versions(user_id, None).values_list('scope', 'version')
+    versions = {scope: version async for scope, version in rows}
+    versions.setdefault(SCOPE_DATA, 0)
+    return versions
+
+
+def bump_all_users():
+    bump(None, [SCOPE_ALL_USERS])
+
+
+def bump_version(user_id=None):
+    bump_all_users()
+    bump(user_id, [SCOPE_DATA])
+
+
+def bump_recommendations(user_id=None):
+    bump(user_id, [SCOPE_RECOMMENDATIONS])
+
+
+def recommendations_version(versions):
+    return versions.get(SCOPE_RECOMMENDATIONS, 0)
+
+
+def bump_all():
+    # пересборка метрик меняет результаты всех владельцев сразу; владельцы,
+    # чьи дни попали в базу в обход сигналов, получают версию здесь
+    with transaction.atomic():
+        owners = StudyDay.objects.values_list('user', flat=True).distinct()
+        DataVersion.objects.bulk_create(
+            [DataVersion(user_id=owner, scope=SCOPE_DATA, version=0) for owner in owners]
+            + [DataVersion(user_id=None, scope=SCOPE_ALL_USERS, version=0)],
+            ignore_conflicts=True,
+        )
+        DataVersion.objects.update(version=Greatest(Value(_now_version()), F('version') + 1))
+
+
+# =========================
+# ВЕРСИИ КУСКОВ ТАБЛИЦЫ
+# =========================
+def bucket_of(day_date):
+    # кусок таблицы — календарный месяц: новый день меняет версию только своего месяца
+    return day_date.strftime('%Y-%m')
+
+
+def bucket_version(versions, bucket):
+    # месяц без версии не менялся с появления DataVersion (см. read_versions)
+    return versions.get(bucket, 0)
+
+
+def bump_buckets(dates, user_id=None):
+    bump(user_id, {bucket_of(day_date) for day_date in dates})
+
+
+def version_datetime(version):
+    return datetime.fromtimestamp(version // 1000, tz=timezone.utc)
+
+
+def make_etag(version, *parts):
+    digest = hashlib.md5(repr(parts).encode()).hexdigest()[:12]
+    return f'{version}-{digest}'
+
+
+# =========================
+# КЭШ РЕЗУЛЬТАТОВ
+# =========================
+class ResponseCache:
+    """
+    Кэш вычисленных результатов по ключу (namespace, пользователь, date_from,
+    date_to, версия данных пользователя). Работает поверх любого бэкенда Django (locmem, filebased);
+    размер ограничен, вытесняются давно не использованные записи.
+    """
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_max_entries(self):
+        if self.max_entries is not None:
+            return self.max_entries
+        return getattr(settings, 'TRACKER_CACHE_MAX_ENTRIES', 256)
+
+    @staticmethod
+    def make_key(namespace, date_from, date_to, version, extra='', user_id=None):
+        raw = f'{namespace}:{user_id}:{date_from}:{date_to}:{extra}'
+        digest = hashlib.md5(raw.encode()).hexdigest()
+        return f'tracker:{namespace}:{version}:{digest}'
+
+    def get_or_compute(self, namespace, date_from, date_to, compute, extra='', user_id=None,
+                       version=None):
+        # version — уже прочитанная версия данных, чтобы не читать её второй раз
+        backend = get_backend()
+        if version is None:
+            version = data_version(user_id)
+        key = self.make_key(namespace, date_from, date_to, version, extra, user_id)
+
+        value = backend.get(key, MISSING)
+        if value is not MISSING:
+            self._hit(key)
+            return value
+
+        value = compute()
+        backend.set(key, value, timeout=None)
+
+        evicted = self._stored(key)
+        if evicted:
+            backend.delete_many(evicted)
+
+        return value
+
+    async def aget_or_compute(self, namespace, date_from, date_to, acompute, version, extra='',
+                              user_id=None):
+        # то же для асинхронных представлений: acompute — корутинная функция,
+        # версию вызывающий читает сам (cache.adata_version / aowner_versions)
+        backend = get_backend()
+        key = self.make_key(namespace, date_from, date_to, version, extra, user_id)
+
+        value = await backend.aget(key, MISSING)
+        if value is not MISSING:
+            self._hit(key)
+            return value
+
+        value = await acompute()
+        await backend.aset(key, value, timeout=None)
+
+        evicted = self._stored(key)
+        if evicted:
+            await backend.adelete_many(evicted)
+
+        return value
+
+    def _hit(self, key):
+        with self._lock:
+            self.hits += 1
+            self._entries[key] = True
+            self._entries.move_to_end(key)
+
+    def _stored(self, key):
+        # учёт новой записи; возвращает вытесненные ключи
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = True
+            self._entries.move_to_end(key)
+            evicted = []
+            while len(self._entries) > self.get_max_entries():
+                old_key, _ = self._entries.popitem(last=False)
+                evicted.append(old_key)
+            self.evictions += len(evicted)
+        return evicted
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'max_entries': self.get_max_entries(),
+            }
+
+    def clear(self):
+        with self._lock:
+            keys = list(self._entries)
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+        if keys:
+            get_backend().delete_many(keys)
+        # фрагменты шаблонов построены по тем же данным — холодный старт сбрасывает и их
+        if FRAGMENTS_ALIAS in settings.CACHES:
+            caches[FRAGMENTS_ALIAS].clear()
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,133 @@
+from xml.sax.saxutils import escape, quoteattr
+
+KIND_SPARKLINE = 'sparkline'
+KIND_CHART = 'chart'
+KINDS = (KIND_SPARKLINE, KIND_CHART)
+
+# подписи и цвета как у графиков Chart.js на главной
+SERIES = {
+    'productivity': ('Продуктивность', '#6F90B7'),
+    'mood': ('Настроение', '#7FB77E'),
+    'fatigue': ('Усталость', '#E36464'),
+}
+
+SIZES = {
+    KIND_SPARKLINE: (120, 32),
+    KIND_CHART: (800, 300),
+}
+MIN_SIZE = 16
+MAX_SIZE = 2000
+
+SCORE_MAX = 5
+TEXT_COLOR = '#2F4156'
+GRID_COLOR = 'rgba(47, 65, 86, 0.08)'
+X_TICKS = 6
+
+
+# =========================
+# КООРДИНАТЫ
+# =========================
+def polyline_points(values, left, top, width, height, y_max=SCORE_MAX):
+    """
+    Точки polyline в пикселях: ось X — порядковый номер точки (ряды уже
+    прорежены до ширины картинки), ось Y — оценка от 0 до y_max.
+    """
+    if not values:
+        return ''
+    step = width / (len(values) - 1) if len(values) > 1 else 0
+    return ' '.join(
+        f'{left + i * step:.1f},{top + height - min(value, y_max) / y_max * height:.1f}'
+        for i, value in enumerate(values)
+    )
+
+
+def _svg(width, height, body, title):
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}" role="img" aria-label={quoteattr(title)}>'
+        f'<title>{escape(title)}</title>{body}</svg>'
+    )
+
+
+def _empty(width, height, title):
+    return _svg(
+        width, height,
+        f'<text x="{width / 2:.0f}" y="{height / 2:.0f}" fill="{TEXT_COLOR}" font-size="12" '
+        f'font-family="sans-serif" text-anchor="middle" dominant-baseline="middle">Нет данных</text>',
+        title,
+    )
+
+
+# =========================
+# СПАРКЛАЙН
+# =========================
+def sparkline(values, name, width, height):
+    label, color = SERIES[name]
+    if not values:
+        return _empty(width, height, label)
+
+    pad = 2
+    points = polyline_points(values, pad, pad, width - 2 * pad, height - 2 * pad)
+    last_x, last_y = points.rsplit(' ', 1)[-1].split(',')
+    return _svg(
+        width, height,
+        f'<polyline points="{points}" fill="none" stroke="{color}" stroke-width="1.5" '
+        f'stroke-linejoin="round" stroke-linecap="round"/>'
+        f'<circle cx="{last_x}" cy="{last_y}" r="2" fill="{color}"/>',
+        label,
+    )
+
+
+# =========================
+# ГРАФИК С ОСЯМИ
+# =========================
+def chart(dates, series, width, height):
+    """
+    Линейный график нескольких рядов: сетка по оценкам 0–5, подписи дат
+    внизу и легенда сверху. series — {имя ряда: значения}, имена из SERIES.
+    """
+    title = ', '.join(SERIES[name][0] for name in series)
+    if not dates:
+        return _empty(width, height, title)
+
+    left, right, top, bottom = 28, 12, 28, 24
+    plot_width = width - left - right
+    plot_height = height - top - bottom
+    parts = []
+
+    # ---------- СЕТКА И ПОДПИСИ ОСИ Y ----------
+    for score in range(SCORE_MAX + 1):
+        y = top + plot_height - score / SCORE_MAX * plot_height
+        parts.append(
+            f'<line x1="{left}" y1="{y:.1f}" x2="{width - right}" y2="{y:.1f}" stroke="{GRID_COLOR}"/>'
+            f'<text x="{left - 6}" y="{y:.1f}" text-anchor="end" dominant-baseline="middle">{score}</text>'
+        )
+
+    # ---------- ПОДПИСИ ДАТ ----------
+    ticks = min(X_TICKS, len(dates))
+    step = plot_width / (len(dates) - 1) if len(dates) > 1 else 0
+    for tick in range(ticks):
+        index = round(tick * (len(dates) - 1) / (ticks - 1)) if ticks > 1 else 0
+        anchor = 'start' if tick == 0 else 'end' if tick == ticks - 1 else 'middle'
+        parts.append(
+            f'<text x="{left + index * step:.1f}" y="{height - 6}" text-anchor="{anchor}">'
+            f'{escape(dates[index])}</text>'
+        )
+
+    # ---------- ЛИНИИ И ЛЕГЕНДА ----------
+    legend_x = left
+    for name, values in series.items():
+        label, color = SERIES[name]
+        parts.append(
+            f'<polyline points="{polyline_points(values, left, top, plot_width, plot_height)}" '
+            f'fill="none" stroke="{color}" stroke-width="2" stroke-linejoin="round"/>'
+            f'<rect x="{legend_x}" y="8" width="10" height="10" fill="{color}"/>'
+            f'<text x="{legend_x + 14}" y="13" dominant-baseline="middle">{escape(label)}</text>'
+        )
+        legend_x += 24 + 8 * len(label)
+
+    return _svg(
+        width, height,
+        f'<g font-family="sans-serif" font-size="11" fill="{TEXT_COLOR}">{"".join(parts)}</g>',
+        title,
+    )
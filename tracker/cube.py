@@ -0,0 +1,236 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from . import rollups
+from .models import ScoreCount, StudyDay, StudyMetric
+
+SCORES = range(1, 6)
+AXES = ('mood', 'fatigue', 'productivity')
+
+
+def month_start(day):
+    return rollups.period_start(StudyMetric.PERIOD_MONTH, day)
+
+
+# =========================
+# ИНКРЕМЕНТАЛЬНОЕ ОБНОВЛЕНИЕ
+# =========================
+def collect(rows, sign=1):
+    """
+    Строки (date, mood, fatigue, productivity) → изменения ячеек куба:
+    {(month, mood, fatigue, productivity): count}.
+    """
+    deltas = Counter()
+    for day, mood, fatigue, productivity in rows:
+        deltas[(month_start(day), mood, fatigue, productivity)] += sign
+    return deltas
+
+
+def merge(target, deltas):
+    for key, value in deltas.items():
+        target[key] = target.get(key, 0) + value
+    return target
+
+
+def apply(deltas, user_id=None):
+    # как rollups.apply_deltas: одна строка на ячейку, затронутую пачкой
+    deltas = {key: value for key, value in deltas.items() if value}
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        existing = {
+            (cell.month, cell.mood, cell.fatigue, cell.productivity): cell
+            for cell in ScoreCount.objects.select_for_update().filter(
+                user_id=user_id, month__in={key[0] for key in deltas}
+            )
+        }
+
+        to_create, to_update, to_delete = [], [], []
+        for key, value in deltas.items():
+            cell = existing.get(key)
+            if cell is None:
+                if value > 0:
+                    month, mood, fatigue, productivity = key
+                    to_create.append(ScoreCount(
+                        user_id=user_id, month=month, mood=mood,
+                        fatigue=fatigue, productivity=productivity, days_count=value,
+                    ))
+                continue
+
+            cell.days_count += value
+            if cell.days_count <= 0:
+                to_delete.append(cell.pk)
+            else:
+                to_update.append(cell)
+
+        if to_create:
+            ScoreCount.objects.bulk_create(to_create)
+        if to_update:
+            ScoreCount.objects.bulk_update(to_update, ['days_count'])
+        if to_delete:
+            ScoreCount.objects.filter(pk__in=to_delete).delete()
+
+
+def add_days(rows, user_id=None):
+    apply(collect(rows, sign=1), user_id)
+
+
+def remove_days(rows, user_id=None):
+    apply(collect(rows, sign=-1), user_id)
+
+
+# =========================
+# ПОЛНАЯ ПЕРЕСБОРКА
+# =========================
+def rebuild(batch_size=1000):
+    # группировка по дате на стороне БД: усечение до месяца в SQLite — функция
+    # Python на каждую строку, поэтому месяцы собираются уже из групп
+    counts = Counter()
+    rows = (
+        StudyDay.objects
+        .order_by()
+        .values('user', 'date', *AXES)
+        .annotate(count=Count('id'))
+        .values_list('user', 'date', *AXES, 'count')
+    )
+    for user_id, day, mood, fatigue, productivity, count in rows.iterator():
+        counts[(user_id, month_start(day), mood, fatigue, productivity)] += count
+
+    with transaction.atomic():
+        ScoreCount.objects.all().delete()
+        ScoreCount.objects.bulk_create(
+            [
+                ScoreCount(
+                    user_id=user_id, month=month, mood=mood,
+                    fatigue=fatigue, productivity=productivity, days_count=count,
+                )
+                for (user_id, month, mood, fatigue, productivity), count in counts.items()
+            ],
+            batch_size=batch_size,
+        )
+    return len(counts)
+
+
+# =========================
+# КУБ ЗА ДИАПАЗОН
+# =========================
+def range_parts(date_from=None, date_to=None, user_id=None):
+    """
+    Запросы, дающие в сумме ячейки куба за диапазон, — строки
+    (mood, fatigue, productivity, count). Полные месяцы читаются из ScoreCount,
+    неполные месяцы по краям (не больше двух) — из StudyDay по индексу
+    (user, date, оценки). Стоимость — O(месяцев в диапазоне), а не O(дней).
+    """
+    if not (date_from and date_to):
+        return [_cells(ScoreCount.objects.filter(user_id=user_id))]
+    if date_from > date_to:
+        return []
+
+    first_month = month_start(date_from)
+    if first_month != date_from:
+        first_month = rollups.next_period(StudyMetric.PERIOD_MONTH, first_month)
+    last_month = month_start(date_to)
+    if rollups.period_end(StudyMetric.PERIOD_MONTH, last_month) != date_to:
+        last_month = month_start(last_month - timedelta(days=1))
+
+    if first_month > last_month:
+        return [_day_cells(user_id, Q(date__range=(date_from, date_to)))]
+
+    parts = [_cells(ScoreCount.objects.filter(
+        user_id=user_id, month__range=(first_month, last_month)
+    ))]
+    edges = Q()
+    if date_from < first_month:
+        edges |= Q(date__range=(date_from, first_month - timedelta(days=1)))
+    after_last = rollups.next_period(StudyMetric.PERIOD_MONTH, last_month)
+    if after_last <= date_to:
+        edges |= Q(date__range=(after_last, date_to))
+    if edges:
+        parts.append(_day_cells(user_id, edges))
+    return parts
+
+
+def _cells(cells_qs):
+    return (
+        cells_qs
+        .order_by()
+        .values(*AXES)
+        .annotate(count=Sum('days_count'))
+        .values_list(*AXES, 'count')
+    )
+
+
+def _day_cells(user_id, dates):
+    return (
+        StudyDay.objects
+        .filter(dates, user_id=user_id)
+        .order_by()
+        .values(*AXES)
+        .annotate(count=Count('id'))
+        .values_list(*AXES, 'count')
+    )
+
+
+def empty():
+    return [[[0] * 5 for _ in SCORES] for _ in SCORES]
+
+
+def _add(cube, rows):
+    for mood, fatigue, productivity, count in rows:
+        cube[mood - 1][fatigue - 1][productivity - 1] += count
+
+
+def range_cube(date_from=None, date_to=None, user_id=None):
+    # cube[mood - 1][fatigue - 1][productivity - 1] — число дней
+    cube = empty()
+    for part in range_parts(date_from, date_to, user_id):
+        _add(cube, part)
+    return cube
+
+
+async def arange_cube(date_from=None, date_to=None, user_id=None):
+    cube = empty()
+    for part in range_parts(date_from, date_to, user_id):
+        _add(cube, [row async for row in part])
+    return cube
+
+
+# =========================
+# ПРОИЗВОДНЫЕ ТАБЛИЦЫ
+# =========================
+def cells(cube):
+    for mood in SCORES:
+        for fatigue in SCORES:
+            for productivity in SCORES:
+                count = cube[mood - 1][fatigue - 1][productivity - 1]
+                if count:
+                    yield {'mood': mood, 'fatigue': fatigue, 'productivity': productivity}, count
+
+
+def joint(cube, x, y):
+    # совместное распределение двух осей: table[y - 1][x - 1] — число дней
+    table = [[0] * 5 for _ in SCORES]
+    for scores, count in cells(cube):
+        table[scores[y] - 1][scores[x] - 1] += count
+    return table
+
+
+def impact(cube, factor, target='productivity'):
+    # среднее target при каждом значении factor — как «влияние настроения» на главной
+    totals = {score: [0, 0] for score in SCORES}
+    for scores, count in cells(cube):
+        totals[scores[factor]][0] += count
+        totals[scores[factor]][1] += count * scores[target]
+    return [
+        {factor: score, f'avg_{target}': total / count, 'days': count}
+        for score, (count, total) in totals.items()
+        if count
+    ]
+
+
+def total(cube):
+    return sum(count for _, count in cells(cube))
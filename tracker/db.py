@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from . import metrics
+
+# журнал и синхронизацию читатель менять не может и не должен
+WRITE_ONLY_PRAGMAS = ('journal_mode', 'synchronous')
+
+
+def is_read_only(settings_dict):
+    return 'mode=ro' in str(settings_dict.get('NAME', ''))
+
+
+def pragma_statements(pragmas, read_only=False):
+    statements = []
+    for name, value in pragmas.items():
+        if value in (None, ''):
+            continue
+        if read_only and name in WRITE_ONLY_PRAGMAS:
+            continue
+        statements.append(f'PRAGMA {name} = {value}')
+    if read_only:
+        statements.append('PRAGMA query_only = ON')
+    return statements
+
+
+def apply_pragmas(connection, pragmas, read_only=False):
+    # connection — соединение sqlite3 или курсор Django, нужен только execute()
+    for statement in pragma_statements(pragmas, read_only):
+        connection.execute(statement)
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+
+    pragmas = getattr(settings, 'TRACKER_SQLITE_PRAGMAS', {})
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor, pragmas, is_read_only(connection.settings_dict))
+
+
+@receiver(connection_created)
+def collect_query_stats(sender, connection, **kwargs):
+    # соединения создаются по одному на поток (и заново после закрытия) —
+    # обёртка ставится на каждое, а не на соединения потока запроса
+    if metrics.record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(metrics.record_query)
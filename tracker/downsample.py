@@ -0,0 +1,142 @@
+from django.db.models import Max, Min
+
+from . import rollups
+from .models import StudyMetric
+
+METHOD_LTTB = 'lttb'
+METHOD_CALENDAR = 'calendar'
+METHODS = (METHOD_LTTB, METHOD_CALENDAR)
+
+SERIES = ('mood', 'fatigue', 'productivity')
+
+
+# =========================
+# LARGEST-TRIANGLE-THREE-BUCKETS
+# =========================
+def lttb_indices(xs, columns, threshold):
+    """
+    Индексы точек, сохраняющих форму линий. В отличие от классического LTTB
+    площадь треугольника суммируется по всем рядам (columns), поэтому
+    у настроения, усталости и продуктивности остаются общие подписи оси X.
+
+    Возвращает (indices, bounds): bounds[i] — (первый, последний) индекс
+    исходных точек, которые представляет i-я выбранная точка.
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n)), [(i, i) for i in range(n)]
+
+    every = (n - 2) / (threshold - 2)
+    indices = [0]
+    bounds = [(0, 0)]
+    a = 0
+
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+
+        next_start = end
+        next_end = min(int((i + 2) * every) + 1, n)
+        size = next_end - next_start
+
+        avg_x = sum(xs[next_start:next_end]) / size
+        avg_ys = [sum(column[next_start:next_end]) / size for column in columns]
+
+        ax = xs[a]
+        best = start
+        best_area = -1.0
+
+        for j in range(start, end):
+            dx_a = ax - avg_x
+            dx_j = ax - xs[j]
+            area = 0.0
+            for column, avg_y in zip(columns, avg_ys):
+                ay = column[a]
+                area += abs(dx_a * (column[j] - ay) - dx_j * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = j
+
+        indices.append(best)
+        bounds.append((start, end - 1))
+        a = best
+
+    indices.append(n - 1)
+    bounds.append((n - 1, n - 1))
+    return indices, bounds
+
+
+def lttb_payload(rows, max_points):
+    # rows: [(date, mood, fatigue, productivity)] по возрастанию даты
+    xs = [row[0].toordinal() for row in rows]
+    columns = [[row[i] for row in rows] for i in (1, 2, 3)]
+
+    indices, bounds = lttb_indices(xs, columns, max_points)
+
+    return {
+        'dates': [rows[i][0].strftime('%Y-%m-%d') for i in indices],
+        'mood': [columns[0][i] for i in indices],
+        'fatigue': [columns[1][i] for i in indices],
+        'productivity': [columns[2][i] for i in indices],
+        'buckets': [
+            [rows[first][0].strftime('%Y-%m-%d'), rows[last][0].strftime('%Y-%m-%d')]
+            for first, last in bounds
+        ],
+        'downsampling': {
+            'method': METHOD_LTTB,
+            'source_points': len(rows),
+            'points': len(indices),
+        },
+    }
+
+
+# =========================
+# КАЛЕНДАРНЫЕ КОРЗИНЫ (НЕДЕЛИ / МЕСЯЦЫ)
+# =========================
+def data_span(date_from=None, date_to=None, user_id=None):
+    if date_from and date_to:
+        return date_from, date_to
+
+    bounds = rollups.user_metrics(user_id).filter(period=StudyMetric.PERIOD_DAY).aggregate(
+        first=Min('date'),
+        last=Max('date'),
+    )
+    return bounds['first'], bounds['last']
+
+
+def calendar_period(first, last, max_points):
+    days = (last - first).days + 1
+    if days <= max_points:
+        return None
+    if days / 7 <= max_points:
+        return StudyMetric.PERIOD_WEEK
+    return StudyMetric.PERIOD_MONTH
+
+
+def calendar_payload(series_rows, period, date_from=None, date_to=None, source_points=None):
+    # series_rows: [(начало периода, count, mood_sum, fatigue_sum, productivity_sum)]
+    buckets = []
+    for start, *_ in series_rows:
+        first = max(start, date_from) if date_from else start
+        last = rollups.period_end(period, start)
+        if date_to:
+            last = min(last, date_to)
+        buckets.append([first.strftime('%Y-%m-%d'), last.strftime('%Y-%m-%d')])
+
+    return {
+        'dates': [start.strftime('%Y-%m-%d') for start, *_ in series_rows],
+        'mood': [round(mood / count, 2) for _, count, mood, _, _ in series_rows],
+        'fatigue': [round(fatigue / count, 2) for _, count, _, fatigue, _ in series_rows],
+        'productivity': [round(productivity / count, 2) for _, count, _, _, productivity in series_rows],
+        'counts': [count for _, count, *_ in series_rows],
+        'buckets': buckets,
+        'downsampling': {
+            'method': METHOD_CALENDAR,
+            'period': period,
+            'source_points': (
+                source_points if source_points is not None
+                else sum(count for _, count, *_ in series_rows)
+            ),
+            'points': len(series_rows),
+        },
+    }
@@ -0,0 +1,171 @@
+import csv
+import json
+import struct
+import sys
+from array import array
+from itertools import islice
+
+from .models import Recommendation, StudyDay
+from .streaming import EPOCH_ORDINAL
+
+FORMAT_CSV = 'csv'
+FORMAT_JSONL = 'jsonl'
+FORMAT_COLUMNAR = 'columnar'
+FORMATS = (FORMAT_CSV, FORMAT_JSONL, FORMAT_COLUMNAR)
+
+DATASET_DAYS = 'days'
+DATASET_RECOMMENDATIONS = 'recommendations'
+DATASETS = (DATASET_DAYS, DATASET_RECOMMENDATIONS)
+
+CONTENT_TYPES = {
+    FORMAT_CSV: 'text/csv; charset=utf-8',
+    FORMAT_JSONL: 'application/x-ndjson',
+    FORMAT_COLUMNAR: 'application/octet-stream',
+}
+EXTENSIONS = {
+    FORMAT_CSV: 'csv',
+    FORMAT_JSONL: 'jsonl',
+    FORMAT_COLUMNAR: 'sdc',
+}
+
+CHUNK_SIZE = 5000
+
+DAY_FIELDS = ('date', 'mood', 'fatigue', 'productivity', 'comment')
+RECOMMENDATION_FIELDS = (
+    'study_day__date', 'range_from', 'range_to', 'rule',
+    'recommendation_type', 'text', 'created_at',
+)
+
+# =========================
+# ДВОИЧНЫЙ КОЛОНОЧНЫЙ ФОРМАТ
+# =========================
+# Заголовок: магическая строка и версия. Далее блоки:
+#   uint32 n | int32 day[n] | int8 mood[n] | int8 fatigue[n] | int8 productivity[n]
+# day — число дней от 1970-01-01. Всё little-endian, блок с n = 0 завершает файл.
+MAGIC = b'SDAYCOL'
+VERSION = 1
+HEADER = struct.Struct('<7sB')
+BLOCK = struct.Struct('<I')
+NEEDS_SWAP = sys.byteorder != 'little'
+
+
+def day_rows(date_from=None, date_to=None, user_id=None):
+    days_qs = StudyDay.objects.filter(user_id=user_id)
+    if date_from and date_to:
+        days_qs = days_qs.filter(date__range=[date_from, date_to])
+    return days_qs.order_by('date', 'pk')
+
+
+def recommendation_rows(date_from=None, date_to=None, user_id=None):
+    recommendations = Recommendation.objects.filter(user_id=user_id)
+    if date_from and date_to:
+        recommendations = recommendations.filter(study_day__date__range=[date_from, date_to])
+    return recommendations.order_by('study_day__date', 'position', 'pk')
+
+
+def _values(queryset, fields, chunk_size=CHUNK_SIZE):
+    return queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+
+
+class Echo:
+    # csv.writer пишет строку в «буфер» и сразу получает её обратно
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows, header):
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def jsonl_lines(rows, header):
+    for row in rows:
+        yield json.dumps(dict(zip(header, row)), ensure_ascii=False, default=str) + '\n'
+
+
+def _pack(values, typecode):
+    column = array(typecode, values)
+    if NEEDS_SWAP:
+        column.byteswap()
+    return column.tobytes()
+
+
+def columnar_blocks(rows, chunk_size=CHUNK_SIZE):
+    yield HEADER.pack(MAGIC, VERSION)
+
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        yield b''.join((
+            BLOCK.pack(len(chunk)),
+            _pack([row[0].toordinal() - EPOCH_ORDINAL for row in chunk], 'i'),
+            _pack([row[1] for row in chunk], 'b'),
+            _pack([row[2] for row in chunk], 'b'),
+            _pack([row[3] for row in chunk], 'b'),
+        ))
+
+    yield BLOCK.pack(0)
+
+
+def read_columnar(stream):
+    """
+    Загружает файл колоночного формата в массивы array:
+    {'day': array('i'), 'mood': array('b'), 'fatigue': ..., 'productivity': ...}.
+    Для NumPy каждый блок читается так же через numpy.frombuffer.
+    """
+    magic, version = HEADER.unpack(stream.read(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('Неизвестный формат файла')
+
+    columns = {
+        'day': array('i'),
+        'mood': array('b'),
+        'fatigue': array('b'),
+        'productivity': array('b'),
+    }
+
+    while True:
+        (count,) = BLOCK.unpack(stream.read(BLOCK.size))
+        if not count:
+            break
+        for name, column in columns.items():
+            block = array(column.typecode)
+            block.frombytes(stream.read(count * block.itemsize))
+            if NEEDS_SWAP:
+                block.byteswap()
+            column.extend(block)
+
+    return columns
+
+
+# =========================
+# ВЫБОР ФОРМАТА
+# =========================
+def export_chunks(fmt, dataset=DATASET_DAYS, date_from=None, date_to=None,
+                  chunk_size=CHUNK_SIZE, user_id=None):
+    if dataset == DATASET_RECOMMENDATIONS:
+        if fmt == FORMAT_COLUMNAR:
+            raise ValueError('Колоночный формат доступен только для учебных дней')
+        header = (
+            'date', 'range_from', 'range_to', 'rule',
+            'type', 'text', 'created_at',
+        )
+        rows = _values(
+            recommendation_rows(date_from, date_to, user_id), RECOMMENDATION_FIELDS, chunk_size
+        )
+    elif fmt == FORMAT_COLUMNAR:
+        return columnar_blocks(
+            _values(day_rows(date_from, date_to, user_id), DAY_FIELDS[:4], chunk_size),
+            chunk_size,
+        )
+    else:
+        header = DAY_FIELDS
+        rows = _values(day_rows(date_from, date_to, user_id), DAY_FIELDS, chunk_size)
+
+    if fmt == FORMAT_JSONL:
+        return jsonl_lines(rows, header)
+    return csv_lines(rows, header)
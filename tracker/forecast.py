@@ -0,0 +1,238 @@
+from . import rollups
+from .models import ForecastState, StudyMetric
+from .routers import use_primary
+
+# ряды в порядке признаков: для каждого лага — (настроение, усталость, продуктивность)
+SERIES = ('mood', 'fatigue', 'productivity')
+TARGET = SERIES.index('productivity')
+
+# сглаживание Хольта с затухающим трендом: без затухания прогноз на месяц
+# вперёд уходит за шкалу 1–5 при любом небольшом наклоне
+ALPHA = 0.3
+BETA = 0.05
+PHI = 0.9
+
+LAGS = 2
+RIDGE_LAMBDA = 1.0
+# свободный член, LAGS дней по трём рядам и одношаговый прогноз Хольта
+FEATURES = 1 + LAGS * len(SERIES) + 1
+# пока наблюдений меньше, веса регрессии не устойчивы — прогноз только по Хольту
+MIN_OBSERVATIONS = 2 * FEATURES
+
+MAX_HORIZON = 90
+SCORE_MIN = 1
+SCORE_MAX = 5
+
+
+def _clip(value):
+    return min(SCORE_MAX, max(SCORE_MIN, value))
+
+
+def solve(matrix, vector):
+    """
+    Решение системы matrix · x = vector методом Гаусса с выбором главного
+    элемента. Размер системы — FEATURES, поэтому NumPy не нужен.
+    """
+    size = len(vector)
+    rows = [list(matrix[i]) + [vector[i]] for i in range(size)]
+    for col in range(size):
+        pivot = max(range(col, size), key=lambda i: abs(rows[i][col]))
+        if abs(rows[pivot][col]) < 1e-12:
+            return None
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        for i in range(col + 1, size):
+            factor = rows[i][col] / rows[col][col]
+            if factor:
+                for j in range(col, size + 1):
+                    rows[i][j] -= factor * rows[col][j]
+
+    result = [0.0] * size
+    for i in range(size - 1, -1, -1):
+        tail = sum(rows[i][j] * result[j] for j in range(i + 1, size))
+        result[i] = (rows[i][size] - tail) / rows[i][i]
+    return result
+
+
+# =========================
+# МОДЕЛЬ
+# =========================
+class Forecaster:
+    """
+    Прогноз средней продуктивности по дням с записями.
+
+    Хольт сглаживает каждый из трёх рядов, гребневая регрессия предсказывает
+    продуктивность по двум последним дням и прогнозу Хольта. Регрессия
+    хранит только суммы XᵀX и Xᵀy, поэтому новый день добавляется за O(1),
+    а прогноз на h дней вперёд стоит O(h) — история заново не читается.
+    """
+
+    def __init__(self, state=None):
+        state = state or {}
+        self.observations = state.get('observations', 0)
+        # {ряд: [уровень, тренд]}
+        self.holt = state.get('holt') or {}
+        # последние LAGS дней, самый свежий первым
+        self.lags = [tuple(row) for row in state.get('lags', [])]
+        self.xtx = state.get('xtx') or [[0.0] * FEATURES for _ in range(FEATURES)]
+        self.xty = state.get('xty') or [0.0] * FEATURES
+        self.weights = state.get('weights')
+
+    def state(self):
+        return {
+            'observations': self.observations,
+            'holt': self.holt,
+            'lags': [list(row) for row in self.lags],
+            'xtx': self.xtx,
+            'xty': self.xty,
+            'weights': self.weights,
+        }
+
+    # ---------- ХОЛЬТ ----------
+    @staticmethod
+    def holt_forecast(level_trend):
+        # на шаг вперёд; дальние шаги прогноз получает, подставляя свои же значения
+        level, trend = level_trend
+        return level + PHI * trend
+
+    @staticmethod
+    def holt_update(level_trend, value):
+        if level_trend is None:
+            return [value, 0.0]
+        level, trend = level_trend
+        new_level = ALPHA * value + (1 - ALPHA) * (level + PHI * trend)
+        return [new_level, BETA * (new_level - level) + (1 - BETA) * PHI * trend]
+
+    # ---------- ОБУЧЕНИЕ ----------
+    @staticmethod
+    def features(lags, holt_next):
+        row = [1.0]
+        for lag in lags:
+            row.extend(lag)
+        row.append(holt_next)
+        return row
+
+    def update(self, mood, fatigue, productivity):
+        values = (mood, fatigue, productivity)
+        target = self.holt.get(SERIES[TARGET])
+
+        if len(self.lags) == LAGS and target is not None:
+            x = self.features(self.lags, self.holt_forecast(target))
+            xtx = self.xtx
+            for i, xi in enumerate(x):
+                if xi:
+                    row = xtx[i]
+                    for j in range(i, FEATURES):
+                        row[j] += xi * x[j]
+                    self.xty[i] += xi * productivity
+
+        for name, value in zip(SERIES, values):
+            self.holt[name] = self.holt_update(self.holt.get(name), value)
+        self.lags = [values] + self.lags[:LAGS - 1]
+        self.observations += 1
+        self.weights = None
+
+    def fit(self, rows):
+        for mood, fatigue, productivity in rows:
+            self.update(mood, fatigue, productivity)
+        self.solve()
+        return self
+
+    def solve(self):
+        # XᵀX накапливается только над диагональю — симметричная половина
+        # достраивается здесь; штраф не касается свободного члена
+        if self.observations < MIN_OBSERVATIONS:
+            self.weights = None
+            return None
+        matrix = [
+            [self.xtx[min(i, j)][max(i, j)] for j in range(FEATURES)]
+            for i in range(FEATURES)
+        ]
+        for i in range(1, FEATURES):
+            matrix[i][i] += RIDGE_LAMBDA
+        self.weights = solve(matrix, self.xty)
+        return self.weights
+
+    # ---------- ПРОГНОЗ ----------
+    def forecast(self, horizon):
+        """
+        Прогноз на horizon дней: список (mood, fatigue, productivity).
+        Настроение и усталость будущих дней неизвестны — их дают прогнозы
+        Хольта, а предсказанные значения становятся лагами следующего шага.
+        """
+        if not self.observations:
+            return []
+        if self.weights is None and self.observations >= MIN_OBSERVATIONS:
+            self.solve()
+
+        holt = dict(self.holt)
+        lags = list(self.lags)
+        result = []
+        for _ in range(horizon):
+            mood, fatigue, holt_productivity = (
+                self.holt_forecast(holt[name]) for name in SERIES
+            )
+            productivity = holt_productivity
+            if self.weights is not None and len(lags) == LAGS:
+                x = self.features(lags, holt_productivity)
+                productivity = sum(w * xi for w, xi in zip(self.weights, x))
+
+            values = (_clip(mood), _clip(fatigue), _clip(productivity))
+            result.append(values)
+            for name, value in zip(SERIES, values):
+                holt[name] = self.holt_update(holt[name], value)
+            lags = [values] + lags[:LAGS - 1]
+        return result
+
+
+# =========================
+# СОХРАНЁННОЕ СОСТОЯНИЕ
+# =========================
+def daily_means(user_id=None, after=None):
+    # средние за каждый день с записями — из дневных метрик, а не из StudyDay
+    metrics = rollups.user_metrics(user_id).filter(period=StudyMetric.PERIOD_DAY)
+    if after is not None:
+        metrics = metrics.filter(date__gt=after)
+    return metrics.order_by('date').values_list(
+        'date', 'days_count', 'mood_sum', 'fatigue_sum', 'productivity_sum'
+    )
+
+
+def load(user_id=None):
+    """
+    Модель владельца, дообученная на днях после сохранённого состояния.
+    Обычно это ноль или несколько новых дней; полный проход по истории —
+    только при первом обращении и после правки уже учтённых дней.
+    Дообученная модель сохраняется, поэтому дни читаются с основной базы.
+    """
+    saved = ForecastState.objects.filter(user_id=user_id).first()
+    model = Forecaster(saved.state if saved else None)
+    last_date = saved.last_date if saved else None
+
+    new_days = 0
+    with use_primary():
+        for day, count, mood, fatigue, productivity in daily_means(user_id, last_date).iterator():
+            model.update(mood / count, fatigue / count, productivity / count)
+            last_date = day
+            new_days += 1
+
+    if new_days:
+        model.solve()
+        save(model, last_date, user_id)
+    return model, last_date
+
+
+def save(model, last_date, user_id=None):
+    ForecastState.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            'last_date': last_date,
+            'observations': model.observations,
+            'state': model.state(),
+        },
+    )
+
+
+def invalidate(date, user_id=None):
+    # правка уже учтённого дня меняет прошлые суммы — модель обучается заново
+    ForecastState.objects.filter(user_id=user_id, last_date__gte=date).delete()
+
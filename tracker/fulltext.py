@@ -0,0 +1,137 @@
+import re
+
+from django.db import connections, router
+from django.db.models import Max, Min
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+
+from .models import StudyDay
+
+# таблица FTS5 создаётся миграцией 0007 и синхронизируется триггерами
+FTS_TABLE = 'tracker_studyday_fts'
+
+TOKEN_RE = re.compile(r'\w+')
+
+# границы совпадения в snippet(): управляющие символы не встречаются в тексте,
+# поэтому комментарий можно экранировать целиком и только потом вставить <mark>
+MARK_START = '\x02'
+MARK_END = '\x03'
+SNIPPET_TOKENS = 12
+
+
+def match_expression(text):
+    """
+    Запрос пользователя → выражение MATCH: каждое слово ищется по префиксу,
+    все слова обязательны. Кавычки вокруг слов экранируют синтаксис FTS5
+    (AND, NEAR, *, двоеточия), поэтому ввод не может сломать запрос.
+    """
+    tokens = TOKEN_RE.findall(text.lower())
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def matching_ids(expression):
+    return RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        [expression],
+    )
+
+
+def search_days(days_qs, text):
+    # фильтр по индексу FTS5 вместо comment LIKE '%...%' по всей таблице
+    expression = match_expression(text)
+    if expression is None:
+        return days_qs
+    return days_qs.filter(id__in=matching_ids(expression))
+
+
+# =========================
+# РАНЖИРОВАННЫЕ СОВПАДЕНИЯ
+# =========================
+def id_bounds(user_id=None, date_from=None, date_to=None):
+    """
+    (min id, max id) дней владельца в диапазоне — по индексу (user, date),
+    rowid входит в каждую его запись. FTS5 сужает обход списков совпадений
+    по условию на rowid, а дни обычно добавляются по порядку дат, поэтому
+    поиск за год не читает совпадения за все годы. None — в диапазоне пусто.
+    """
+    if not (date_from and date_to):
+        return None
+    bounds = StudyDay.objects.filter(
+        user_id=user_id, date__range=[date_from, date_to]
+    ).aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return None
+    return bounds['low'], bounds['high']
+
+
+def _matches_sql(select, expression, user_id=None, date_from=None, date_to=None, bounds=None):
+    """
+    FROM/WHERE для совпадений владельца. CROSS JOIN фиксирует порядок: сначала
+    индекс FTS5, затем строки дней по rowid — иначе планировщик может пойти
+    по индексу (user, date) и выполнять MATCH для каждого дня.
+    """
+    conditions = [f'{FTS_TABLE} MATCH %s', 'day.user_id IS %s']
+    params = [expression, user_id]
+    if bounds:
+        conditions.append(f'{FTS_TABLE}.rowid BETWEEN %s AND %s')
+        params += list(bounds)
+    if date_from and date_to:
+        conditions.append('day.date BETWEEN %s AND %s')
+        params += [date_from, date_to]
+    sql = (
+        f'SELECT {select} FROM {FTS_TABLE} '
+        f'CROSS JOIN {StudyDay._meta.db_table} AS day ON day.id = {FTS_TABLE}.rowid '
+        f'WHERE {" AND ".join(conditions)}'
+    )
+    return sql, params
+
+
+def ranked_matches(expression, user_id=None, date_from=None, date_to=None, limit=20, bounds=None):
+    """
+    Лучшие по bm25 дни владельца с фрагментом комментария. Ранжируются все
+    совпадения, а не последние по rowid: более старый день с лучшим рангом
+    не должен пропадать из выдачи. Проход по совпадениям тот же, что у
+    facets(); ORDER BY rank LIMIT n держит в памяти только n лучших строк.
+    """
+    sql, params = _matches_sql(
+        f'day.id, day.date, day.mood, day.fatigue, day.productivity, '
+        f'snippet({FTS_TABLE}, 0, %s, %s, \'…\', %s) AS snippet, {FTS_TABLE}.rank AS rank',
+        expression, user_id, date_from, date_to, bounds,
+    )
+    params = [MARK_START, MARK_END, SNIPPET_TOKENS] + params + [limit]
+    return list(StudyDay.objects.raw(
+        f'{sql} ORDER BY {FTS_TABLE}.rank, {FTS_TABLE}.rowid DESC LIMIT %s', params
+    ))
+
+
+def highlight(snippet):
+    return escape(snippet).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+# =========================
+# АГРЕГАТЫ ПО СОВПАДЕНИЯМ
+# =========================
+def facets(expression, user_id=None, date_from=None, date_to=None, bounds=None):
+    """
+    Один проход по всем совпадениям: (totals, distribution), где totals —
+    (count, mood_sum, fatigue_sum, productivity_sum) как у rollups.range_totals,
+    а distribution — число дней для каждой оценки продуктивности.
+    """
+    scores = range(1, 6)
+    sql, params = _matches_sql(
+        'COUNT(*), SUM(day.mood), SUM(day.fatigue), SUM(day.productivity), '
+        + ', '.join(f'SUM(day.productivity = {score})' for score in scores),
+        expression, user_id, date_from, date_to, bounds,
+    )
+    count, mood, fatigue, productivity, *counts = _fetch_one(sql, params)
+    totals = (count, mood or 0, fatigue or 0, productivity or 0)
+    return totals, {score: value or 0 for score, value in zip(scores, counts)}
+
+
+def _fetch_one(sql, params):
+    # чтение по тем же правилам маршрутизации, что и у ORM
+    with connections[router.db_for_read(StudyDay)].cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchone()
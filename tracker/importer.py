@@ -0,0 +1,228 @@
+import csv
+import json
+import time
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils.dateparse import parse_date
+
+from . import cache, cube, forecast, live, rollups, tasks
+from .models import StudyDay
+
+FORMAT_CSV = 'csv'
+FORMAT_JSONL = 'jsonl'
+FORMATS = (FORMAT_CSV, FORMAT_JSONL)
+
+SCORE_FIELDS = ('mood', 'fatigue', 'productivity')
+
+# поля формы по choices модели (TypedChoiceField) — одни на все строки, без ModelForm
+# на каждую: "4.7", 4.7 и True не проходят проверку, а не усекаются до 4
+SCORE_FORM_FIELDS = {name: StudyDay._meta.get_field(name).formfield() for name in SCORE_FIELDS}
+
+MAX_REPORTED_ERRORS = 50
+
+
+def detect_format(filename, default=FORMAT_CSV):
+    name = (filename or '').lower()
+    if name.endswith(('.jsonl', '.ndjson', '.json')):
+        return FORMAT_JSONL
+    if name.endswith('.csv'):
+        return FORMAT_CSV
+    return default
+
+
+# =========================
+# ЧТЕНИЕ ИСТОЧНИКА
+# =========================
+def read_csv(stream):
+    reader = csv.DictReader(stream)
+    for record in reader:
+        yield reader.line_num, record
+
+
+def read_jsonl(stream):
+    for line_num, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_num, json.loads(line)
+        except ValueError as exc:
+            yield line_num, exc
+
+
+def read_records(stream, fmt):
+    if fmt == FORMAT_JSONL:
+        return read_jsonl(stream)
+    return read_csv(stream)
+
+
+# =========================
+# ПРОВЕРКА СТРОК
+# =========================
+def clean_record(record):
+    if isinstance(record, Exception):
+        raise ValueError(f'некорректный JSON: {record}')
+    if not isinstance(record, dict):
+        raise ValueError('ожидается объект с полями date, mood, fatigue, productivity')
+
+    raw_date = record.get('date')
+    try:
+        day = parse_date(str(raw_date or ''))
+    except ValueError:
+        day = None
+    if day is None:
+        raise ValueError(f'некорректная дата: {raw_date!r}')
+
+    scores = []
+    for name in SCORE_FIELDS:
+        raw = record.get(name)
+        try:
+            scores.append(SCORE_FORM_FIELDS[name].clean(raw.strip() if isinstance(raw, str) else raw))
+        except ValidationError:
+            raise ValueError(f'{name}: ожидается целое число от 1 до 5, получено {raw!r}')
+
+    comment = record.get('comment') or ''
+    return (day, *scores, str(comment))
+
+
+# =========================
+# ОТЧЁТ
+# =========================
+class ImportReport:
+    def __init__(self):
+        self.total = 0
+        self.created = 0
+        self.updated = 0
+        # строки, перекрытые более поздней строкой той же даты в пачке (upsert)
+        self.duplicates = 0
+        self.invalid = 0
+        self.batches = 0
+        self.errors = []
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def add_error(self, line_num, message):
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line_num, 'error': message})
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def rows_per_second(self):
+        return (self.created + self.updated) / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            'total': self.total,
+            'created': self.created,
+            'updated': self.updated,
+            'duplicates': self.duplicates,
+            'invalid': self.invalid,
+            'batches': self.batches,
+            'seconds': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+            'errors': self.errors,
+        }
+
+
+# =========================
+# ЗАПИСЬ ПАЧКАМИ
+# =========================
+def write_batch(batch, upsert, report, user_id=None):
+    deltas = {}
+    cells = {}
+    to_create = []
+    to_update = []
+
+    with transaction.atomic():
+        if upsert:
+            # последняя строка за дату внутри пачки перекрывает предыдущие;
+            # обновлённые — только дни, которые уже были в базе
+            by_date = {row[0]: row for row in batch}
+            report.duplicates += len(batch) - len(by_date)
+
+            existing = {}
+            existing_qs = StudyDay.objects.filter(user_id=user_id, date__in=list(by_date))
+            for day in existing_qs.order_by('pk'):
+                existing.setdefault(day.date, day)
+
+            for date, row in by_date.items():
+                day = existing.get(date)
+                if day is None:
+                    to_create.append(row)
+                    continue
+                previous = [(day.date, day.mood, day.fatigue, day.productivity)]
+                rollups.merge_deltas(deltas, rollups.collect_deltas(previous, sign=-1))
+                cube.merge(cells, cube.collect(previous, sign=-1))
+                _, day.mood, day.fatigue, day.productivity, day.comment = row
+                to_update.append(day)
+        else:
+            to_create = batch
+
+        StudyDay.objects.bulk_create([
+            StudyDay(
+                user_id=user_id, date=date, mood=mood,
+                fatigue=fatigue, productivity=productivity, comment=comment,
+            )
+            for date, mood, fatigue, productivity, comment in to_create
+        ])
+        if to_update:
+            StudyDay.objects.bulk_update(to_update, ['mood', 'fatigue', 'productivity', 'comment'])
+
+        # метрики и куб оценок обновляются один раз на пачку, а не на каждую строку
+        written = (
+            [row[:4] for row in to_create]
+            + [(day.date, day.mood, day.fatigue, day.productivity) for day in to_update]
+        )
+        rollups.merge_deltas(deltas, rollups.collect_deltas(written))
+        rollups.apply_deltas(deltas, user_id)
+        cube.merge(cells, cube.collect(written))
+        cube.apply(cells, user_id)
+
+        dates = [row[0] for row in batch]
+        forecast.invalidate(min(dates), user_id)
+        tasks.schedule_recompute(user_id)
+        # версии — в той же транзакции: веб-процессы увидят новые данные вместе с ними
+        cache.bump_version(user_id)
+        cache.bump_buckets(dates, user_id)
+
+    report.created += len(to_create)
+    report.updated += len(to_update)
+    report.batches += 1
+
+
+def import_records(records, batch_size=1000, upsert=False, user_id=None):
+    report = ImportReport()
+    batch = []
+
+    for line_num, record in records:
+        report.total += 1
+        try:
+            batch.append(clean_record(record))
+        except ValueError as exc:
+            report.add_error(line_num, str(exc))
+            continue
+
+        if len(batch) >= batch_size:
+            write_batch(batch, upsert, report, user_id)
+            batch = []
+
+    if batch:
+        write_batch(batch, upsert, report, user_id)
+
+    # одно событие на импорт, а не на каждую строку
+    if report.created or report.updated:
+        live.publish_import(report.created + report.updated, user_id)
+
+    report.finished = time.perf_counter()
+    return report
+
+
+def import_stream(stream, fmt=FORMAT_CSV, batch_size=1000, upsert=False, user_id=None):
+    return import_records(
+        read_records(stream, fmt), batch_size=batch_size, upsert=upsert, user_id=user_id
+    )
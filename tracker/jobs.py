@@ -0,0 +1,213 @@
+import logging
+import threading
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.db import IntegrityError, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+# пауза перед повтором удваивается с каждой неудачной попыткой
+RETRY_DELAY = 5
+# задача дольше этого в статусе running — её воркер завершился, не дойдя до конца
+STALE_AFTER = 10 * 60
+
+TASKS = {}
+
+
+class Task:
+    def __init__(self, name, func, max_attempts=MAX_ATTEMPTS):
+        self.name = name
+        self.func = func
+        self.max_attempts = max_attempts
+
+
+def task(name=None, max_attempts=MAX_ATTEMPTS):
+    """
+    Регистрирует функцию как задачу очереди. Параметры задачи хранятся
+    в JSON и передаются функции именованными аргументами.
+    """
+    def register(func):
+        TASKS[name or func.__name__] = Task(name or func.__name__, func, max_attempts)
+        return func
+    return register
+
+
+# =========================
+# ПОСТАНОВКА В ОЧЕРЕДЬ
+# =========================
+def enqueue(name, payload=None, key=''):
+    """
+    Ставит задачу в очередь. Задачи с одинаковым ключом объединяются: пока
+    ожидающая задача не взята воркером, новые постановки только заменяют
+    её параметры — сто сохранённых дней дают один пересчёт.
+
+    Запись идёт в ту же базу и транзакцию, что и изменение данных, поэтому
+    задача появляется в очереди тогда и только тогда, когда запись сохранена.
+    """
+    if name not in TASKS:
+        raise LookupError(f'неизвестная задача {name}')
+    payload = payload or {}
+
+    for _ in range(2):
+        if key and Job.objects.filter(key=key, status=Job.STATUS_PENDING).update(payload=payload):
+            return
+        try:
+            with transaction.atomic():
+                Job.objects.create(name=name, key=key, payload=payload, run_after=timezone.now())
+            return
+        except IntegrityError:
+            # другой процесс успел поставить задачу с тем же ключом — сливаемся с ней
+            continue
+    raise IntegrityError(f'не удалось поставить задачу {name} с ключом {key}')
+
+
+def is_queued(key):
+    # задача с ключом ждёт воркера или выполняется; окончательно упавшие не считаются
+    return Job.objects.filter(key=key).exclude(status=Job.STATUS_FAILED).exists()
+
+
+# =========================
+# ВЫПОЛНЕНИЕ
+# =========================
+def claim():
+    """
+    Следующая готовая задача, переведённая в running. Захват — условный
+    UPDATE по статусу: из двух воркеров задачу получает тот, чей UPDATE
+    изменил строку. Задачи с ключом, который уже выполняется, ждут —
+    одна и та же сводка не пересчитывается двумя потоками одновременно.
+    """
+    running_keys = Job.objects.filter(status=Job.STATUS_RUNNING).exclude(key='').values('key')
+    while True:
+        now = timezone.now()
+        job = (
+            Job.objects
+            .filter(status=Job.STATUS_PENDING, run_after__lte=now)
+            .exclude(key__in=running_keys)
+            .order_by('run_after', 'id')
+            .first()
+        )
+        if job is None:
+            return None
+
+        claimed = Job.objects.filter(pk=job.pk, status=Job.STATUS_PENDING).update(
+            status=Job.STATUS_RUNNING, locked_at=now, attempts=F('attempts') + 1
+        )
+        if claimed:
+            job.status = Job.STATUS_RUNNING
+            job.locked_at = now
+            job.attempts += 1
+            return job
+
+
+def execute(job):
+    # успешная задача удаляется, неудачная — повторяется или остаётся со статусом failed
+    spec = TASKS.get(job.name)
+    try:
+        if spec is None:
+            raise LookupError(f'неизвестная задача {job.name}')
+        spec.func(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        if spec is not None and job.attempts < spec.max_attempts:
+            delay = RETRY_DELAY * 2 ** (job.attempts - 1)
+            logger.warning('Задача %s упала, повтор через %s с', job, delay)
+            reschedule(job, timezone.now() + timedelta(seconds=delay), error)
+        else:
+            logger.error('Задача %s не выполнена:\n%s', job, error)
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.STATUS_FAILED, locked_at=None, last_error=error
+            )
+        return False
+
+    Job.objects.filter(pk=job.pk).delete()
+    return True
+
+
+def reschedule(job, run_after, error=''):
+    try:
+        with transaction.atomic():
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.STATUS_PENDING, run_after=run_after, locked_at=None, last_error=error
+            )
+    except IntegrityError:
+        # пока задача выполнялась, поставили новую с тем же ключом — она и есть повтор
+        Job.objects.filter(pk=job.pk).delete()
+
+
+def requeue_stale(older_than=STALE_AFTER):
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    stale = list(Job.objects.filter(status=Job.STATUS_RUNNING, locked_at__lt=cutoff))
+    for job in stale:
+        reschedule(job, timezone.now(), 'воркер завершился во время выполнения')
+    return len(stale)
+
+
+def run_pending():
+    # все готовые задачи в текущем потоке — для --once без пула и для тестов
+    done = 0
+    while (job := claim()) is not None:
+        execute(job)
+        done += 1
+    return done
+
+
+# =========================
+# ВОРКЕР
+# =========================
+class Worker:
+    """
+    Пул потоков, выполняющих задачи из таблицы Job. Главный поток опрашивает
+    очередь и раздаёт задачи, пока заняты не все потоки; у каждого потока
+    своё подключение к базе, которое закрывается после задачи.
+    """
+
+    def __init__(self, threads=2, poll=1.0):
+        self.threads = threads
+        self.poll = poll
+        self.stopping = threading.Event()
+        self.done = 0
+
+    def stop(self):
+        self.stopping.set()
+
+    def run(self, once=False):
+        requeue_stale()
+        last_requeue = timezone.now()
+        running = set()
+
+        with ThreadPoolExecutor(self.threads, thread_name_prefix='tracker-job') as pool:
+            while not self.stopping.is_set():
+                claimed = False
+                while len(running) < self.threads and (job := claim()) is not None:
+                    running.add(pool.submit(self._execute, job))
+                    claimed = True
+
+                if once and not claimed and not running:
+                    break
+                if running:
+                    finished, running = wait(running, timeout=self.poll, return_when=FIRST_COMPLETED)
+                    self.done += len(finished)
+                elif not claimed:
+                    self.stopping.wait(self.poll)
+
+                if timezone.now() - last_requeue > timedelta(seconds=STALE_AFTER):
+                    requeue_stale()
+                    last_requeue = timezone.now()
+
+            finished, _ = wait(running)
+            self.done += len(finished)
+        return self.done
+
+    @staticmethod
+    def _execute(job):
+        try:
+            return execute(job)
+        finally:
+            connections.close_all()
@@ -0,0 +1,336 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.utils import timezone
+
+from . import cache, rollups
+from .analytics import DayRow
+from .models import LiveEvent
+from .pagination import row_payload
+from .routers import use_primary
+
+logger = logging.getLogger(__name__)
+
+KIND_DAY = 'day'
+KIND_DAY_DELETED = 'day_deleted'
+KIND_DAYS_IMPORTED = 'days_imported'
+KIND_RECOMMENDATIONS = 'recommendations'
+
+# опрос таблицы событий, когда запись пришла из другого процесса (воркер,
+# другой воркер uvicorn); запись из этого же процесса будит опрос сразу
+POLL_INTERVAL = 0.25
+HEARTBEAT = 15
+# столько сообщений может ждать медленный клиент, дальше он перезагружает страницу
+SUBSCRIBER_BUFFER = 64
+RETENTION = 10 * 60
+PRUNE_EVERY = 100
+# версия данных на странице и время события пишутся в разных местах —
+# повтор начинается с запасом, события применяются идемпотентно
+REPLAY_SLACK = timedelta(seconds=1)
+
+PING = b': ping\n\n'
+
+
+# =========================
+# ПУБЛИКАЦИЯ (синхронный код: сигналы, импорт, воркер)
+# =========================
+def totals_payload(user_id=None):
+    # средние по всем данным владельца — из месячных метрик, один запрос
+    with use_primary():
+        totals = rollups.range_totals(None, None, user_id)
+    return {
+        'days_total': totals[0],
+        'averages': rollups.averages(totals),
+        'version': cache.data_version(user_id),
+    }
+
+
+def publish(kind, payload, user_id=None):
+    """
+    Событие для открытых дашбордов владельца. Пишется в текущей транзакции:
+    откат записи отменяет и событие. Раз в PRUNE_EVERY событий удаляются
+    те, что старше RETENTION, — отключившемуся дольше клиенту нужна перезагрузка.
+    """
+    event = LiveEvent.objects.create(
+        user_id=user_id, kind=kind, payload={**payload, 'ts': time.time()}
+    )
+    if event.pk % PRUNE_EVERY == 0:
+        LiveEvent.objects.filter(created_at__lt=timezone.now() - timedelta(seconds=RETENTION)).delete()
+    transaction.on_commit(broker.notify)
+    return event
+
+
+def publish_day(day):
+    row = DayRow(day.pk, day.date, day.mood, day.fatigue, day.productivity, day.comment)
+    publish(KIND_DAY, {'day': row_payload(row), **totals_payload(day.user_id)}, day.user_id)
+
+
+def publish_day_deleted(day_id, user_id=None):
+    publish(KIND_DAY_DELETED, {'id': day_id, **totals_payload(user_id)}, user_id)
+
+
+def publish_import(count, user_id=None):
+    publish(KIND_DAYS_IMPORTED, {'count': count, **totals_payload(user_id)}, user_id)
+
+
+def publish_recommendations(items, user_id=None):
+    # только если набор правил изменился по сравнению с прошлым событием
+    items = [
+        {'type': item['type'], 'icon': item['icon'], 'rule': item['rule'], 'text': item['text']}
+        for item in items
+    ]
+    previous = (
+        LiveEvent.objects
+        .filter(user_id=user_id, kind=KIND_RECOMMENDATIONS)
+        .order_by('-id')
+        .values_list('payload', flat=True)
+        .first()
+    )
+    if previous is not None and previous['items'] == items:
+        return None
+
+    rules = [item['rule'] for item in items]
+    old_rules = [item['rule'] for item in previous['items']] if previous else []
+    return publish(KIND_RECOMMENDATIONS, {
+        'items': items,
+        'added': [rule for rule in rules if rule not in old_rules],
+        'removed': [rule for rule in old_rules if rule not in rules],
+    }, user_id)
+
+
+def encode(event_id, kind, payload):
+    data = json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+    return f'id: {event_id}\nevent: {kind}\ndata: {data}\n\n'.encode()
+
+
+# =========================
+# ЧТЕНИЕ СОБЫТИЙ
+# =========================
+EVENT_FIELDS = ('id', 'user', 'kind', 'payload')
+
+
+def last_event_id():
+    return LiveEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def events_after(event_id, limit=1000):
+    return list(
+        LiveEvent.objects.filter(id__gt=event_id).order_by('id').values_list(*EVENT_FIELDS)[:limit]
+    )
+
+
+def replay(user_id, up_to, after_id=None, since=None):
+    # пропущенное клиентом: после Last-Event-ID или после версии данных страницы
+    events = LiveEvent.objects.filter(user_id=user_id, id__lte=up_to)
+    if after_id is not None:
+        events = events.filter(id__gt=after_id)
+    elif since is not None:
+        since = datetime.fromtimestamp(since / 1000, tz=dt_timezone.utc) - REPLAY_SLACK
+        events = events.filter(created_at__gte=since)
+    else:
+        return []
+    return list(events.order_by('id').values_list(*EVENT_FIELDS))
+
+
+# =========================
+# РАССЫЛКА ПОДПИСЧИКАМ
+# =========================
+class Subscriber:
+    """
+    Очередь одного SSE-соединения. Сообщения — готовые байты, общие для
+    всех подписчиков события; ожидание — одно asyncio.Event, без задачи
+    на каждое сообщение.
+    """
+
+    __slots__ = ('user_id', 'messages', 'ready', 'closed', 'overflowed', 'replaying')
+
+    def __init__(self, user_id=None):
+        self.user_id = user_id
+        self.messages = []
+        self.ready = asyncio.Event()
+        self.closed = False
+        self.overflowed = False
+        # пока читаются пропущенные события, живые копятся следом за ними
+        self.replaying = True
+
+    def push(self, message):
+        if len(self.messages) >= SUBSCRIBER_BUFFER and not self.replaying:
+            self.overflowed = True
+        else:
+            self.messages.append(message)
+        self.ready.set()
+
+    def close(self):
+        self.closed = True
+        self.ready.set()
+
+    async def drain(self):
+        while not self.messages and not self.closed and not self.overflowed:
+            self.ready.clear()
+            await self.ready.wait()
+        messages, self.messages = self.messages, []
+        return messages
+
+
+class Broker:
+    """
+    Рассылка событий внутри процесса. Один опрос таблицы LiveEvent на процесс,
+    сколько бы дашбордов ни было открыто; каждое событие сериализуется один
+    раз и раздаётся только подписчикам его владельца. Опрос работает, пока
+    есть подписчики.
+    """
+
+    def __init__(self):
+        self.subscribers = {}
+        self.loop = None
+        self.wakeup = None
+        self.task = None
+        self.last_id = None
+        self.dispatched = 0
+
+    def _bind(self):
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            # новый цикл событий (перезапуск сервера, тесты) — прежние подписчики недоступны
+            self.loop = loop
+            self.wakeup = asyncio.Event()
+            self.subscribers = {}
+            self.task = None
+            self.last_id = None
+        return loop
+
+    def register(self, user_id=None):
+        self._bind()
+        subscriber = Subscriber(user_id)
+        self.subscribers.setdefault(user_id, set()).add(subscriber)
+        return subscriber
+
+    async def subscribe(self, user_id=None, after_id=None, since=None):
+        loop = self._bind()
+        if self.last_id is None:
+            self.last_id = await sync_to_async(last_event_id, thread_sensitive=False)()
+
+        subscriber = self.register(user_id)
+        up_to = self.last_id
+        try:
+            missed = await sync_to_async(replay, thread_sensitive=False)(user_id, up_to, after_id, since)
+        except Exception:
+            self.unsubscribe(subscriber)
+            raise
+        # события, разосланные во время повтора, новее up_to — они идут следом
+        live = subscriber.messages
+        subscriber.messages = [encode(event_id, kind, payload) for event_id, _, kind, payload in missed]
+        subscriber.messages += live
+        subscriber.replaying = False
+
+        if self.task is None or self.task.done():
+            self.task = loop.create_task(self._poll())
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        subscribers = self.subscribers.get(subscriber.user_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.subscribers[subscriber.user_id]
+        subscriber.close()
+
+    def count(self):
+        return sum(len(subscribers) for subscribers in self.subscribers.values())
+
+    def notify(self):
+        # из любого потока: запись этого процесса закоммичена — опросить сразу
+        loop = self.loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self.wakeup.set)
+
+    def dispatch(self, event_id, user_id, kind, payload):
+        self.last_id = max(self.last_id or 0, event_id)
+        subscribers = self.subscribers.get(user_id)
+        if not subscribers:
+            return 0
+        message = encode(event_id, kind, payload)
+        for subscriber in subscribers:
+            subscriber.push(message)
+        self.dispatched += len(subscribers)
+        return len(subscribers)
+
+    def ping(self):
+        for subscribers in self.subscribers.values():
+            for subscriber in subscribers:
+                subscriber.push(PING)
+
+    async def _poll(self):
+        last_ping = time.monotonic()
+        fetch = sync_to_async(events_after, thread_sensitive=False)
+        while self.subscribers:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+
+            try:
+                events = await fetch(self.last_id)
+            except Exception:
+                # база занята или недоступна — следующий опрос повторит чтение
+                logger.exception('Не удалось прочитать события для дашбордов')
+                continue
+            for event in events:
+                self.dispatch(*event)
+
+            if time.monotonic() - last_ping >= HEARTBEAT:
+                self.ping()
+                last_ping = time.monotonic()
+        self.task = None
+
+
+broker = Broker()
+
+
+# =========================
+# ПОТОК SSE
+# =========================
+async def stream(subscriber, receive=None):
+    """
+    Тело ответа text/event-stream. receive — канал ASGI: Django 4.2 не
+    прерывает потоковый ответ при отключении клиента, поэтому отдельная
+    задача ждёт http.disconnect и закрывает подписку.
+    """
+    watcher = None
+    if receive is not None:
+        async def watch():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+            subscriber.close()
+        watcher = asyncio.get_running_loop().create_task(watch())
+
+    try:
+        yield b'retry: 3000\n\n'
+        while True:
+            messages = await subscriber.drain()
+            if messages:
+                yield b''.join(messages)
+            if subscriber.overflowed:
+                yield b'event: reload\ndata: {}\n\n'
+                return
+            if subscriber.closed:
+                return
+    finally:
+        broker.unsubscribe(subscriber)
+        if watcher is not None:
+            watcher.cancel()
+
+
+def expose_receive(application):
+    # ASGI-обёртка: канал receive в scope, чтобы поток SSE заметил отключение клиента
+    async def app(scope, receive, send):
+        if scope['type'] == 'http':
+            scope = {**scope, 'tracker.receive': receive}
+        return await application(scope, receive, send)
+    return app
@@ -0,0 +1,259 @@
+import json
+import math
+import os
+import platform
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import Client
+from django.test.utils import override_settings
+
+from tracker import cache, cube, exporter, importer, rollups, tasks
+from tracker.benchmarks import regressions, summarize
+from tracker.models import StudyDay
+from tracker.routers import analytics_alias
+from tracker.synthetic import DEFAULT_START, generate_days
+
+# синтетические даты начинаются с 2000 года: при больших объёмах на одну дату
+# приходится несколько строк, чтобы не выйти за пределы календаря
+MAX_SPAN_DAYS = 36_500
+IMPORT_ROWS = 10_000
+RANGE_DAYS = 365
+
+INSERT = (
+    f'INSERT INTO {StudyDay._meta.db_table} '
+    f'(date, mood, fatigue, productivity, comment, created_at) VALUES (%s, %s, %s, %s, %s, %s)'
+)
+
+CASES = (
+    'list_all',
+    'list_range',
+    'analytics_data',
+    'recommendations',
+    'admin_changelist',
+    'import',
+    'export_csv',
+    'export_columnar',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Набор замеров на синтетических данных во временной базе: главная страница, '
+        'analytics_data, рекомендации, список в админке, импорт и выгрузка. '
+        'Пишет JSON с перцентилями и с --baseline завершается ошибкой при регрессии p50'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, nargs='+', default=[1_000, 100_000],
+            help='объёмы данных, от 1 тыс. до 10 млн строк',
+        )
+        parser.add_argument('--repeat', type=int, default=5, help='замеров на случай')
+        parser.add_argument('--cases', nargs='+', choices=CASES, default=list(CASES))
+        parser.add_argument('--output', help='куда записать JSON с результатами')
+        parser.add_argument('--baseline', help='JSON прошлого прогона для сравнения')
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='допустимый рост p50 относительно --baseline (0.2 = 20 %%)',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as fh:
+                baseline = json.load(fh)
+
+        results = {}
+        for rows in options['rows']:
+            if not 1 <= rows <= 10_000_000:
+                raise CommandError('--rows: от 1 до 10 000 000')
+            with self.scratch_database():
+                self.seed(rows, options['seed'])
+                results[str(rows)] = self.run_cases(rows, options)
+
+        report = {
+            'meta': {
+                'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'sqlite': sqlite3.sqlite_version,
+                'repeat': options['repeat'],
+                'seed': options['seed'],
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2, ensure_ascii=False)
+            self.stdout.write(f'Результаты записаны в {options["output"]}')
+
+        if baseline is not None:
+            found = regressions(results, baseline.get('results', {}), options['threshold'])
+            if found:
+                lines = [
+                    f'{size} строк, {case}: p50 {before:.1f} → {after:.1f} мс'
+                    for size, case, before, after in found
+                ]
+                raise CommandError('Регрессия производительности:\n' + '\n'.join(lines))
+            self.stdout.write(f'Регрессий относительно {options["baseline"]} нет')
+
+    # =========================
+    # ВРЕМЕННАЯ БАЗА
+    # =========================
+    @contextmanager
+    def scratch_database(self):
+        # миграции применяются к отдельному файлу, рабочая база не затрагивается
+        connection = connections[DEFAULT_DB_ALIAS]
+        path = tempfile.mktemp(suffix='.sqlite3')
+        old_name = connection.settings_dict['NAME']
+        old_test_name = connection.settings_dict['TEST'].get('NAME')
+        connection.settings_dict['TEST']['NAME'] = path
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+        # псевдоним analytics смотрит на тот же файл — маршрутизатор читает из default
+        mirrors = {}
+        for alias in connections:
+            if alias != DEFAULT_DB_ALIAS:
+                mirrors[alias] = connections[alias].settings_dict['NAME']
+                connections[alias].close()
+                connections[alias].creation.set_as_test_mirror(connection.settings_dict)
+        if analytics_alias() is not None:
+            raise CommandError('псевдоним analytics не переключился на временную базу')
+
+        cache.response_cache.clear()
+        self.stdout.write(f'Временная база {path}')
+        try:
+            yield path
+        finally:
+            for alias, name in mirrors.items():
+                connections[alias].close()
+                connections[alias].settings_dict['NAME'] = name
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            connection.settings_dict['TEST']['NAME'] = old_test_name
+            for suffix in ('-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+            cache.response_cache.clear()
+
+    def seed(self, rows, seed, batch_size=10_000):
+        started = time.perf_counter()
+        per_day = max(1, math.ceil(rows / MAX_SPAN_DAYS))
+        created_at = datetime(2000, 1, 1, tzinfo=timezone.utc).isoformat(' ')
+        days = generate_days(rows, seed=seed, per_day=per_day)
+
+        connection = connections[DEFAULT_DB_ALIAS]
+        with connection.cursor() as cursor:
+            batch = []
+            for day, mood, fatigue, productivity in days:
+                batch.append((day.isoformat(), mood, fatigue, productivity, '', created_at))
+                if len(batch) >= batch_size:
+                    cursor.executemany(INSERT, batch)
+                    batch = []
+            if batch:
+                cursor.executemany(INSERT, batch)
+            cursor.execute('ANALYZE')
+
+        rollups.rebuild()
+        cube.rebuild()
+        self.last_day = DEFAULT_START + timedelta(days=(rows - 1) // per_day)
+        self.stdout.write(
+            f'Заполнено {rows:,} строк за {time.perf_counter() - started:.1f} с'
+        )
+
+    # =========================
+    # СЛУЧАИ
+    # =========================
+    def run_cases(self, rows, options):
+        client = Client()
+        admin = get_user_model().objects.create_superuser('bench-admin', password='bench')
+        range_from = (self.last_day - timedelta(days=RANGE_DAYS - 1)).isoformat()
+        range_query = f'?date_from={range_from}&date_to={self.last_day.isoformat()}'
+        import_rows = min(rows, IMPORT_ROWS)
+
+        def get(path):
+            def run():
+                # каждый замер — без ответа в кэше, как первый запрос после записи
+                cache.response_cache.clear()
+                response = client.get(path)
+                if response.status_code != 200:
+                    raise CommandError(f'{path}: ответ {response.status_code}')
+                if response.streaming:
+                    for _ in response.streaming_content:
+                        pass
+            return run
+
+        def admin_changelist():
+            client.force_login(admin)
+            try:
+                get('/admin/tracker/studyday/')()
+            finally:
+                client.logout()
+
+        def recommendation_cycle():
+            # пересчёт, который после сохранения дня выполняет воркер
+            tasks.refresh_recommendations()
+
+        counter = iter(range(1_000_000))
+
+        def import_batch():
+            # каждый повтор — новый пользователь, чтобы вставлять, а не обновлять
+            owner = get_user_model().objects.create_user(f'bench-import-{next(counter)}')
+            records = (
+                (line, {
+                    'date': day.isoformat(), 'mood': mood,
+                    'fatigue': fatigue, 'productivity': productivity,
+                })
+                for line, (day, mood, fatigue, productivity)
+                in enumerate(generate_days(import_rows, seed=options['seed']), start=2)
+            )
+            report = importer.import_records(records, user_id=owner.pk)
+            if report.errors:
+                raise CommandError(f'импорт: {report.errors[:3]}')
+
+        def export(fmt):
+            def run():
+                for _ in exporter.export_chunks(fmt):
+                    pass
+            return run
+
+        cases = {
+            'list_all': get('/'),
+            'list_range': get('/' + range_query),
+            'analytics_data': get('/analytics/data/?max_points=1000'),
+            'recommendations': recommendation_cycle,
+            'admin_changelist': admin_changelist,
+            'import': import_batch,
+            'export_csv': export(exporter.FORMAT_CSV),
+            'export_columnar': export(exporter.FORMAT_COLUMNAR),
+        }
+
+        self.stdout.write(
+            f'{"строк":>10} {"случай":<18} {"p50":>10} {"p95":>10} {"p99":>10} {"макс":>10}'
+        )
+        results = {}
+        with override_settings(ALLOWED_HOSTS=['testserver', 'localhost']):
+            for name in options['cases']:
+                run = cases[name]
+                run()  # прогрев: импорт модулей, планы запросов, страницы SQLite в кэше
+                timings = []
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    run()
+                    timings.append((time.perf_counter() - started) * 1000)
+                results[name] = summary = summarize(timings)
+                if name == 'import':
+                    summary['rows'] = import_rows
+                self.stdout.write(
+                    f'{rows:>10,} {name:<18} {summary["p50"]:>8.1f}ms {summary["p95"]:>8.1f}ms '
+                    f'{summary["p99"]:>8.1f}ms {summary["max"]:>8.1f}ms'
+                )
+        return results
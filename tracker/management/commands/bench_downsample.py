@@ -0,0 +1,68 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from tracker import downsample, rollups
+from tracker.synthetic import generate_days
+
+
+def payload_size(payload):
+    return len(json.dumps(payload, separators=(',', ':')).encode())
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает размер ответа analytics_data без прореживания и с ним'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[365, 3650, 36500, 365000])
+        parser.add_argument('--max-points', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        max_points = options['max_points']
+
+        self.stdout.write(
+            f'{"строк":>8} {"полный":>10} {"lttb":>10} {"сжатие":>8} {"время":>9} '
+            f'{"календарь":>10} {"сжатие":>8} {"время":>9}'
+        )
+
+        for count in options['rows']:
+            rows = list(generate_days(count, seed=options['seed']))
+            if count <= max_points:
+                self.stdout.write(f'{count:>8}  прореживание не требуется')
+                continue
+
+            full = payload_size({
+                'dates': [day.strftime('%Y-%m-%d') for day, _, _, _ in rows],
+                'mood': [mood for _, mood, _, _ in rows],
+                'fatigue': [fatigue for _, _, fatigue, _ in rows],
+                'productivity': [productivity for _, _, _, productivity in rows],
+            })
+
+            started = time.perf_counter()
+            lttb = payload_size(downsample.lttb_payload(rows, max_points))
+            lttb_time = (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            first, last = rows[0][0], rows[-1][0]
+            period = downsample.calendar_period(first, last, max_points)
+            deltas = rollups.collect_deltas(rows)
+            series_rows = sorted(
+                (start, *values)
+                for (bucket_period, start), values in deltas.items()
+                if bucket_period == period
+            )
+            calendar = payload_size(downsample.calendar_payload(series_rows, period))
+            calendar_time = (time.perf_counter() - started) * 1000
+
+            self.stdout.write(
+                f'{count:>8} {full / 1024:>8.1f}KB {lttb / 1024:>8.1f}KB {full / lttb:>7.1f}x '
+                f'{lttb_time:>7.1f}ms {calendar / 1024:>8.1f}KB {full / calendar:>7.1f}x '
+                f'{calendar_time:>7.1f}ms'
+            )
+
+        self.stdout.write(
+            'Время календарного режима включает свёртку строк в памяти; '
+            'в представлении он читает готовые метрики StudyMetric.'
+        )
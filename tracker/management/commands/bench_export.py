@@ -0,0 +1,63 @@
+import csv
+import io
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from tracker import exporter
+from tracker.synthetic import generate_days
+
+
+class Command(BaseCommand):
+    help = 'Замеряет скорость и размер выгрузки в CSV, JSONL и колоночном формате'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        count = options['rows']
+        rows = [(*row, '') for row in generate_days(count, seed=options['seed'])]
+
+        writers = {
+            exporter.FORMAT_CSV: lambda: exporter.csv_lines(rows, exporter.DAY_FIELDS),
+            exporter.FORMAT_JSONL: lambda: exporter.jsonl_lines(rows, exporter.DAY_FIELDS),
+            exporter.FORMAT_COLUMNAR: lambda: exporter.columnar_blocks(rows),
+        }
+
+        self.stdout.write(
+            f'{"формат":<10} {"размер":>10} {"байт/строку":>12} {"запись":>10} '
+            f'{"строк/с":>12} {"МБ/с":>8} {"загрузка":>10}'
+        )
+
+        for fmt, writer in writers.items():
+            started = time.perf_counter()
+            size = 0
+            data = []
+            for chunk in writer():
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                size += len(chunk)
+                data.append(chunk)
+            elapsed = time.perf_counter() - started
+
+            load = self.load_time(fmt, b''.join(data))
+
+            self.stdout.write(
+                f'{fmt:<10} {size / 2 ** 20:>8.1f}MB {size / count:>12.1f} {elapsed:>9.2f}s '
+                f'{count / elapsed:>12,.0f} {size / 2 ** 20 / elapsed:>8.1f} {load:>9.3f}s'
+            )
+
+    @staticmethod
+    def load_time(fmt, payload):
+        started = time.perf_counter()
+        if fmt == exporter.FORMAT_COLUMNAR:
+            exporter.read_columnar(io.BytesIO(payload))
+        elif fmt == exporter.FORMAT_JSONL:
+            for line in payload.decode().splitlines():
+                json.loads(line)
+        else:
+            for _ in csv.reader(io.StringIO(payload.decode())):
+                pass
+        return time.perf_counter() - started
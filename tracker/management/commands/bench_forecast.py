@@ -0,0 +1,128 @@
+import json
+import math
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tracker.forecast import Forecaster
+from tracker.synthetic import generate_days
+
+
+def errors(pairs):
+    # (MAE, RMSE) по парам (прогноз, факт)
+    if not pairs:
+        return None, None
+    mae = sum(abs(predicted - actual) for predicted, actual in pairs) / len(pairs)
+    rmse = math.sqrt(sum((predicted - actual) ** 2 for predicted, actual in pairs) / len(pairs))
+    return round(mae, 4), round(rmse, 4)
+
+
+class Command(BaseCommand):
+    help = (
+        'Бэктест прогноза продуктивности на синтетической истории: обучение на начале ряда, '
+        'затем скользящий прогноз на --horizon дней с дообучением по одному дню. '
+        'Сравнивает точность с наивными прогнозами и показывает время обучения'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, nargs='+', default=[100_000])
+        parser.add_argument('--test-days', type=int, default=1_000)
+        parser.add_argument('--horizon', type=int, default=7)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='куда записать JSON с результатами')
+
+    def handle(self, *args, **options):
+        horizon = options['horizon']
+        results = {}
+
+        for count in options['days']:
+            if count <= options['test_days'] + horizon:
+                raise CommandError('--days должно быть больше --test-days и --horizon')
+            rows = [
+                (float(mood), float(fatigue), float(productivity))
+                for _, mood, fatigue, productivity in generate_days(count, seed=options['seed'])
+            ]
+            results[str(count)] = self.backtest(rows, options['test_days'], horizon)
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(results, fh, indent=2, ensure_ascii=False)
+            self.stdout.write(f'Результаты записаны в {options["output"]}')
+
+    def backtest(self, rows, test_days, horizon):
+        train, test = rows[:-test_days], rows[-test_days:]
+
+        # ---------- ПОЛНОЕ ОБУЧЕНИЕ ----------
+        started = time.perf_counter()
+        model = Forecaster().fit(train)
+        fit_seconds = time.perf_counter() - started
+
+        # состояние хранится в JSONField — замеряем его размер и разбор
+        started = time.perf_counter()
+        encoded = json.dumps(model.state())
+        model = Forecaster(json.loads(encoded))
+        state_ms = (time.perf_counter() - started) * 1000
+
+        train_mean = sum(row[2] for row in train) / len(train)
+        pairs = {'model': ([], []), 'naive': ([], []), 'mean': ([], [])}
+        forecast_time = update_time = 0.0
+        history = train[-1:]
+
+        # ---------- СКОЛЬЗЯЩИЙ ПРОГНОЗ ----------
+        for index in range(len(test) - horizon + 1):
+            started = time.perf_counter()
+            points = model.forecast(horizon)
+            forecast_time += time.perf_counter() - started
+
+            actual_first = test[index][2]
+            actual_last = test[index + horizon - 1][2]
+            last_seen = history[-1][2]
+            pairs['model'][0].append((points[0][2], actual_first))
+            pairs['model'][1].append((points[-1][2], actual_last))
+            pairs['naive'][0].append((last_seen, actual_first))
+            pairs['naive'][1].append((last_seen, actual_last))
+            pairs['mean'][0].append((train_mean, actual_first))
+            pairs['mean'][1].append((train_mean, actual_last))
+
+            # день наступил — дообучение на нём, как при новой записи
+            started = time.perf_counter()
+            model.update(*test[index])
+            model.solve()
+            update_time += time.perf_counter() - started
+            history = [test[index]]
+
+        steps = len(test) - horizon + 1
+        result = {
+            'train_days': len(train),
+            'test_days': len(test),
+            'horizon': horizon,
+            'fit_seconds': round(fit_seconds, 3),
+            'fit_us_per_day': round(fit_seconds / len(train) * 1e6, 2),
+            'update_us': round(update_time / steps * 1e6, 1),
+            'forecast_us': round(forecast_time / steps * 1e6, 1),
+            'state_bytes': len(encoded),
+            'state_roundtrip_ms': round(state_ms, 3),
+            'accuracy': {},
+        }
+
+        self.stdout.write(
+            f'{len(rows):,} дней: обучение {fit_seconds:.2f} с '
+            f'({result["fit_us_per_day"]} мкс/день), дообучение {result["update_us"]} мкс, '
+            f'прогноз на {horizon} дн. {result["forecast_us"]} мкс, '
+            f'состояние {len(encoded)} байт'
+        )
+        self.stdout.write(
+            f'{"метод":<8} {"MAE t+1":>9} {"RMSE t+1":>9} '
+            f'{"MAE t+" + str(horizon):>9} {"RMSE t+" + str(horizon):>9}'
+        )
+        for name, (first, last) in pairs.items():
+            mae_first, rmse_first = errors(first)
+            mae_last, rmse_last = errors(last)
+            result['accuracy'][name] = {
+                'mae_1': mae_first, 'rmse_1': rmse_first,
+                f'mae_{horizon}': mae_last, f'rmse_{horizon}': rmse_last,
+            }
+            self.stdout.write(
+                f'{name:<8} {mae_first:>9.3f} {rmse_first:>9.3f} {mae_last:>9.3f} {rmse_last:>9.3f}'
+            )
+        return result
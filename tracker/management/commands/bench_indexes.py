@@ -0,0 +1,148 @@
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from tracker.benchmarks import model_sql, percentiles
+from tracker.models import StudyDay
+from tracker.synthetic import DEFAULT_START, generate_days
+
+TABLE = StudyDay._meta.db_table
+
+# те же запросы, что выполняют представления гостя (общие данные) при фильтре по датам
+QUERIES = {
+    'rows': (
+        f'SELECT date, mood, fatigue, productivity FROM {TABLE} '
+        f'WHERE user_id IS NULL AND date BETWEEN ? AND ? ORDER BY date'
+    ),
+    'averages': (
+        f'SELECT AVG(productivity), AVG(mood), AVG(fatigue) FROM {TABLE} '
+        f'WHERE user_id IS NULL AND date BETWEEN ? AND ?'
+    ),
+    'mood_impact': (
+        f'SELECT mood, AVG(productivity) FROM {TABLE} '
+        f'WHERE user_id IS NULL AND date BETWEEN ? AND ? GROUP BY mood ORDER BY mood'
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет временную SQLite-базу синтетическими днями и замеряет '
+        'запросы по диапазону дат до и после создания индексов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--range-days', type=int, nargs='+', default=[30, 365])
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--db', help='Путь к файлу базы (по умолчанию временный)')
+
+    def handle(self, *args, **options):
+        tables, indexes = model_sql(StudyDay)
+
+        path = options['db'] or tempfile.mktemp(suffix='.sqlite3')
+        conn = sqlite3.connect(path)
+
+        try:
+            for sql in tables:
+                conn.execute(sql)
+
+            self.stdout.write(f'Заполнение {options["rows"]:,} строк...')
+            self.seed(conn, options['rows'], options['seed'])
+
+            ranges = self.make_ranges(options)
+
+            before = self.measure(conn, ranges, options['repeat'])
+
+            started = time.perf_counter()
+            for sql in indexes:
+                conn.execute(sql)
+            conn.execute('ANALYZE')
+            build_time = time.perf_counter() - started
+            self.stdout.write(f'Индексы построены за {build_time:.2f} с')
+
+            after = self.measure(conn, ranges, options['repeat'])
+
+            self.report(before, after)
+        finally:
+            conn.close()
+            if not options['db']:
+                os.remove(path)
+
+    def seed(self, conn, rows, seed):
+        created_at = '2000-01-01 00:00:00'
+        batch = []
+        with conn:
+            for day, mood, fatigue, productivity in generate_days(rows, seed=seed):
+                batch.append((day.isoformat(), mood, fatigue, productivity, '', created_at))
+                if len(batch) >= 10_000:
+                    self.insert(conn, batch)
+                    batch = []
+            if batch:
+                self.insert(conn, batch)
+
+    @staticmethod
+    def insert(conn, batch):
+        conn.executemany(
+            f'INSERT INTO {TABLE} (date, mood, fatigue, productivity, comment, created_at) '
+            f'VALUES (?, ?, ?, ?, ?, ?)',
+            batch,
+        )
+
+    @staticmethod
+    def make_ranges(options):
+        rnd = random.Random(options['seed'])
+        total_days = options['rows']
+        ranges = []
+        for length in options['range_days']:
+            for _ in range(options['repeat']):
+                offset = rnd.randint(0, max(0, total_days - length))
+                start = DEFAULT_START + timedelta(days=offset)
+                end = start + timedelta(days=length - 1)
+                ranges.append((length, start.isoformat(), end.isoformat()))
+        return ranges
+
+    @staticmethod
+    def measure(conn, ranges, repeat):
+        results = {}
+        for name, sql in QUERIES.items():
+            for length, start, end in ranges:
+                started = time.perf_counter()
+                conn.execute(sql, (start, end)).fetchall()
+                elapsed = (time.perf_counter() - started) * 1000
+                results.setdefault((name, length), []).append(elapsed)
+
+            plan = conn.execute(f'EXPLAIN QUERY PLAN {sql}', ('', '')).fetchall()
+            results[(name, 'plan')] = '; '.join(row[-1] for row in plan)
+        return results
+
+    def report(self, before, after):
+        self.stdout.write('')
+        self.stdout.write(
+            f'{"запрос":<12} {"дней":>6} {"до p50":>10} {"до p95":>10} '
+            f'{"после p50":>10} {"после p95":>10} {"ускорение":>10}'
+        )
+        for (name, length), timings in before.items():
+            if length == 'plan':
+                continue
+            new_timings = after[(name, length)]
+            old_p50, old_p95 = percentiles(timings)
+            new_p50, new_p95 = percentiles(new_timings)
+            self.stdout.write(
+                f'{name:<12} {length:>6} {old_p50:>8.2f}ms {old_p95:>8.2f}ms '
+                f'{new_p50:>8.2f}ms {new_p95:>8.2f}ms {old_p50 / new_p50:>9.1f}x'
+            )
+
+        self.stdout.write('')
+        self.stdout.write('План запросов:')
+        for name in QUERIES:
+            self.stdout.write(f'  {name}')
+            self.stdout.write(f'    до:    {before[(name, "plan")]}')
+            self.stdout.write(f'    после: {after[(name, "plan")]}')
+
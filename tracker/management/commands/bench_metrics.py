@@ -0,0 +1,80 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+
+from tracker import metrics
+from tracker.benchmarks import percentiles
+
+MIDDLEWARE_PATH = 'tracker.middleware.PerformanceMiddleware'
+
+
+class Command(BaseCommand):
+    help = (
+        'Накладные расходы PerformanceMiddleware: те же запросы к текущей базе '
+        'с middleware и без него, поочерёдно, плюс стоимость execute_wrapper на один SQL-запрос'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            action='append',
+            help='по умолчанию /, /analytics/data/, /analytics/summary/, /days/page/',
+        )
+        parser.add_argument('--requests', type=int, default=300)
+        parser.add_argument('--queries', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        paths = options['path'] or ['/', '/analytics/data/', '/analytics/summary/', '/days/page/']
+        without = [name for name in settings.MIDDLEWARE if name != MIDDLEWARE_PATH]
+        if MIDDLEWARE_PATH not in settings.MIDDLEWARE:
+            self.stderr.write(f'{MIDDLEWARE_PATH} не подключён в MIDDLEWARE')
+
+        hosts = ['localhost', 'testserver']
+        with override_settings(ALLOWED_HOSTS=hosts):
+            enabled = Client()
+        with override_settings(ALLOWED_HOSTS=hosts, MIDDLEWARE=without):
+            disabled = Client()
+
+        self.stdout.write(f'{"путь":<22} {"без p50":>9} {"с p50":>9} {"разница":>9} {"%":>6}')
+        with override_settings(ALLOWED_HOSTS=hosts):
+            for path in paths:
+                timings = {'on': [], 'off': []}
+                # прогрев: кэш ответов и соединение с базой
+                enabled.get(path)
+                disabled.get(path)
+                for _ in range(options['requests']):
+                    for key, client in (('off', disabled), ('on', enabled)):
+                        started = time.perf_counter()
+                        client.get(path)
+                        timings[key].append((time.perf_counter() - started) * 1000)
+
+                off, _ = percentiles(timings['off'])
+                on, _ = percentiles(timings['on'])
+                self.stdout.write(
+                    f'{path:<22} {off:>7.3f}ms {on:>7.3f}ms {on - off:>7.3f}ms '
+                    f'{(on - off) / off * 100:>5.1f}%'
+                )
+
+        self.stdout.write('')
+        self.stdout.write(f'execute_wrapper на SELECT 1 ({options["queries"]:,} запросов):')
+        with connection.cursor() as cursor:
+            plain = self.time_queries(cursor, options['queries'])
+        stats = metrics.RequestStats()
+        with connection.execute_wrapper(stats), connection.cursor() as cursor:
+            wrapped = self.time_queries(cursor, options['queries'])
+        self.stdout.write(
+            f'  без обёртки {plain:.2f} мкс, с обёрткой {wrapped:.2f} мкс, '
+            f'+{wrapped - plain:.2f} мкс на запрос'
+        )
+
+        metrics.clear()
+
+    @staticmethod
+    def time_queries(cursor, count):
+        started = time.perf_counter()
+        for _ in range(count):
+            cursor.execute('SELECT 1')
+        return (time.perf_counter() - started) / count * 1_000_000
@@ -0,0 +1,169 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tracker.benchmarks import model_sql, percentiles
+from tracker.db import apply_pragmas
+from tracker.models import StudyDay
+from tracker.synthetic import DEFAULT_START, generate_days
+
+TABLE = StudyDay._meta.db_table
+
+# настройки SQLite и Django по умолчанию: журнал отката, synchronous = FULL
+BASELINE = {
+    'journal_mode': 'delete',
+    'synchronous': 'full',
+}
+
+READS = (
+    # график за год — покрывающий индекс
+    f'SELECT date, mood, fatigue, productivity FROM {TABLE} '
+    f'WHERE user_id IS NULL AND date BETWEEN ? AND ? ORDER BY date',
+    # таблица на главной — строки целиком
+    f'SELECT id, date, mood, fatigue, productivity, comment FROM {TABLE} '
+    f'WHERE user_id IS NULL AND date BETWEEN ? AND ? ORDER BY date',
+)
+
+WRITE = (
+    f'INSERT INTO {TABLE} (date, mood, fatigue, productivity, comment, created_at) '
+    f'VALUES (?, ?, ?, ?, \'\', \'2000-01-01 00:00:00\')'
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Смешанная нагрузка чтение/запись на временной SQLite-базе: '
+        'настройки по умолчанию против TRACKER_SQLITE_PRAGMAS'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200_000)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=1)
+        parser.add_argument('--duration', type=float, default=5.0)
+        parser.add_argument('--range-days', type=int, default=365)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        profiles = {
+            'baseline': BASELINE,
+            'tuned': settings.TRACKER_SQLITE_PRAGMAS,
+        }
+
+        self.stdout.write(
+            f'{"профиль":<9} {"чтений/с":>9} {"p50":>8} {"p95":>8} '
+            f'{"записей/с":>10} {"p50":>8} {"p95":>8} {"locked":>7}'
+        )
+        for name, pragmas in profiles.items():
+            path = tempfile.mktemp(suffix='.sqlite3')
+            try:
+                self.prepare(path, pragmas, options)
+                result = self.run(path, pragmas, options)
+            finally:
+                for suffix in ('', '-wal', '-shm', '-journal'):
+                    if os.path.exists(path + suffix):
+                        os.remove(path + suffix)
+            self.report(name, result, options['duration'])
+
+        self.stdout.write('')
+        self.stdout.write('tuned: ' + ', '.join(f'{k}={v}' for k, v in profiles['tuned'].items()))
+
+    def prepare(self, path, pragmas, options):
+        tables, indexes = model_sql(StudyDay)
+        conn = sqlite3.connect(path)
+        apply_pragmas(conn, pragmas)
+        with conn:
+            for sql in tables + indexes:
+                conn.execute(sql)
+            conn.executemany(
+                WRITE,
+                (
+                    (day.isoformat(), mood, fatigue, productivity)
+                    for day, mood, fatigue, productivity
+                    in generate_days(options['rows'], seed=options['seed'])
+                ),
+            )
+        conn.execute('ANALYZE')
+        conn.close()
+
+    def run(self, path, pragmas, options):
+        deadline = time.perf_counter() + options['duration']
+        result = {'reads': [], 'writes': [], 'locked': 0}
+        lock = threading.Lock()
+
+        def reader(index):
+            # читатели открывают файл только для чтения, как псевдоним analytics
+            conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+            apply_pragmas(conn, pragmas, read_only=True)
+            rnd = random.Random(options['seed'] + index)
+            timings, locked = [], 0
+            while time.perf_counter() < deadline:
+                offset = rnd.randint(0, max(0, options['rows'] - options['range_days']))
+                start = DEFAULT_START + timedelta(days=offset)
+                end = start + timedelta(days=options['range_days'] - 1)
+                started = time.perf_counter()
+                try:
+                    conn.execute(rnd.choice(READS), (start.isoformat(), end.isoformat())).fetchall()
+                except sqlite3.OperationalError:
+                    locked += 1
+                    continue
+                timings.append((time.perf_counter() - started) * 1000)
+            conn.close()
+            with lock:
+                result['reads'].extend(timings)
+                result['locked'] += locked
+
+        def writer(index):
+            # каждая запись — отдельная транзакция, как сохранение формы
+            conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+            apply_pragmas(conn, pragmas)
+            rnd = random.Random(-options['seed'] - index - 1)
+            day = DEFAULT_START + timedelta(days=options['rows'])
+            timings, locked = [], 0
+            while time.perf_counter() < deadline:
+                row = (day.isoformat(), rnd.randint(1, 5), rnd.randint(1, 5), rnd.randint(1, 5))
+                started = time.perf_counter()
+                try:
+                    conn.execute(WRITE, row)
+                except sqlite3.OperationalError:
+                    locked += 1
+                    continue
+                timings.append((time.perf_counter() - started) * 1000)
+                day += timedelta(days=1)
+            conn.close()
+            with lock:
+                result['writes'].extend(timings)
+                result['locked'] += locked
+
+        threads = [
+            threading.Thread(target=reader, args=(i,)) for i in range(options['readers'])
+        ] + [
+            threading.Thread(target=writer, args=(i,)) for i in range(options['writers'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return result
+
+    def report(self, name, result, duration):
+        cells = []
+        for key in ('reads', 'writes'):
+            timings = result[key]
+            if timings:
+                p50, p95 = percentiles(timings)
+                cells.append((len(timings) / duration, p50, p95))
+            else:
+                cells.append((0.0, 0.0, 0.0))
+        (reads, read_p50, read_p95), (writes, write_p50, write_p95) = cells
+        self.stdout.write(
+            f'{name:<9} {reads:>9.1f} {read_p50:>6.2f}ms {read_p95:>6.2f}ms '
+            f'{writes:>10.1f} {write_p50:>6.2f}ms {write_p95:>6.2f}ms {result["locked"]:>7}'
+        )
@@ -0,0 +1,100 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+
+from tracker import analytics, cache, pagination
+from tracker.forms import StudyDayForm
+from tracker.recommendations import generate_recommendations
+from tracker.synthetic import generate_days
+from tracker.views import fragment_context
+
+TEMPLATE = 'tracker/study_days_list.html'
+
+
+def make_rows(count, seed=0):
+    return [
+        (index + 1, day, mood, fatigue, productivity, f'комментарий {index}')
+        for index, (day, mood, fatigue, productivity) in enumerate(generate_days(count, seed=seed))
+    ]
+
+
+def dashboard(rows, page_size):
+    # тот же контекст, что собирает dashboard_context, но по строкам в памяти
+    stats = analytics.analyze(rows)
+    days, next_cursor = pagination.first_page(stats.days, page_size)
+    return {
+        'days': days,
+        'days_total': stats.count,
+        'next_cursor': next_cursor,
+        'averages': stats.averages,
+        'mood_stats': stats.mood_stats,
+        'fatigue_stats': stats.fatigue_stats,
+        'recommendations': generate_recommendations(stats),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Время рендера главной страницы (study_days_list.html) на синтетических днях: '
+        'без кэша фрагментов, с прогретым кэшем и после добавления одного дня '
+        '(меняются версия данных и версия последнего месяца). --page-size 50 — '
+        'настоящая первая страница, --page-size равный --days — вся таблица сразу'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=10_000)
+        parser.add_argument('--page-size', type=int, nargs='+', default=[pagination.PAGE_SIZE, 10_000])
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['days'] < 1 or options['repeat'] < 1:
+            raise CommandError('--days и --repeat: не меньше 1')
+        if cache.FRAGMENTS_ALIAS not in caches:
+            raise CommandError(f'в CACHES нет кэша {cache.FRAGMENTS_ALIAS}')
+
+        self.request = RequestFactory().get('/')
+        rows = make_rows(options['days'], options['seed'])
+        last = rows[-1]
+        # новый день — следующий после последнего, в конце таблицы
+        added = rows + [(last[0] + 1, last[1] + timedelta(days=1), 4, 2, 5, 'новый день')]
+
+        self.stdout.write(
+            f'{"строк":>7} {"без кэша":>12} {"прогретый":>12} {"+1 день":>12}'
+        )
+        for page_size in options['page_size']:
+            before, after = dashboard(rows, page_size), dashboard(added, page_size)
+
+            cold = self.measure(before, options['repeat'], clear=True)
+            self.render(before)
+            warm = self.measure(before, options['repeat'])
+
+            def add_day():
+                cache.bump_version()
+                cache.bump_buckets([added[-1][1]])
+            one_day = self.measure(after, options['repeat'], prepare=add_day)
+
+            self.stdout.write(
+                f'{len(before["days"]):>7} {cold:>10.2f}ms {warm:>10.2f}ms {one_day:>10.2f}ms'
+            )
+
+    def render(self, context):
+        context = fragment_context(context, cache.owner_versions())
+        return render_to_string(TEMPLATE, {**context, 'form': StudyDayForm()}, self.request)
+
+    def measure(self, context, repeat, clear=False, prepare=None):
+        timings = []
+        for _ in range(repeat):
+            if clear:
+                caches[cache.FRAGMENTS_ALIAS].clear()
+            if prepare:
+                prepare()
+            started = time.perf_counter()
+            self.render(context)
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
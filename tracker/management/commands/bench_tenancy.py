@@ -0,0 +1,183 @@
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from tracker.benchmarks import model_sql, percentiles
+from tracker.models import StudyDay, StudyMetric
+from tracker.synthetic import DEFAULT_START, generate_days
+
+DAYS = StudyDay._meta.db_table
+METRICS = StudyMetric._meta.db_table
+
+# запросы представлений вошедшего пользователя
+QUERIES = {
+    # строки для графика за диапазон — покрывающий индекс (user, date, ...)
+    'rows_30': (
+        f'SELECT date, mood, fatigue, productivity FROM {DAYS} '
+        f'WHERE user_id = :user AND date BETWEEN :start AND :end_30 ORDER BY date'
+    ),
+    'rows_365': (
+        f'SELECT date, mood, fatigue, productivity FROM {DAYS} '
+        f'WHERE user_id = :user AND date BETWEEN :start AND :end_365 ORDER BY date'
+    ),
+    # вся история пользователя со всеми полями, как на главной странице
+    'dashboard': (
+        f'SELECT id, date, mood, fatigue, productivity, comment FROM {DAYS} '
+        f'WHERE user_id = :user ORDER BY date'
+    ),
+    # средние за год из помесячных метрик
+    'averages': (
+        f'SELECT SUM(days_count), SUM(mood_sum), SUM(fatigue_sum), SUM(productivity_sum) '
+        f'FROM {METRICS} WHERE user_id = :user AND period = \'month\' '
+        f'AND date BETWEEN :start AND :end_365'
+    ),
+}
+
+# сводка по всем пользователям за год — O(пользователи × месяцы)
+COHORT = (
+    f'SELECT user_id, SUM(days_count), SUM(mood_sum), SUM(fatigue_sum), SUM(productivity_sum) '
+    f'FROM {METRICS} WHERE period = \'month\' AND date BETWEEN :start AND :end_365 '
+    f'GROUP BY user_id'
+)
+
+# помесячные метрики новых пользователей собираются на стороне SQLite
+BUILD_MONTHS = (
+    f'INSERT INTO {METRICS} (user_id, period, date, days_count, mood_sum, fatigue_sum, '
+    f'productivity_sum, avg_mood, avg_fatigue, avg_productivity) '
+    f'SELECT user_id, \'month\', strftime(\'%Y-%m-01\', date), COUNT(*), SUM(mood), '
+    f'SUM(fatigue), SUM(productivity), AVG(mood), AVG(fatigue), AVG(productivity) '
+    f'FROM {DAYS} WHERE user_id BETWEEN ? AND ? GROUP BY user_id, strftime(\'%Y-%m-01\', date)'
+)
+
+# число разных синтетических рядов: содержимое не влияет на время запросов,
+# а генерация 10 млн строк заново заняла бы больше, чем сами замеры
+SERIES_POOL = 64
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет временную SQLite-базу данными многих пользователей и '
+        'показывает, что время запросов одного пользователя не зависит от размера таблицы'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, nargs='+', default=[100, 1000, 10000])
+        parser.add_argument('--days', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--db', help='Путь к файлу базы (по умолчанию временный)')
+
+    def handle(self, *args, **options):
+        tables, indexes = model_sql(StudyDay, StudyMetric)
+
+        path = options['db'] or tempfile.mktemp(suffix='.sqlite3')
+        conn = sqlite3.connect(path)
+
+        try:
+            for sql in tables + indexes:
+                conn.execute(sql)
+
+            pool = [
+                [
+                    (day.isoformat(), mood, fatigue, productivity)
+                    for day, mood, fatigue, productivity
+                    in generate_days(options['days'], seed=options['seed'] + i)
+                ]
+                for i in range(SERIES_POOL)
+            ]
+
+            self.stdout.write(
+                f'{"польз.":>7} {"строк":>11} {"заполн.":>8}  '
+                + ' '.join(f'{name + " p50/p95":>20}' for name in QUERIES)
+                + f' {"cohort p50":>11}'
+            )
+
+            users = 0
+            for target in sorted(options['users']):
+                if target <= users:
+                    continue
+
+                started = time.perf_counter()
+                self.seed(conn, pool, users + 1, target)
+                seed_time = time.perf_counter() - started
+                users = target
+
+                results = self.measure(conn, users, options)
+                row_count = conn.execute(f'SELECT COUNT(*) FROM {DAYS}').fetchone()[0]
+
+                cells = []
+                for name in QUERIES:
+                    p50, p95 = percentiles(results[name])
+                    cells.append(f'{p50:>8.3f}/{p95:>7.3f}ms')
+                cohort_p50, _ = percentiles(results['cohort'])
+
+                self.stdout.write(
+                    f'{users:>7} {row_count:>11,} {seed_time:>7.1f}s  '
+                    + ' '.join(f'{cell:>20}' for cell in cells)
+                    + f' {cohort_p50:>9.1f}ms'
+                )
+
+            self.stdout.write('')
+            self.stdout.write('План запросов:')
+            for name, sql in QUERIES.items():
+                plan = conn.execute(f'EXPLAIN QUERY PLAN {sql}', self.params(1, options)).fetchall()
+                self.stdout.write(f'  {name}: ' + '; '.join(row[-1] for row in plan))
+        finally:
+            conn.close()
+            if not options['db']:
+                os.remove(path)
+
+    @staticmethod
+    def seed(conn, pool, first_user, last_user):
+        # строки пишутся по дням вперемешку для всех пользователей — как при
+        # ежедневной работе, а не одним непрерывным блоком на пользователя
+        created_at = '2000-01-01 00:00:00'
+        user_ids = range(first_user, last_user + 1)
+        days = len(pool[0])
+
+        with conn:
+            for i in range(days):
+                conn.executemany(
+                    f'INSERT INTO {DAYS} (user_id, date, mood, fatigue, productivity, comment, '
+                    f'created_at) VALUES (?, ?, ?, ?, ?, \'\', ?)',
+                    [
+                        (user_id, *pool[user_id % SERIES_POOL][i], created_at)
+                        for user_id in user_ids
+                    ],
+                )
+            conn.execute(BUILD_MONTHS, (first_user, last_user))
+        conn.execute('ANALYZE')
+
+    def measure(self, conn, users, options):
+        rnd = random.Random(options['seed'])
+        results = {name: [] for name in (*QUERIES, 'cohort')}
+
+        for _ in range(options['repeat']):
+            params = self.params(rnd.randint(1, users), options, rnd)
+            for name, sql in QUERIES.items():
+                started = time.perf_counter()
+                conn.execute(sql, params).fetchall()
+                results[name].append((time.perf_counter() - started) * 1000)
+
+        for _ in range(min(options['repeat'], 5)):
+            started = time.perf_counter()
+            conn.execute(COHORT, self.params(1, options, rnd)).fetchall()
+            results['cohort'].append((time.perf_counter() - started) * 1000)
+
+        return results
+
+    @staticmethod
+    def params(user_id, options, rnd=None):
+        offset = rnd.randint(0, max(0, options['days'] - 365)) if rnd else 0
+        start = DEFAULT_START + timedelta(days=offset)
+        return {
+            'user': user_id,
+            'start': start.isoformat(),
+            'end_30': (start + timedelta(days=29)).isoformat(),
+            'end_365': (start + timedelta(days=364)).isoformat(),
+        }
@@ -0,0 +1,53 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from tracker import exporter
+
+from .import_study_days import resolve_user
+
+
+class Command(BaseCommand):
+    help = 'Выгружает учебные дни или рекомендации в CSV, JSONL или колоночный формат'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=exporter.FORMATS, default=exporter.FORMAT_CSV)
+        parser.add_argument('--dataset', choices=exporter.DATASETS, default=exporter.DATASET_DAYS)
+        parser.add_argument('--output', '-o', help='Файл для записи (по умолчанию stdout)')
+        parser.add_argument('--date-from', type=parse_date)
+        parser.add_argument('--date-to', type=parse_date)
+        parser.add_argument('--chunk-size', type=int, default=exporter.CHUNK_SIZE)
+        parser.add_argument('--user', help='Имя владельца (по умолчанию — общие данные)')
+
+    def handle(self, *args, **options):
+        fmt = options['format']
+        try:
+            chunks = exporter.export_chunks(
+                fmt,
+                options['dataset'],
+                options['date_from'],
+                options['date_to'],
+                options['chunk_size'],
+                resolve_user(options['user']),
+            )
+        except ValueError as exc:
+            raise CommandError(exc)
+
+        binary = fmt == exporter.FORMAT_COLUMNAR
+
+        if options['output']:
+            if binary:
+                stream = open(options['output'], 'wb')
+            else:
+                stream = open(options['output'], 'w', encoding='utf-8', newline='')
+            with stream:
+                for chunk in chunks:
+                    stream.write(chunk)
+        else:
+            stream = sys.stdout.buffer if binary else self.stdout
+            for chunk in chunks:
+                if binary:
+                    stream.write(chunk)
+                else:
+                    stream.write(chunk, ending='')
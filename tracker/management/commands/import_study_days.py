@@ -0,0 +1,67 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from tracker import importer
+
+
+def resolve_user(username):
+    if not username:
+        return None
+    User = get_user_model()
+    try:
+        return User.objects.get_by_natural_key(username).pk
+    except User.DoesNotExist:
+        raise CommandError(f'Пользователь {username!r} не найден')
+
+
+class Command(BaseCommand):
+    help = 'Импортирует историю учебных дней из CSV или JSONL пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу или "-" для stdin')
+        parser.add_argument('--format', choices=importer.FORMATS)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--upsert',
+            action='store_true',
+            help='Обновлять существующий день с той же датой вместо добавления нового',
+        )
+        parser.add_argument('--encoding', default='utf-8-sig')
+        parser.add_argument('--user', help='Имя владельца (по умолчанию — общие данные)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or importer.detect_format(path)
+
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным')
+
+        user_id = resolve_user(options['user'])
+
+        if path == '-':
+            report = importer.import_stream(
+                sys.stdin, fmt, options['batch_size'], options['upsert'], user_id
+            )
+        else:
+            try:
+                stream = open(path, encoding=options['encoding'], newline='')
+            except OSError as exc:
+                raise CommandError(exc)
+            with stream:
+                report = importer.import_stream(
+                    stream, fmt, options['batch_size'], options['upsert'], user_id
+                )
+
+        for error in report.errors:
+            self.stderr.write(f'строка {error["line"]}: {error["error"]}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Прочитано: {report.total}, добавлено: {report.created}, '
+            f'обновлено: {report.updated}, повторов даты: {report.duplicates}, '
+            f'с ошибками: {report.invalid}, пачек: {report.batches}'
+        ))
+        self.stdout.write(
+            f'{report.elapsed:.2f} с, {report.rows_per_second:,.0f} строк/с'
+        )
@@ -0,0 +1,163 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tracker.benchmarks import percentiles
+
+
+# =========================
+# HTTP/1.1-КЛИЕНТ НА asyncio (keep-alive, без сторонних пакетов)
+# =========================
+async def read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('соединение закрыто сервером')
+    status = int(status_line.split()[1])
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if not size:
+                break
+        keep_alive = True
+    elif 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+        keep_alive = True
+    else:
+        await reader.read()
+        keep_alive = False
+
+    if headers.get('connection', '').lower() == 'close':
+        keep_alive = False
+    return status, keep_alive
+
+
+async def client(url, deadline, timings, errors):
+    parts = urlsplit(url)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    request = (
+        f'GET {path} HTTP/1.1\r\n'
+        f'Host: {parts.netloc}\r\n'
+        f'Connection: keep-alive\r\n\r\n'
+    ).encode()
+
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+            writer.write(request)
+            await writer.drain()
+            status, keep_alive = await read_response(reader)
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+            errors.append('connection')
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            await asyncio.sleep(0.01)
+            continue
+
+        if status >= 400:
+            errors.append(status)
+        else:
+            timings.append((time.perf_counter() - started) * 1000)
+
+        if not keep_alive:
+            writer.close()
+            reader = writer = None
+
+    if writer is not None:
+        writer.close()
+
+
+async def run_level(url, concurrency, duration):
+    timings, errors = [], []
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        client(url, deadline, timings, errors) for _ in range(concurrency)
+    ))
+    return timings, errors, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест: N одновременных клиентов с keep-alive, пропускная '
+        'способность и p50/p95/p99. Для сравнения WSGI и ASGI запустите оба сервера, '
+        'например "gunicorn config.wsgi -w 4 -b :8000" и '
+        '"uvicorn config.asgi:application --workers 4 --port 8001", и передайте '
+        '--target wsgi=http://127.0.0.1:8000 --target asgi=http://127.0.0.1:8001'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target',
+            action='append',
+            required=True,
+            help='имя=базовый URL сервера; можно указать несколько раз',
+        )
+        parser.add_argument(
+            '--path',
+            action='append',
+            help='пути для проверки (по умолчанию сводка, данные графиков и дашборд — '
+                 'синхронные и асинхронные варианты)',
+        )
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[50, 100, 200])
+        parser.add_argument('--duration', type=float, default=10.0, help='секунд на уровень')
+        parser.add_argument('--warmup', type=float, default=1.0)
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options['target']:
+            name, sep, base = target.partition('=')
+            if not sep or not base.startswith('http://'):
+                raise CommandError(f'ожидается имя=http://хост:порт, получено {target!r}')
+            targets.append((name, base.rstrip('/')))
+
+        paths = options['path'] or [
+            '/analytics/summary/', '/analytics/data/', '/analytics/data/async/', '/', '/async/',
+        ]
+
+        self.stdout.write(
+            f'{"сервер":<8} {"путь":<24} {"клиентов":>8} {"запр/с":>9} '
+            f'{"p50":>9} {"p95":>9} {"p99":>9} {"ошибок":>7}'
+        )
+
+        for path in paths:
+            for concurrency in options['concurrency']:
+                for name, base in targets:
+                    url = base + path
+                    asyncio.run(run_level(url, min(concurrency, 10), options['warmup']))
+                    timings, errors, elapsed = asyncio.run(
+                        run_level(url, concurrency, options['duration'])
+                    )
+                    self.report(name, path, concurrency, timings, errors, elapsed)
+
+    def report(self, name, path, concurrency, timings, errors, elapsed):
+        if not timings:
+            self.stdout.write(
+                f'{name:<8} {path:<24} {concurrency:>8} {"—":>9} {"":>9} {"":>9} {"":>9} '
+                f'{len(errors):>7}'
+            )
+            return
+
+        p50, p95 = percentiles(timings)
+        p99 = sorted(timings)[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(
+            f'{name:<8} {path:<24} {concurrency:>8} {len(timings) / elapsed:>9.1f} '
+            f'{p50:>7.1f}ms {p95:>7.1f}ms {p99:>7.1f}ms {len(errors):>7}'
+        )
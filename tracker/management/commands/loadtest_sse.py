@@ -0,0 +1,173 @@
+import asyncio
+import json
+import time
+from datetime import date, timedelta
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+
+from tracker.benchmarks import percentiles
+from tracker.models import StudyDay
+
+
+def rss_kb(pid):
+    # резидентная память процесса сервера из /proc, в КБ
+    try:
+        with open(f'/proc/{pid}/status') as fh:
+            for line in fh:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+# =========================
+# SSE-КЛИЕНТ НА asyncio (без сторонних пакетов)
+# =========================
+class Listener:
+    def __init__(self):
+        self.received = []
+        self.connected = asyncio.Event()
+        self.writer = None
+
+    async def run(self, url):
+        parts = urlsplit(url)
+        path = parts.path + ('?' + parts.query if parts.query else '')
+        reader, self.writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+        self.writer.write((
+            f'GET {path} HTTP/1.1\r\n'
+            f'Host: {parts.netloc}\r\n'
+            f'Accept: text/event-stream\r\n\r\n'
+        ).encode())
+        await self.writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line or int(status_line.split()[1]) != 200:
+            raise ConnectionError(f'поток не открыт: {status_line!r}')
+        while (await reader.readline()) not in (b'\r\n', b''):
+            pass
+
+        kind = None
+        while True:
+            # ответ идёт chunked: строки размера чанков не похожи на поля SSE и пропускаются
+            line = await reader.readline()
+            if not line:
+                return
+            if line.startswith(b'retry:'):
+                self.connected.set()
+            elif line.startswith(b'event:'):
+                kind = line[6:].strip().decode()
+            elif line.startswith(b'data:') and kind:
+                payload = json.loads(line[5:])
+                self.received.append((kind, payload.get('ts'), time.time()))
+                kind = None
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+async def run_level(url, subscribers, writes, interval, pid):
+    rss_before = rss_kb(pid) if pid else None
+    listeners = [Listener() for _ in range(subscribers)]
+    tasks = [asyncio.create_task(listener.run(url)) for listener in listeners]
+
+    started = time.perf_counter()
+    await asyncio.wait_for(
+        asyncio.gather(*(listener.connected.wait() for listener in listeners)), 60
+    )
+    connect_seconds = time.perf_counter() - started
+    await asyncio.sleep(1)
+    rss_after = rss_kb(pid) if pid else None
+
+    # записи — обычным ORM, как из админки или воркера; сервер узнаёт о них опросом
+    start = date(2999, 1, 1)
+    created = []
+    for index in range(writes):
+        day = await sync_to_async(StudyDay.objects.create)(
+            date=start + timedelta(days=index), mood=3, fatigue=3, productivity=3,
+        )
+        created.append(day.pk)
+        await asyncio.sleep(interval)
+    await asyncio.sleep(2)
+
+    for listener in listeners:
+        listener.close()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await sync_to_async(lambda: StudyDay.objects.filter(pk__in=created).delete())()
+
+    latencies, spreads, delivered = [], [], 0
+    per_event = {}
+    for listener in listeners:
+        for kind, ts, received_at in listener.received:
+            if kind != 'day' or ts is None:
+                continue
+            delivered += 1
+            latencies.append((received_at - ts) * 1000)
+            per_event.setdefault(ts, []).append(received_at)
+    for times in per_event.values():
+        spreads.append((max(times) - min(times)) * 1000)
+
+    return {
+        'subscribers': subscribers,
+        'connect_seconds': connect_seconds,
+        'rss_before': rss_before,
+        'rss_after': rss_after,
+        'expected': subscribers * writes,
+        'delivered': delivered,
+        'latencies': latencies,
+        'spreads': spreads,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест живых обновлений: открывает N SSE-соединений с /live/, '
+        'сохраняет --writes дней и измеряет задержку доставки (от записи события до '
+        'получения клиентом), разброс между подписчиками и память сервера на '
+        'соединение (--pid процесса uvicorn, по /proc). Сервер: '
+        '"uvicorn config.asgi:application --port 8001"; база должна быть общей с этой командой'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8001', help='базовый URL ASGI-сервера')
+        parser.add_argument('--subscribers', type=int, nargs='+', default=[100, 300, 500])
+        parser.add_argument('--writes', type=int, default=20)
+        parser.add_argument('--interval', type=float, default=0.2, help='секунд между записями')
+        parser.add_argument('--pid', type=int, help='PID процесса сервера для замера памяти')
+
+    def handle(self, *args, **options):
+        base = options['url'].rstrip('/')
+        if not base.startswith('http://'):
+            raise CommandError('ожидается http://хост:порт')
+        url = base + '/live/'
+
+        self.stdout.write(
+            f'{"клиентов":>8} {"доставлено":>12} {"p50":>9} {"p95":>9} {"p99":>9} '
+            f'{"разброс p95":>12} {"КБ/соед.":>9}'
+        )
+        for subscribers in options['subscribers']:
+            result = asyncio.run(run_level(
+                url, subscribers, options['writes'], options['interval'], options['pid']
+            ))
+            self.report(result)
+
+    def report(self, result):
+        latencies = result['latencies']
+        if not latencies:
+            self.stdout.write(f'{result["subscribers"]:>8} {"0/" + str(result["expected"]):>12}')
+            return
+        p50, p95 = percentiles(latencies)
+        p99 = sorted(latencies)[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        spread = percentiles(result['spreads'])[1]
+        per_connection = '—'
+        if result['rss_before'] is not None and result['rss_after'] is not None:
+            per_connection = f'{(result["rss_after"] - result["rss_before"]) / result["subscribers"]:.1f}'
+        self.stdout.write(
+            f'{result["subscribers"]:>8} {result["delivered"]:>5}/{result["expected"]:<6} '
+            f'{p50:>7.1f}ms {p95:>7.1f}ms {p99:>7.1f}ms {spread:>10.1f}ms {per_connection:>9}'
+        )
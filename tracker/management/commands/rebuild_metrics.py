@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from tracker import cache, cube, rollups
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает дневные, недельные и месячные метрики и куб оценок из StudyDay'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Размер пачки при записи метрик',
+        )
+
+    def handle(self, *args, **options):
+        count = rollups.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Пересобрано метрик: {count}'))
+        cells = cube.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Пересобрано ячеек куба: {cells}'))
+        # закэшированные ответы всех процессов посчитаны по старым метрикам
+        cache.bump_all()
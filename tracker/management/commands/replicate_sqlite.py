@@ -0,0 +1,62 @@
+import os
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Замена репликации для двух файлов SQLite: копирует основную базу '
+        'в файл псевдонима analytics (TRACKER_ANALYTICS_DB_PATH) через backup API '
+        'и атомарно подменяет его. С --interval повторяет копирование, '
+        'моделируя отставание реплики.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--to',
+            default=os.environ.get('TRACKER_ANALYTICS_DB_PATH'),
+            help='Файл копии (по умолчанию TRACKER_ANALYTICS_DB_PATH)',
+        )
+        parser.add_argument('--interval', type=float, help='Секунд между копиями; без него — одна копия')
+        parser.add_argument('--pages', type=int, default=1024, help='Страниц за шаг backup()')
+
+    def handle(self, *args, **options):
+        source = str(connections[DEFAULT_DB_ALIAS].settings_dict['NAME'])
+        target = options['to']
+        if not target:
+            raise CommandError('Укажите --to или TRACKER_ANALYTICS_DB_PATH')
+        if os.path.abspath(target) == os.path.abspath(source):
+            raise CommandError('Копия не может совпадать с основной базой')
+
+        while True:
+            started = time.perf_counter()
+            size = self.copy(source, target, options['pages'])
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{time.strftime("%H:%M:%S")} скопировано {size / 1024 / 1024:.1f} МБ '
+                f'за {elapsed * 1000:.0f} мс → {target}'
+            )
+
+            if not options['interval']:
+                break
+            time.sleep(max(0.0, options['interval'] - elapsed))
+
+    @staticmethod
+    def copy(source, target, pages):
+        tmp = f'{target}.tmp'
+        src = sqlite3.connect(source)
+        dst = sqlite3.connect(tmp)
+        try:
+            # backup() читает согласованный снимок и не блокирует писателей надолго
+            src.backup(dst, pages=pages)
+            # читатели копии открывают её с mode=ro, а WAL требует запись в -shm
+            dst.execute('PRAGMA journal_mode = DELETE')
+        finally:
+            dst.close()
+            src.close()
+
+        os.replace(tmp, target)
+        return os.path.getsize(target)
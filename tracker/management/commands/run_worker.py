@@ -0,0 +1,50 @@
+import logging
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from tracker import jobs
+from tracker.models import Job
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет фоновые задачи из таблицы Job (пересчёт рекомендаций и модели '
+        'прогноза после записи) в пуле потоков. Очередь живёт в той же базе SQLite, '
+        'Redis и другой брокер не нужны. Остановка — Ctrl+C или SIGTERM: '
+        'начатые задачи доделываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=2, help='Потоков в пуле')
+        parser.add_argument('--poll', type=float, default=1.0, help='Секунд между опросами пустой очереди')
+        parser.add_argument('--once', action='store_true', help='Выполнить готовые задачи и выйти')
+        parser.add_argument(
+            '--retry-failed', action='store_true',
+            help='Вернуть в очередь задачи, исчерпавшие попытки',
+        )
+
+    def handle(self, *args, **options):
+        if options['threads'] < 1:
+            raise CommandError('--threads: не меньше 1')
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+        if options['retry_failed']:
+            count = 0
+            for job in Job.objects.filter(status=Job.STATUS_FAILED):
+                Job.objects.filter(pk=job.pk).update(attempts=0)
+                jobs.reschedule(job, timezone.now(), job.last_error)
+                count += 1
+            self.stdout.write(f'Возвращено в очередь: {count}')
+
+        worker = jobs.Worker(threads=options['threads'], poll=options['poll'])
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: worker.stop())
+
+        self.stdout.write(
+            f'Воркер запущен: {options["threads"]} потоков, '
+            f'задачи: {", ".join(sorted(jobs.TASKS))}'
+        )
+        done = worker.run(once=options['once'])
+        self.stdout.write(self.style.SUCCESS(f'Выполнено задач: {done}'))
@@ -0,0 +1,183 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# =========================
+# МЕТРИКИ В ФОРМАТЕ PROMETHEUS
+# =========================
+# Счётчики живут в памяти процесса: при нескольких воркерах каждый отдаёт
+# свои значения, а Prometheus суммирует их по меткам instance.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+
+class Histogram:
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def collect(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} histogram'
+        with self._lock:
+            snapshot = [
+                (key, list(counts), total, count)
+                for key, (counts, total, count) in sorted(self._series.items())
+            ]
+        for key, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labels, key, [('le', _format_bound(bound))])
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _format_labels(self.labels, key)
+            yield f'{self.name}_sum{labels} {total}'
+            yield f'{self.name}_count{labels} {count}'
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+REQUEST_LATENCY = Histogram(
+    'tracker_request_duration_seconds',
+    'Время обработки запроса',
+    labels=('view', 'method', 'status'),
+)
+QUERY_COUNT = Histogram(
+    'tracker_request_db_queries',
+    'Число SQL-запросов на HTTP-запрос',
+    labels=('view',),
+    buckets=COUNT_BUCKETS,
+)
+QUERY_TIME = Histogram(
+    'tracker_request_db_seconds',
+    'Суммарное время SQL-запросов на HTTP-запрос',
+    labels=('view',),
+)
+TEMPLATE_TIME = Histogram(
+    'tracker_template_render_seconds',
+    'Время отрисовки шаблона',
+    labels=('template',),
+)
+RECOMMENDATION_TIME = Histogram(
+    'tracker_recommendations_seconds',
+    'Время получения рекомендаций (из базы или с пересчётом)',
+)
+
+REGISTRY = (REQUEST_LATENCY, QUERY_COUNT, QUERY_TIME, TEMPLATE_TIME, RECOMMENDATION_TIME)
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.collect())
+    return '\n'.join(lines) + '\n'
+
+
+def clear():
+    for metric in REGISTRY:
+        metric.clear()
+
+
+# =========================
+# ЗАМЕРЫ ВНУТРИ ЗАПРОСА
+# =========================
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.template_seconds = 0.0
+        self.recommendation_seconds = 0.0
+        # текст SQL (с плейсхолдерами, без параметров) → [выполнений, секунд]
+        self.statements = {}
+        # под ASGI запросы одного HTTP-запроса идут из потоков sync_to_async
+        self._lock = threading.Lock()
+
+    # обёртка для connection.execute_wrapper
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.query_seconds += elapsed
+                self.queries += 1
+                statement = self.statements.setdefault(sql, [0, 0.0])
+                statement[0] += 1
+                statement[1] += elapsed
+
+    def top_statements(self, limit):
+        # самые дорогие по суммарному времени: и медленные, и частые
+        with self._lock:
+            statements = sorted(self.statements.items(), key=lambda item: item[1][1], reverse=True)
+        return [(sql, count, seconds) for sql, (count, seconds) in statements[:limit]]
+
+
+current_request = ContextVar('tracker_request_stats', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Обёртка, которую tracker.db ставит на каждое соединение: SQL засчитывается
+    запросу из current_request. Контекст переходит в потоки sync_to_async,
+    поэтому учитываются и соединения пула потоков асинхронных представлений.
+    """
+    stats = current_request.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+@contextmanager
+def timed(histogram, attribute, *label_values):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        histogram.observe(elapsed, *label_values)
+        stats = current_request.get()
+        if stats is not None:
+            setattr(stats, attribute, getattr(stats, attribute) + elapsed)
+
+
+def time_template(template_name):
+    return timed(TEMPLATE_TIME, 'template_seconds', template_name)
+
+
+def time_recommendations():
+    return timed(RECOMMENDATION_TIME, 'recommendation_seconds')
@@ -0,0 +1,135 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import metrics
+from .routers import use_primary
+
+logger = logging.getLogger('tracker.performance')
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+STICKY_COOKIE = 'tracker_primary'
+# в лог медленных запросов — начало текста SQL
+SQL_LOG_LENGTH = 300
+
+
+class ReadYourWritesMiddleware:
+    """
+    После успешного POST клиент получает короткоживущую cookie: пока она
+    действует, его запросы читают с основной базы, а не с копии analytics,
+    и он сразу видит свою запись, даже если копия ещё не догнала.
+    """
+
+    sync_capable = async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        with use_primary(self.pinned(request)):
+            response = self.get_response(request)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        # ContextVar переходит и в потоки sync_to_async асинхронных представлений
+        with use_primary(self.pinned(request)):
+            response = await self.get_response(request)
+        return self.process_response(request, response)
+
+    @staticmethod
+    def pinned(request):
+        return request.method not in SAFE_METHODS or STICKY_COOKIE in request.COOKIES
+
+    @staticmethod
+    def process_response(request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(
+                STICKY_COOKIE,
+                '1',
+                max_age=getattr(settings, 'TRACKER_STICKY_SECONDS', 5),
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+
+class PerformanceMiddleware:
+    """
+    Гистограммы времени ответа, числа и времени SQL-запросов по именам
+    представлений (tracker.metrics, отдаются на /metrics). Запросы к БД
+    считает обёртка metrics.record_query, которую tracker.db ставит на все
+    соединения, — в том числе на соединения потоков sync_to_async под ASGI.
+    Для потоковых ответов время — до начала отдачи тела.
+
+    Если задан TRACKER_SLOW_REQUEST_MS, медленные запросы пишутся
+    в лог tracker.performance с разбивкой по БД, шаблону и рекомендациям
+    и с TRACKER_SLOW_REQUEST_TOP_QUERIES самыми дорогими SQL.
+    """
+
+    sync_capable = async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        stats = metrics.RequestStats()
+        token = metrics.current_request.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.current_request.reset(token)
+
+        self.observe(request, response, stats, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        stats = metrics.RequestStats()
+        token = metrics.current_request.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.current_request.reset(token)
+
+        self.observe(request, response, stats, time.perf_counter() - started)
+        return response
+
+    def observe(self, request, response, stats, elapsed):
+        match = request.resolver_match
+        view = (match.url_name or match.view_name) if match else 'unmatched'
+
+        metrics.REQUEST_LATENCY.observe(elapsed, view, request.method, response.status_code)
+        metrics.QUERY_COUNT.observe(stats.queries, view)
+        metrics.QUERY_TIME.observe(stats.query_seconds, view)
+
+        slow_ms = getattr(settings, 'TRACKER_SLOW_REQUEST_MS', 0)
+        if slow_ms and elapsed * 1000 >= slow_ms:
+            top = stats.top_statements(getattr(settings, 'TRACKER_SLOW_REQUEST_TOP_QUERIES', 5))
+            logger.warning(
+                'Медленный запрос %s %s: %.0f мс, SQL: %d за %.0f мс, '
+                'шаблон: %.0f мс, рекомендации: %.0f мс%s',
+                request.method,
+                request.get_full_path(),
+                elapsed * 1000,
+                stats.queries,
+                stats.query_seconds * 1000,
+                stats.template_seconds * 1000,
+                stats.recommendation_seconds * 1000,
+                ''.join(
+                    f'\n  {seconds * 1000:.1f} мс, {count}×: {sql[:SQL_LOG_LENGTH]}'
+                    for sql, count, seconds in top
+                ),
+            )
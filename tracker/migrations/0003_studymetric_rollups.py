@@ -0,0 +1,93 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:44
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def clear_metrics(apps, schema_editor):
+    # до этой миграции метрики никем не заполнялись
+    apps.get_model('tracker', 'StudyMetric').objects.all().delete()
+
+
+# границы периодов на момент миграции — копия, а не импорт из tracker.rollups:
+# миграция не должна меняться вместе с кодом приложения
+PERIODS = ('day', 'week', 'month')
+
+
+def period_start(period, day):
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def build_metrics(apps, schema_editor):
+    StudyDay = apps.get_model('tracker', 'StudyDay')
+    StudyMetric = apps.get_model('tracker', 'StudyMetric')
+
+    totals = {}
+    for day in StudyDay.objects.all().iterator():
+        for period in PERIODS:
+            bucket = totals.setdefault((period, period_start(period, day.date)), [0, 0, 0, 0])
+            bucket[0] += 1
+            bucket[1] += day.mood
+            bucket[2] += day.fatigue
+            bucket[3] += day.productivity
+
+    StudyMetric.objects.bulk_create([
+        StudyMetric(
+            period=period,
+            date=start,
+            days_count=count,
+            mood_sum=mood,
+            fatigue_sum=fatigue,
+            productivity_sum=productivity,
+            avg_mood=mood / count,
+            avg_fatigue=fatigue / count,
+            avg_productivity=productivity / count,
+        )
+        for (period, start), (count, mood, fatigue, productivity) in totals.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0002_studymetric_recommendation'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_metrics, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='studymetric',
+            name='days_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Количество записей'),
+        ),
+        migrations.AddField(
+            model_name='studymetric',
+            name='fatigue_sum',
+            field=models.PositiveIntegerField(default=0, verbose_name='Сумма усталости'),
+        ),
+        migrations.AddField(
+            model_name='studymetric',
+            name='mood_sum',
+            field=models.PositiveIntegerField(default=0, verbose_name='Сумма настроения'),
+        ),
+        migrations.AddField(
+            model_name='studymetric',
+            name='period',
+            field=models.CharField(choices=[('day', 'День'), ('week', 'Неделя'), ('month', 'Месяц')], default='day', max_length=5, verbose_name='Период'),
+        ),
+        migrations.AddField(
+            model_name='studymetric',
+            name='productivity_sum',
+            field=models.PositiveIntegerField(default=0, verbose_name='Сумма продуктивности'),
+        ),
+        migrations.AddConstraint(
+            model_name='studymetric',
+            constraint=models.UniqueConstraint(fields=('period', 'date'), name='unique_study_metric_period_date'),
+        ),
+        migrations.RunPython(build_metrics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0003_studymetric_rollups'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='studyday',
+            name='date',
+            field=models.DateField(db_index=True, verbose_name='Дата'),
+        ),
+        migrations.AddIndex(
+            model_name='studyday',
+            index=models.Index(fields=['date', 'mood', 'fatigue', 'productivity'], name='studyday_date_scores_idx'),
+        ),
+    ]
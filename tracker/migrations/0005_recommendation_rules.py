@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0004_studyday_date_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='recommendation',
+            options={'ordering': ['position'], 'verbose_name': 'Рекомендация', 'verbose_name_plural': 'Рекомендации'},
+        ),
+        migrations.AddField(
+            model_name='recommendation',
+            name='icon',
+            field=models.CharField(blank=True, max_length=8, verbose_name='Значок'),
+        ),
+        migrations.AddField(
+            model_name='recommendation',
+            name='position',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Порядок'),
+        ),
+        migrations.AddField(
+            model_name='recommendation',
+            name='range_from',
+            field=models.DateField(blank=True, null=True, verbose_name='Период с'),
+        ),
+        migrations.AddField(
+            model_name='recommendation',
+            name='range_to',
+            field=models.DateField(blank=True, null=True, verbose_name='Период по'),
+        ),
+        migrations.AddField(
+            model_name='recommendation',
+            name='recommendation_type',
+            field=models.CharField(choices=[('info', 'Информационная'), ('success', 'Положительная'), ('warning', 'Предупреждение'), ('danger', 'Тревожная')], default='info', max_length=10, verbose_name='Тип рекомендации'),
+        ),
+        migrations.AddField(
+            model_name='recommendation',
+            name='rule',
+            field=models.CharField(blank=True, max_length=50, verbose_name='Правило'),
+        ),
+        migrations.AlterField(
+            model_name='recommendation',
+            name='study_day',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='tracker.studyday', verbose_name='Учебный день'),
+        ),
+        migrations.AddIndex(
+            model_name='recommendation',
+            index=models.Index(fields=['range_from', 'range_to', 'position'], name='recommendation_range_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tracker', '0005_recommendation_rules'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='studymetric',
+            name='unique_study_metric_period_date',
+        ),
+        migrations.RemoveIndex(
+            model_name='recommendation',
+            name='recommendation_range_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='studyday',
+            name='studyday_date_scores_idx',
+        ),
+        migrations.AddField(
+            model_name='recommendation',
+            name='user',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AddField(
+            model_name='studyday',
+            name='user',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='study_days', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AddField(
+            model_name='studymetric',
+            name='user',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='study_metrics', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AddIndex(
+            model_name='recommendation',
+            index=models.Index(fields=['user', 'range_from', 'range_to', 'position'], name='recommendation_range_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studyday',
+            index=models.Index(fields=['user', 'date', 'mood', 'fatigue', 'productivity'], name='studyday_user_scores_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='studymetric',
+            constraint=models.UniqueConstraint(fields=('user', 'period', 'date'), name='unique_study_metric_user_period_date'),
+        ),
+        migrations.AddConstraint(
+            model_name='studymetric',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', True)), fields=('period', 'date'), name='unique_study_metric_period_date'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+from django.db import migrations
+
+# Полнотекстовый индекс комментариев: внешняя таблица FTS5 хранит только
+# индекс, текст берётся из tracker_studyday по rowid = id. Триггеры держат
+# индекс в актуальном состоянии при любой записи, включая bulk_create и сырой SQL.
+#
+# Если следующая миграция пересоздаст tracker_studyday (так SQLite выполняет
+# большинство ALTER), триггеры удалятся вместе со старой таблицей — их нужно
+# будет создать заново и выполнить 'rebuild'.
+CREATE_SQL = (
+    "CREATE VIRTUAL TABLE tracker_studyday_fts USING fts5("
+    "comment, content='tracker_studyday', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+
+    "CREATE TRIGGER tracker_studyday_fts_insert AFTER INSERT ON tracker_studyday BEGIN "
+    "INSERT INTO tracker_studyday_fts(rowid, comment) VALUES (new.id, new.comment); END",
+
+    "CREATE TRIGGER tracker_studyday_fts_delete AFTER DELETE ON tracker_studyday BEGIN "
+    "INSERT INTO tracker_studyday_fts(tracker_studyday_fts, rowid, comment) "
+    "VALUES ('delete', old.id, old.comment); END",
+
+    "CREATE TRIGGER tracker_studyday_fts_update AFTER UPDATE OF comment ON tracker_studyday BEGIN "
+    "INSERT INTO tracker_studyday_fts(tracker_studyday_fts, rowid, comment) "
+    "VALUES ('delete', old.id, old.comment); "
+    "INSERT INTO tracker_studyday_fts(rowid, comment) VALUES (new.id, new.comment); END",
+
+    "INSERT INTO tracker_studyday_fts(tracker_studyday_fts) VALUES ('rebuild')",
+)
+
+DROP_SQL = (
+    'DROP TRIGGER IF EXISTS tracker_studyday_fts_insert',
+    'DROP TRIGGER IF EXISTS tracker_studyday_fts_delete',
+    'DROP TRIGGER IF EXISTS tracker_studyday_fts_update',
+    'DROP TABLE IF EXISTS tracker_studyday_fts',
+)
+
+
+def create_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in CREATE_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0006_user_scoping'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_cube(apps, schema_editor):
+    from collections import Counter
+
+    StudyDay = apps.get_model('tracker', 'StudyDay')
+    ScoreCount = apps.get_model('tracker', 'ScoreCount')
+
+    counts = Counter()
+    rows = StudyDay.objects.values_list('user', 'date', 'mood', 'fatigue', 'productivity')
+    for user_id, day, mood, fatigue, productivity in rows.iterator():
+        counts[(user_id, day.replace(day=1), mood, fatigue, productivity)] += 1
+
+    ScoreCount.objects.bulk_create(
+        [
+            ScoreCount(
+                user_id=user_id, month=month, mood=mood,
+                fatigue=fatigue, productivity=productivity, days_count=count,
+            )
+            for (user_id, month, mood, fatigue, productivity), count in counts.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tracker', '0007_studyday_comment_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Месяц')),
+                ('mood', models.PositiveSmallIntegerField(verbose_name='Настроение')),
+                ('fatigue', models.PositiveSmallIntegerField(verbose_name='Усталость')),
+                ('productivity', models.PositiveSmallIntegerField(verbose_name='Продуктивность')),
+                ('days_count', models.PositiveIntegerField(default=0, verbose_name='Количество дней')),
+                ('user', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='score_counts', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Ячейка куба оценок',
+                'verbose_name_plural': 'Куб оценок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='scorecount',
+            constraint=models.UniqueConstraint(fields=('user', 'month', 'mood', 'fatigue', 'productivity'), name='unique_score_count_user_month_scores'),
+        ),
+        migrations.AddConstraint(
+            model_name='scorecount',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', True)), fields=('month', 'mood', 'fatigue', 'productivity'), name='unique_score_count_month_scores'),
+        ),
+        migrations.RunPython(build_cube, migrations.RunPython.noop),
+    ]
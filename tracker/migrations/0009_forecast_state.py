@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:57
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.functions.comparison
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tracker', '0008_score_cube'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForecastState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_date', models.DateField(verbose_name='Последний учтённый день')),
+                ('observations', models.PositiveIntegerField(default=0, verbose_name='Учтено дней')),
+                ('state', models.JSONField(verbose_name='Состояние модели')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+                ('user', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='forecast_states', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Состояние прогноза',
+                'verbose_name_plural': 'Состояния прогноза',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='forecaststate',
+            constraint=models.UniqueConstraint(django.db.models.functions.comparison.Coalesce('user', models.Value(0)), name='unique_forecast_state_owner'),
+        ),
+    ]
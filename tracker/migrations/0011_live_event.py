@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:06
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tracker', '0010_job_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LiveEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20, verbose_name='Тип')),
+                ('payload', models.JSONField(verbose_name='Данные')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Создано')),
+                ('user', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='live_events', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Событие для дашборда',
+                'verbose_name_plural': 'События для дашборда',
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.functions.comparison
+import time
+
+
+def seed_versions(apps, schema_editor):
+    # версии всем владельцам и месяцам, где уже есть дни: область без версии
+    # считается не менявшейся и кэшируется под версией 0
+    StudyDay = apps.get_model('tracker', 'StudyDay')
+    DataVersion = apps.get_model('tracker', 'DataVersion')
+    version = time.time_ns() // 1_000_000
+    scopes = set()
+    for user_id, day_date in StudyDay.objects.values_list('user_id', 'date').iterator():
+        scopes.update([(user_id, 'data'), (user_id, day_date.strftime('%Y-%m'))])
+    if scopes:
+        scopes.add((None, 'all-users'))
+    DataVersion.objects.bulk_create(
+        [DataVersion(user_id=user_id, scope=scope, version=version) for user_id, scope in scopes],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tracker', '0011_live_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=16, verbose_name='Область')),
+                ('version', models.BigIntegerField(verbose_name='Версия')),
+                ('user', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='data_versions', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Версия данных',
+                'verbose_name_plural': 'Версии данных',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dataversion',
+            constraint=models.UniqueConstraint(django.db.models.functions.comparison.Coalesce('user', models.Value(0)), models.F('scope'), name='unique_data_version_scope'),
+        ),
+        migrations.RunPython(seed_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+def drop_ranged(apps, schema_editor):
+    # рекомендации за диапазоны дат больше не сохраняются: прежние наборы
+    # никто не читает и не обновляет
+    Recommendation = apps.get_model('tracker', 'Recommendation')
+    Recommendation.objects.exclude(range_from__isnull=True, range_to__isnull=True).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0012_data_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_ranged, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0013_drop_ranged_recommendations'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recommendation',
+            name='study_day',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recommendations', to='tracker.studyday', verbose_name='Учебный день'),
+        ),
+    ]
@@ -1,8 +1,21 @@
+from django.conf import settings
 from django.db import models
+from django.db.models.functions import Coalesce
 
 
 class StudyDay(models.Model):
-    date = models.DateField(verbose_name='Дата')
+    # пустой владелец — общие данные без входа в систему
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='study_days',
+        verbose_name='Пользователь',
+        null=True,
+        blank=True,
+        db_index=False
+    )
+
+    date = models.DateField(verbose_name='Дата', db_index=True)
 
     mood = models.IntegerField(
         verbose_name='Настроение',
@@ -35,6 +48,15 @@ class StudyDay(models.Model):
         verbose_name = 'День учёбы'
         verbose_name_plural = 'Дни учёбы'
         ordering = ['-date']
+        indexes = [
+            # покрывающий индекс: пользователь, диапазон дат и все оценки
+            # без обращения к таблице; префикс (user, date) заменяет
+            # отдельные индексы по владельцу
+            models.Index(
+                fields=['user', 'date', 'mood', 'fatigue', 'productivity'],
+                name='studyday_user_scores_idx'
+            ),
+        ]
 
     @property
     def effectiveness_level(self):
@@ -45,11 +67,62 @@ class StudyDay(models.Model):
         return 'high'
 
 class Recommendation(models.Model):
+    TYPE_CHOICES = [
+        ('info', 'Информационная'),
+        ('success', 'Положительная'),
+        ('warning', 'Предупреждение'),
+        ('danger', 'Тревожная'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='recommendations',
+        verbose_name='Пользователь',
+        null=True,
+        blank=True,
+        db_index=False
+    )
+    # последний учтённый день; его удаление не удаляет набор — до пересчёта
+    # задачей очереди показываются прежние рекомендации
     study_day = models.ForeignKey(
         StudyDay,
-        on_delete=models.CASCADE,
+        on_delete=models.SET_NULL,
         related_name='recommendations',
-        verbose_name='Учебный день'
+        verbose_name='Учебный день',
+        null=True,
+        blank=True
+    )
+    recommendation_type = models.CharField(
+        verbose_name='Тип рекомендации',
+        max_length=10,
+        choices=TYPE_CHOICES,
+        default='info'
+    )
+    icon = models.CharField(
+        verbose_name='Значок',
+        max_length=8,
+        blank=True
+    )
+    rule = models.CharField(
+        verbose_name='Правило',
+        max_length=50,
+        blank=True
+    )
+    # диапазон дат, для которого сформирована рекомендация (пусто — все данные)
+    range_from = models.DateField(
+        verbose_name='Период с',
+        null=True,
+        blank=True
+    )
+    range_to = models.DateField(
+        verbose_name='Период по',
+        null=True,
+        blank=True
+    )
+    position = models.PositiveSmallIntegerField(
+        verbose_name='Порядок',
+        default=0
     )
     text = models.TextField(
         verbose_name='Текст рекомендации'
@@ -60,16 +133,65 @@ class Recommendation(models.Model):
     )
 
     def __str__(self):
+        if self.study_day_id is None:
+            return f"Рекомендация ({self.rule})"
         return f"Рекомендация для {self.study_day.date}"
 
     class Meta:
         verbose_name = 'Рекомендация'
         verbose_name_plural = 'Рекомендации'
+        ordering = ['position']
+        indexes = [
+            models.Index(
+                fields=['user', 'range_from', 'range_to', 'position'],
+                name='recommendation_range_idx'
+            ),
+        ]
 
 class StudyMetric(models.Model):
+    PERIOD_DAY = 'day'
+    PERIOD_WEEK = 'week'
+    PERIOD_MONTH = 'month'
+    PERIOD_CHOICES = [
+        (PERIOD_DAY, 'День'),
+        (PERIOD_WEEK, 'Неделя'),
+        (PERIOD_MONTH, 'Месяц'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='study_metrics',
+        verbose_name='Пользователь',
+        null=True,
+        blank=True,
+        db_index=False
+    )
+    period = models.CharField(
+        verbose_name='Период',
+        max_length=5,
+        choices=PERIOD_CHOICES,
+        default=PERIOD_DAY
+    )
     date = models.DateField(
         verbose_name='Дата'
     )
+    days_count = models.PositiveIntegerField(
+        verbose_name='Количество записей',
+        default=0
+    )
+    mood_sum = models.PositiveIntegerField(
+        verbose_name='Сумма настроения',
+        default=0
+    )
+    fatigue_sum = models.PositiveIntegerField(
+        verbose_name='Сумма усталости',
+        default=0
+    )
+    productivity_sum = models.PositiveIntegerField(
+        verbose_name='Сумма продуктивности',
+        default=0
+    )
     avg_mood = models.FloatField(
         verbose_name='Среднее настроение'
     )
@@ -81,8 +203,268 @@ class StudyMetric(models.Model):
     )
 
     def __str__(self):
-        return f"Метрики за {self.date}"
+        return f"Метрики за {self.get_period_display().lower()} {self.date}"
+
+    def refresh_averages(self):
+        # средние всегда пересчитываются из сумм, чтобы объединение периодов было точным
+        self.avg_mood = self.mood_sum / self.days_count
+        self.avg_fatigue = self.fatigue_sum / self.days_count
+        self.avg_productivity = self.productivity_sum / self.days_count
 
     class Meta:
         verbose_name = 'Метрика учебной активности'
         verbose_name_plural = 'Метрики учебной активности'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'period', 'date'],
+                name='unique_study_metric_user_period_date'
+            ),
+            # NULL в уникальном индексе не совпадает сам с собой,
+            # поэтому общие метрики без владельца ограничиваем отдельно
+            models.UniqueConstraint(
+                fields=['period', 'date'],
+                condition=models.Q(user__isnull=True),
+                name='unique_study_metric_period_date'
+            ),
+        ]
+
+
+class ScoreCount(models.Model):
+    # ячейка куба 5×5×5: сколько дней владельца за месяц имели такое сочетание оценок
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='score_counts',
+        verbose_name='Пользователь',
+        null=True,
+        blank=True,
+        db_index=False
+    )
+    month = models.DateField(
+        verbose_name='Месяц'
+    )
+    mood = models.PositiveSmallIntegerField(
+        verbose_name='Настроение'
+    )
+    fatigue = models.PositiveSmallIntegerField(
+        verbose_name='Усталость'
+    )
+    productivity = models.PositiveSmallIntegerField(
+        verbose_name='Продуктивность'
+    )
+    days_count = models.PositiveIntegerField(
+        verbose_name='Количество дней',
+        default=0
+    )
+
+    def __str__(self):
+        return (
+            f"{self.month:%m.%Y}: настроение {self.mood}, усталость {self.fatigue}, "
+            f"продуктивность {self.productivity} — {self.days_count}"
+        )
+
+    class Meta:
+        verbose_name = 'Ячейка куба оценок'
+        verbose_name_plural = 'Куб оценок'
+        constraints = [
+            # индекс ограничения обслуживает и выборку месяцев владельца
+            models.UniqueConstraint(
+                fields=['user', 'month', 'mood', 'fatigue', 'productivity'],
+                name='unique_score_count_user_month_scores'
+            ),
+            models.UniqueConstraint(
+                fields=['month', 'mood', 'fatigue', 'productivity'],
+                condition=models.Q(user__isnull=True),
+                name='unique_score_count_month_scores'
+            ),
+        ]
+
+
+class ForecastState(models.Model):
+    # обученная модель прогноза владельца: прогноз не читает историю заново
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='forecast_states',
+        verbose_name='Пользователь',
+        null=True,
+        blank=True,
+        db_index=False
+    )
+    last_date = models.DateField(
+        verbose_name='Последний учтённый день'
+    )
+    observations = models.PositiveIntegerField(
+        verbose_name='Учтено дней',
+        default=0
+    )
+    state = models.JSONField(
+        verbose_name='Состояние модели'
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='Обновлено',
+        auto_now=True
+    )
+
+    def __str__(self):
+        return f"Прогноз по {self.last_date} ({self.observations} дн.)"
+
+    class Meta:
+        verbose_name = 'Состояние прогноза'
+        verbose_name_plural = 'Состояния прогноза'
+        constraints = [
+            # одна модель на владельца, включая общие данные без владельца:
+            # NULL не совпадает сам с собой, поэтому индекс по выражению
+            models.UniqueConstraint(
+                Coalesce('user', models.Value(0)),
+                name='unique_forecast_state_owner'
+            ),
+        ]
+
+
+class Job(models.Model):
+    # задача фоновой очереди: таблица в той же базе, брокер не нужен
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'В очереди'),
+        (STATUS_RUNNING, 'Выполняется'),
+        (STATUS_FAILED, 'Ошибка'),
+    ]
+
+    name = models.CharField(
+        verbose_name='Задача',
+        max_length=100
+    )
+    key = models.CharField(
+        verbose_name='Ключ объединения',
+        max_length=200,
+        blank=True,
+        default=''
+    )
+    payload = models.JSONField(
+        verbose_name='Параметры',
+        default=dict
+    )
+    status = models.CharField(
+        verbose_name='Статус',
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(
+        verbose_name='Попыток',
+        default=0
+    )
+    run_after = models.DateTimeField(
+        verbose_name='Не раньше'
+    )
+    locked_at = models.DateTimeField(
+        verbose_name='Взята в работу',
+        null=True,
+        blank=True
+    )
+    last_error = models.TextField(
+        verbose_name='Последняя ошибка',
+        blank=True
+    )
+    created_at = models.DateTimeField(
+        verbose_name='Создана',
+        auto_now_add=True
+    )
+
+    def __str__(self):
+        return f"{self.name} [{self.key or self.pk}] — {self.get_status_display().lower()}"
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            # выборка следующей задачи: WHERE status = 'pending' ORDER BY run_after
+            models.Index(
+                fields=['status', 'run_after'],
+                name='job_status_run_after_idx'
+            ),
+        ]
+        constraints = [
+            # в очереди не больше одной ожидающей задачи на ключ — повторные
+            # постановки сливаются в неё (выполняющаяся задача не мешает новой)
+            models.UniqueConstraint(
+                fields=['key'],
+                condition=models.Q(status='pending') & ~models.Q(key=''),
+                name='unique_pending_job_key'
+            ),
+        ]
+
+
+class LiveEvent(models.Model):
+    # изменение для открытых дашбордов: пишется в транзакции записи,
+    # веб-процессы читают новые строки и рассылают их подписчикам SSE
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='live_events',
+        verbose_name='Пользователь',
+        null=True,
+        blank=True,
+        db_index=False
+    )
+    kind = models.CharField(
+        verbose_name='Тип',
+        max_length=20
+    )
+    payload = models.JSONField(
+        verbose_name='Данные'
+    )
+    created_at = models.DateTimeField(
+        verbose_name='Создано',
+        auto_now_add=True,
+        db_index=True
+    )
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk}"
+
+    class Meta:
+        verbose_name = 'Событие для дашборда'
+        verbose_name_plural = 'События для дашборда'
+
+
+class DataVersion(models.Model):
+    # версия данных владельца для кэшей, ETag и фрагментов шаблонов: хранится
+    # в базе и меняется в транзакции записи, поэтому запись из любого процесса
+    # (импорт, воркер, другой воркер сервера) видна всем веб-процессам
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='data_versions',
+        verbose_name='Пользователь',
+        null=True,
+        blank=True,
+        db_index=False
+    )
+    # 'data' — все данные владельца, 'YYYY-MM' — месяц таблицы дней,
+    # 'recommendations' — сохранённые рекомендации,
+    # 'all-users' (без владельца) — сводка по всем пользователям
+    scope = models.CharField(
+        verbose_name='Область',
+        max_length=16
+    )
+    version = models.BigIntegerField(
+        verbose_name='Версия'
+    )
+
+    def __str__(self):
+        return f"{self.scope}: {self.version}"
+
+    class Meta:
+        verbose_name = 'Версия данных'
+        verbose_name_plural = 'Версии данных'
+        constraints = [
+            models.UniqueConstraint(
+                Coalesce('user', models.Value(0)), 'scope',
+                name='unique_data_version_scope'
+            ),
+        ]
@@ -0,0 +1,149 @@
+import base64
+from datetime import date
+
+from django.core.paginator import Paginator
+from django.utils import formats
+from django.utils.functional import cached_property
+
+from . import cache
+from .analytics import ROW_FIELDS, DayRow
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+# =========================
+# КУРСОР (date, id)
+# =========================
+def encode_cursor(day, pk):
+    raw = f'{day.isoformat()}:{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        day, pk = raw.split(':')
+        return date.fromisoformat(day), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Некорректный курсор')
+
+
+# =========================
+# СТРАНИЦА ПО КЛЮЧУ
+# =========================
+def keyset_page(days_qs, cursor=None, limit=PAGE_SIZE):
+    """
+    Страница строк после курсора в порядке (date, id). В отличие от OFFSET,
+    стоимость не растёт с номером страницы: SQLite продолжает обход индекса
+    (user, date, ...) с позиции курсора — id как rowid входит в каждую запись индекса.
+
+    Возвращает (rows, next_cursor); next_cursor = None на последней странице.
+    """
+    return _split(list(_page_rows(days_qs, cursor, limit)), limit)
+
+
+async def akeyset_page(days_qs, cursor=None, limit=PAGE_SIZE):
+    # то же для асинхронных представлений (ASGI)
+    return _split([row async for row in _page_rows(days_qs, cursor, limit)], limit)
+
+
+def _page_rows(days_qs, cursor, limit):
+    if cursor:
+        last_date, last_id = decode_cursor(cursor)
+        # date >= курсора — граница диапазона по индексу; строки той же даты
+        # до курсора отсекаются по id
+        days_qs = days_qs.filter(date__gte=last_date).exclude(date=last_date, id__lte=last_id)
+
+    # лишняя строка говорит, есть ли следующая страница, без COUNT(*)
+    return days_qs.order_by('date', 'id').values_list(*ROW_FIELDS)[:limit + 1]
+
+
+def _split(rows, limit):
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, next_cursor(rows)
+    return rows, None
+
+
+def next_cursor(rows):
+    # rows — кортежи в порядке ROW_FIELDS: (id, date, ...)
+    last = rows[-1]
+    return encode_cursor(last[1], last[0])
+
+
+def first_page(rows, limit=PAGE_SIZE):
+    # первая страница из уже прочитанных строк — без отдельного запроса
+    if len(rows) > limit:
+        return rows[:limit], next_cursor(rows[:limit])
+    return rows, None
+
+
+def row_payload(day):
+    # day — DayRow; та же строка таблицы, что рисует шаблон
+    return {
+        'id': day.id,
+        'date': day.date.isoformat(),
+        'date_display': formats.date_format(day.date),
+        'mood': day.mood,
+        'fatigue': day.fatigue,
+        'productivity': day.productivity,
+        'effectiveness_level': day.effectiveness_level,
+        'comment': day.comment,
+    }
+
+
+def page_payload(rows, cursor):
+    return {
+        'rows': [row_payload(day) for day in map(DayRow._make, rows)],
+        'next': cursor,
+    }
+
+
+# =========================
+# КУСКИ ТАБЛИЦЫ ДЛЯ КЭША ФРАГМЕНТОВ
+# =========================
+def row_chunks(rows, versions):
+    """
+    Строки таблицы (по порядку (date, id)), разбитые по месяцам. Шаблон
+    кэширует каждый кусок отдельно под ключом из месяца, его версии и
+    крайних id: новый день сбрасывает только свой месяц, а страница или
+    фильтр, обрезавшие месяц, дают другой ключ.
+    """
+    groups = []
+    month = None
+    for day in rows:
+        # сравнение (год, месяц) вместо форматирования даты в каждой строке
+        if (day.date.year, day.date.month) != month:
+            month = (day.date.year, day.date.month)
+            groups.append((cache.bucket_of(day.date), []))
+        groups[-1][1].append(day)
+
+    return [
+        {'days': days, 'key': f'{bucket}:{cache.bucket_version(versions, bucket)}:{days[0].id}:{days[-1].id}'}
+        for bucket, days in groups
+    ]
+
+
+# =========================
+# ОЦЕНКА ЧИСЛА СТРОК ДЛЯ АДМИНКИ
+# =========================
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator без полного COUNT(*) по большой таблице. Для списка без
+    фильтров число строк берётся из estimate_count(), с фильтрами или поиском
+    COUNT останавливается на exact_limit строках — дальше страницы не листаются,
+    и фильтр нужно сузить.
+    """
+    exact_limit = 10_000
+
+    def estimate_count(self):
+        return None
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.has_filters():
+            estimate = self.estimate_count()
+            if estimate is not None:
+                return estimate
+        return self.object_list.order_by()[:self.exact_limit].count()
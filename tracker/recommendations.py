@@ -0,0 +1,284 @@
+from django.db import transaction
+
+from . import analytics, cache, jobs, live
+from .models import Recommendation
+from .routers import use_primary
+
+# пороги правил
+TREND_MIN_DAYS = 4
+# изменение продуктивности в день по наклону регрессии
+TREND_SLOPE = 0.1
+# скользящее стандартное отклонение за окно
+INSTABILITY_STD = 1.0
+# отставание среднего за последнее окно от общего среднего
+RECENT_DROP = 0.75
+CORRELATION_MIN_DAYS = 7
+STRONG_CORRELATION = 0.5
+
+
+# =========================
+# РЕКОМЕНДАТЕЛЬНАЯ СИСТЕМА
+# =========================
+def generate_recommendations(stats):
+    recommendations = []
+
+    if not stats.count:
+        return [{
+            'type': 'info',
+            'icon': 'ℹ️',
+            'rule': 'no_data',
+            'text': 'Недостаточно данных для формирования рекомендаций.'
+        }]
+
+    avg_mood = stats.avg_mood
+    avg_fatigue = stats.avg_fatigue
+    avg_productivity = stats.avg_productivity
+
+    # =========================
+    # ОБЩАЯ ОЦЕНКА СОСТОЯНИЯ
+    # =========================
+    if avg_productivity >= 4:
+        recommendations.append({
+            'type': 'success',
+            'icon': '🟢',
+            'rule': 'high_productivity',
+            'text': (
+                "В целом наблюдается высокий уровень учебной продуктивности. "
+                "Текущий учебный режим можно считать эффективным."
+            )
+        })
+    elif avg_productivity <= 2.5:
+        recommendations.append({
+            'type': 'danger',
+            'icon': '🔴',
+            'rule': 'low_productivity',
+            'text': (
+                "Средний уровень учебной продуктивности находится на низком уровне. "
+                "Рекомендуется пересмотреть организацию учебного процесса."
+            )
+        })
+    else:
+        recommendations.append({
+            'type': 'info',
+            'icon': '🔵',
+            'rule': 'medium_productivity',
+            'text': (
+                "Учебная продуктивность находится на среднем уровне. "
+                "Существует потенциал для её повышения."
+            )
+        })
+
+    # =========================
+    # НАСТРОЕНИЕ + ПРОДУКТИВНОСТЬ
+    # =========================
+    if avg_mood >= 4 and avg_productivity < 3.5:
+        recommendations.append({
+            'type': 'warning',
+            'icon': '🟡',
+            'rule': 'mood_without_productivity',
+            'text': (
+                "Несмотря на положительное эмоциональное состояние, уровень продуктивности остаётся невысоким. "
+                "Возможно, проблема связана с планированием или отвлекающими факторами."
+            )
+        })
+
+    if avg_mood >= 4 and avg_productivity >= 4:
+        recommendations.append({
+            'type': 'success',
+            'icon': '✨',
+            'rule': 'mood_supports_productivity',
+            'text': (
+                "Положительное настроение способствует высокой учебной эффективности. "
+                "Рекомендуется планировать сложные задачи на такие периоды."
+            )
+        })
+
+    # =========================
+    # УСТАЛОСТЬ + ПРОДУКТИВНОСТЬ
+    # =========================
+    if avg_fatigue >= 4 and avg_productivity >= 3:
+        recommendations.append({
+            'type': 'warning',
+            'icon': '⚠️',
+            'rule': 'fatigue_overload_risk',
+            'text': (
+                "Высокая усталость сочетается с сохранением продуктивности. "
+                "Это может указывать на риск переутомления."
+            )
+        })
+
+    if avg_fatigue >= 4 and avg_productivity < 3:
+        recommendations.append({
+            'type': 'danger',
+            'icon': '😴',
+            'rule': 'fatigue_hurts_productivity',
+            'text': (
+                "Повышенная усталость негативно влияет на учебную эффективность. "
+                "Рекомендуется сократить нагрузку и уделить внимание восстановлению."
+            )
+        })
+
+    series = stats.series
+
+    # =========================
+    # АНАЛИЗ ДИНАМИКИ (наклон регрессии за последние две недели)
+    # =========================
+    if stats.count >= TREND_MIN_DAYS:
+        if series.recent_slope >= TREND_SLOPE:
+            recommendations.append({
+                'type': 'success',
+                'icon': '📈',
+                'rule': 'trend_up',
+                'text': (
+                    "Отмечается положительная динамика учебной продуктивности за последние дни. "
+                    "Текущий подход к обучению даёт хорошие результаты."
+                )
+            })
+
+        if series.recent_slope <= -TREND_SLOPE:
+            recommendations.append({
+                'type': 'danger',
+                'icon': '📉',
+                'rule': 'trend_down',
+                'text': (
+                    "Наблюдается устойчивая тенденция к снижению продуктивности. "
+                    "Рекомендуется скорректировать учебный режим."
+                )
+            })
+
+    if (
+        stats.count >= series.window * 2
+        and series.recent_mean <= avg_productivity - RECENT_DROP
+    ):
+        recommendations.append({
+            'type': 'warning',
+            'icon': '⏬',
+            'rule': 'recent_drop',
+            'text': (
+                f"За последние {series.window} дней средняя продуктивность "
+                f"({series.recent_mean:.2f}) заметно ниже обычной ({avg_productivity:.2f}). "
+                "Стоит проверить, что изменилось в режиме."
+            )
+        })
+
+    # =========================
+    # НЕСТАБИЛЬНОСТЬ (скользящее стандартное отклонение)
+    # =========================
+    if series.recent_std is not None:
+        unstable = series.recent_std >= INSTABILITY_STD
+    else:
+        unstable = stats.max_productivity - stats.min_productivity >= 3
+
+    if unstable:
+        recommendations.append({
+            'type': 'info',
+            'icon': '🔄',
+            'rule': 'unstable_productivity',
+            'text': (
+                "Учебная продуктивность характеризуется резкими колебаниями. "
+                "Рекомендуется стабилизировать расписание и нагрузку."
+            )
+        })
+
+    # =========================
+    # СВЯЗЬ ФАКТОРОВ С ПРОДУКТИВНОСТЬЮ (корреляция Спирмена)
+    # =========================
+    if stats.count >= CORRELATION_MIN_DAYS:
+        if series.spearman_mood is not None and series.spearman_mood >= STRONG_CORRELATION:
+            recommendations.append({
+                'type': 'info',
+                'icon': '🙂',
+                'rule': 'mood_correlation',
+                'text': (
+                    f"Продуктивность заметно зависит от настроения (ρ = {series.spearman_mood:.2f}). "
+                    "Сложные задачи лучше переносить на дни с хорошим самочувствием."
+                )
+            })
+
+        if series.spearman_fatigue is not None and series.spearman_fatigue <= -STRONG_CORRELATION:
+            recommendations.append({
+                'type': 'warning',
+                'icon': '🔋',
+                'rule': 'fatigue_correlation',
+                'text': (
+                    f"Усталость заметно снижает продуктивность (ρ = {series.spearman_fatigue:.2f}). "
+                    "Регулярный отдых окупится более продуктивными днями."
+                )
+            })
+
+    return recommendations
+
+
+# =========================
+# ХРАНЕНИЕ В МОДЕЛИ Recommendation
+# =========================
+# Сохраняется только набор по всем данным владельца (range_from = range_to = NULL):
+# его показывает главная без фильтра, экспорт и админка, а обновляет задача
+# refresh_recommendations. Запись дня набор не удаляет: до пересчёта в очереди
+# показываются прежние рекомендации. Рекомендации за диапазон дат считаются
+# при чтении и не сохраняются — иначе каждый новый диапазон в GET-запросе
+# добавлял бы строки в таблицу; повторы того же диапазона отдаёт кэш дашборда.
+def refresh_key(user_id=None):
+    # ключ задачи пересчёта: постановки для одного владельца объединяются
+    return f'recommendations:{user_id}'
+
+
+def stored_for_range(date_from=None, date_to=None, user_id=None):
+    return Recommendation.objects.filter(
+        user_id=user_id, range_from=date_from, range_to=date_to
+    )
+
+
+def build_recommendations(items, date_from=None, date_to=None, study_day_id=None, user_id=None):
+    return [
+        Recommendation(
+            user_id=user_id,
+            study_day_id=study_day_id,
+            recommendation_type=item['type'],
+            icon=item['icon'],
+            rule=item['rule'],
+            text=item['text'],
+            range_from=date_from,
+            range_to=date_to,
+            position=position,
+        )
+        for position, item in enumerate(items)
+    ]
+
+
+def store_recommendations(items, study_day_id=None, user_id=None):
+    objects = build_recommendations(items, study_day_id=study_day_id, user_id=user_id)
+
+    with transaction.atomic():
+        stored_for_range(user_id=user_id).delete()
+        Recommendation.objects.bulk_create(objects)
+        # новый набор — новый ключ кэша дашборда, хотя версия данных не менялась
+        cache.bump_recommendations(user_id)
+        # открытые дашборды без фильтра показывают именно этот набор
+        live.publish_recommendations(items, user_id)
+
+    return objects
+
+
+def get_recommendations(days_qs, date_from=None, date_to=None, user_id=None):
+    """
+    Рекомендации для дашборда. Для диапазона дат — по дням days_qs, без
+    записи в базу. По всем данным — сохранённый набор одним запросом, даже
+    если после него были записи: полный проход по дням делает задача
+    refresh_recommendations в воркере. Пока первый набор владельца ждёт
+    очереди, список пуст. Набор без задачи (данные появились раньше очереди)
+    считается и сохраняется здесь; дни для этого читаются с основной базы —
+    сохранённое по отстающей копии analytics осталось бы устаревшим.
+    """
+    if date_from and date_to:
+        stats = analytics.analyze_queryset(days_qs)
+        return build_recommendations(generate_recommendations(stats), date_from, date_to, user_id=user_id)
+
+    stored = list(stored_for_range(user_id=user_id).order_by('position'))
+    if stored or jobs.is_queued(refresh_key(user_id)):
+        return stored
+
+    with use_primary():
+        stats = analytics.analyze_queryset(days_qs)
+    study_day_id = stats.days[-1].id if stats.days else None
+    return store_recommendations(generate_recommendations(stats), study_day_id, user_id)
@@ -0,0 +1,380 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from .models import StudyDay, StudyMetric
+
+PERIODS = (
+    StudyMetric.PERIOD_DAY,
+    StudyMetric.PERIOD_WEEK,
+    StudyMetric.PERIOD_MONTH,
+)
+
+
+# =========================
+# ГРАНИЦЫ ПЕРИОДОВ
+# =========================
+def period_start(period, day):
+    if period == StudyMetric.PERIOD_WEEK:
+        return day - timedelta(days=day.weekday())
+    if period == StudyMetric.PERIOD_MONTH:
+        return day.replace(day=1)
+    return day
+
+
+def period_end(period, day):
+    start = period_start(period, day)
+    if period == StudyMetric.PERIOD_WEEK:
+        return start + timedelta(days=6)
+    if period == StudyMetric.PERIOD_MONTH:
+        return next_period(period, start) - timedelta(days=1)
+    return start
+
+
+def next_period(period, start):
+    if period == StudyMetric.PERIOD_WEEK:
+        return start + timedelta(days=7)
+    if period == StudyMetric.PERIOD_MONTH:
+        if start.month == 12:
+            return start.replace(year=start.year + 1, month=1)
+        return start.replace(month=start.month + 1)
+    return start + timedelta(days=1)
+
+
+# =========================
+# ИНКРЕМЕНТАЛЬНОЕ ОБНОВЛЕНИЕ
+# =========================
+def collect_deltas(rows, sign=1):
+    """
+    Сворачивает строки (date, mood, fatigue, productivity) в изменения
+    по каждому периоду: {(period, start): [count, mood, fatigue, productivity]}.
+    """
+    deltas = defaultdict(lambda: [0, 0, 0, 0])
+
+    for day, mood, fatigue, productivity in rows:
+        for period in PERIODS:
+            bucket = deltas[(period, period_start(period, day))]
+            bucket[0] += sign
+            bucket[1] += sign * mood
+            bucket[2] += sign * fatigue
+            bucket[3] += sign * productivity
+
+    return deltas
+
+
+def merge_deltas(target, deltas):
+    for key, values in deltas.items():
+        bucket = target.setdefault(key, [0, 0, 0, 0])
+        for i, value in enumerate(values):
+            bucket[i] += value
+    return target
+
+
+def user_metrics(user_id=None):
+    # метрики одного владельца; user_id = None — общие данные без владельца
+    return StudyMetric.objects.filter(user_id=user_id)
+
+
+def apply_deltas(deltas, user_id=None):
+    # одна строка метрики на период, а не на каждую запись StudyDay
+    deltas = {key: values for key, values in deltas.items() if any(values)}
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        lookup = keys_filter(deltas, contiguous_months=False)
+
+        existing = {
+            (m.period, m.date): m
+            for m in user_metrics(user_id).select_for_update().filter(lookup)
+        }
+
+        to_create, to_update, to_delete = [], [], []
+
+        for key, (count, mood, fatigue, productivity) in deltas.items():
+            metric = existing.get(key)
+            if metric is None:
+                metric = StudyMetric(user_id=user_id, period=key[0], date=key[1])
+                is_new = True
+            else:
+                is_new = False
+
+            metric.days_count += count
+            metric.mood_sum += mood
+            metric.fatigue_sum += fatigue
+            metric.productivity_sum += productivity
+
+            if metric.days_count <= 0:
+                if not is_new:
+                    to_delete.append(metric.pk)
+                continue
+
+            metric.refresh_averages()
+            (to_create if is_new else to_update).append(metric)
+
+        if to_create:
+            StudyMetric.objects.bulk_create(to_create)
+        if to_update:
+            StudyMetric.objects.bulk_update(to_update, [
+                'days_count', 'mood_sum', 'fatigue_sum', 'productivity_sum',
+                'avg_mood', 'avg_fatigue', 'avg_productivity',
+            ])
+        if to_delete:
+            StudyMetric.objects.filter(pk__in=to_delete).delete()
+
+
+def add_days(rows, user_id=None):
+    apply_deltas(collect_deltas(rows, sign=1), user_id)
+
+
+def remove_days(rows, user_id=None):
+    apply_deltas(collect_deltas(rows, sign=-1), user_id)
+
+
+# =========================
+# ПОЛНАЯ ПЕРЕСБОРКА
+# =========================
+def build_metrics(deltas, metric_model=StudyMetric):
+    # deltas: {(user_id, period, start): [count, mood, fatigue, productivity]}
+    metrics = []
+    for (user_id, period, start), (count, mood, fatigue, productivity) in deltas.items():
+        if count <= 0:
+            continue
+        metric = metric_model(
+            user_id=user_id,
+            period=period,
+            date=start,
+            days_count=count,
+            mood_sum=mood,
+            fatigue_sum=fatigue,
+            productivity_sum=productivity,
+            avg_mood=mood / count,
+            avg_fatigue=fatigue / count,
+            avg_productivity=productivity / count,
+        )
+        metrics.append(metric)
+    return metrics
+
+
+def daily_rows(day_model=StudyDay):
+    # агрегируем по владельцу и дате на стороне БД — дальше работаем
+    # с одной строкой на пару (user, date)
+    return (
+        day_model.objects
+        .order_by()
+        .values('user', 'date')
+        .annotate(
+            count=Count('id'),
+            mood=Sum('mood'),
+            fatigue=Sum('fatigue'),
+            productivity=Sum('productivity'),
+        )
+        .values_list('user', 'date', 'count', 'mood', 'fatigue', 'productivity')
+    )
+
+
+def rebuild(day_model=StudyDay, metric_model=StudyMetric, batch_size=1000):
+    deltas = {}
+    for user_id, day, count, mood, fatigue, productivity in daily_rows(day_model).iterator():
+        for period in PERIODS:
+            bucket = deltas.setdefault((user_id, period, period_start(period, day)), [0, 0, 0, 0])
+            bucket[0] += count
+            bucket[1] += mood
+            bucket[2] += fatigue
+            bucket[3] += productivity
+
+    with transaction.atomic():
+        metric_model.objects.all().delete()
+        metric_model.objects.bulk_create(
+            build_metrics(deltas, metric_model),
+            batch_size=batch_size,
+        )
+
+    return len(deltas)
+
+
+# =========================
+# ЗАПРОСЫ ПО ДИАПАЗОНУ
+# =========================
+def cover(start, end):
+    """
+    Покрывает диапазон [start, end] минимальным набором целых периодов:
+    полные месяцы, внутри неполных месяцев — недели, по краям — дни.
+    """
+    keys = []
+    day = start
+
+    while day <= end:
+        month_limit = next_period(StudyMetric.PERIOD_MONTH, period_start(StudyMetric.PERIOD_MONTH, day))
+
+        if day.day == 1 and period_end(StudyMetric.PERIOD_MONTH, day) <= end:
+            period = StudyMetric.PERIOD_MONTH
+        elif (
+            day.weekday() == 0
+            and period_end(StudyMetric.PERIOD_WEEK, day) <= end
+            and period_end(StudyMetric.PERIOD_WEEK, day) < month_limit
+        ):
+            period = StudyMetric.PERIOD_WEEK
+        else:
+            period = StudyMetric.PERIOD_DAY
+
+        keys.append((period, day))
+        day = next_period(period, day)
+
+    return keys
+
+
+def keys_filter(keys, contiguous_months=True):
+    by_period = defaultdict(list)
+    for period, start in keys:
+        by_period[period].append(start)
+
+    lookup = Q()
+    for period, starts in by_period.items():
+        if contiguous_months and period == StudyMetric.PERIOD_MONTH:
+            # полные месяцы идут подряд — хватает одного условия по диапазону
+            lookup |= Q(period=period, date__range=(min(starts), max(starts)))
+        else:
+            lookup |= Q(period=period, date__in=starts)
+    return lookup
+
+
+def range_metrics(date_from=None, date_to=None):
+    # строки метрик всех владельцев, в сумме покрывающие диапазон
+    if date_from and date_to:
+        if date_from > date_to:
+            return StudyMetric.objects.none()
+        return StudyMetric.objects.filter(keys_filter(cover(date_from, date_to)))
+    return StudyMetric.objects.filter(period=StudyMetric.PERIOD_MONTH)
+
+
+TOTALS = {
+    'count': Sum('days_count'),
+    'mood': Sum('mood_sum'),
+    'fatigue': Sum('fatigue_sum'),
+    'productivity': Sum('productivity_sum'),
+}
+
+
+def range_totals(date_from=None, date_to=None, user_id=None):
+    metrics = range_metrics(date_from, date_to).filter(user_id=user_id)
+    return _totals(metrics.aggregate(**TOTALS))
+
+
+async def arange_totals(date_from=None, date_to=None, user_id=None):
+    # то же для асинхронных представлений (ASGI)
+    metrics = range_metrics(date_from, date_to).filter(user_id=user_id)
+    return _totals(await metrics.aaggregate(**TOTALS))
+
+
+def _totals(totals):
+    return (
+        totals['count'] or 0,
+        totals['mood'] or 0,
+        totals['fatigue'] or 0,
+        totals['productivity'] or 0,
+    )
+
+
+def range_averages(date_from=None, date_to=None, user_id=None):
+    return averages(range_totals(date_from, date_to, user_id))
+
+
+def averages(totals):
+    count, mood, fatigue, productivity = totals
+
+    if not count:
+        return {
+            'avg_productivity': None,
+            'avg_mood': None,
+            'avg_fatigue': None,
+        }
+
+    return {
+        'avg_productivity': productivity / count,
+        'avg_mood': mood / count,
+        'avg_fatigue': fatigue / count,
+    }
+
+
+def series(period, date_from=None, date_to=None, user_id=None):
+    """
+    Ряд по периодам (неделям, месяцам) в порядке возрастания даты:
+    [(начало периода, count, mood_sum, fatigue_sum, productivity_sum)].
+    Неполные периоды на краях диапазона собираются из более мелких строк.
+    """
+    if not (date_from and date_to):
+        metrics = user_metrics(user_id).filter(period=period).order_by('date')
+        return list(metrics.values_list(
+            'date', 'days_count', 'mood_sum', 'fatigue_sum', 'productivity_sum'
+        ))
+
+    if date_from > date_to:
+        return []
+
+    keys = []
+    owner = {}
+    bucket = period_start(period, date_from)
+
+    while bucket <= date_to:
+        end = period_end(period, bucket)
+        if bucket >= date_from and end <= date_to:
+            keys.append((period, bucket))
+            owner[(period, bucket)] = bucket
+        else:
+            for key in cover(max(bucket, date_from), min(end, date_to)):
+                keys.append(key)
+                owner[key] = bucket
+        bucket = next_period(period, bucket)
+
+    full = [start for (p, start) in keys if p == period]
+    partial = [key for key in keys if key[0] != period]
+
+    lookup = Q()
+    if full:
+        lookup |= Q(period=period, date__range=(full[0], full[-1]))
+    if partial:
+        lookup |= keys_filter(partial)
+
+    totals = defaultdict(lambda: [0, 0, 0, 0])
+    rows = user_metrics(user_id).filter(lookup).values_list(
+        'period', 'date', 'days_count', 'mood_sum', 'fatigue_sum', 'productivity_sum'
+    )
+    for row_period, start, *values in rows:
+        key = owner.get((row_period, start))
+        if key is None:
+            continue
+        bucket_totals = totals[key]
+        for i, value in enumerate(values):
+            bucket_totals[i] += value
+
+    return [(start, *values) for start, values in sorted(totals.items()) if values[0]]
+
+
+# =========================
+# СВОДКА ПО ПОЛЬЗОВАТЕЛЯМ
+# =========================
+def cohort_totals(date_from=None, date_to=None):
+    """
+    Суммы по каждому владельцу за диапазон из готовых метрик:
+    [(user_id, count, mood_sum, fatigue_sum, productivity_sum)].
+    Число читаемых строк — O(пользователи × периоды покрытия), а не O(дни).
+    """
+    rows = (
+        range_metrics(date_from, date_to)
+        .order_by()
+        .values('user')
+        .annotate(**TOTALS)
+        .values_list('user', 'count', 'mood', 'fatigue', 'productivity')
+    )
+    return [row for row in rows if row[1]]
+
+
+def total_days():
+    # число учебных дней всех владельцев — по помесячным метрикам, без COUNT(*) по таблице дней
+    totals = StudyMetric.objects.filter(period=StudyMetric.PERIOD_MONTH).aggregate(
+        count=Sum('days_count')
+    )
+    return totals['count'] or 0
@@ -0,0 +1,60 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# чтения этих моделей — аналитика: графики, сводки, таблица дней. Версия
+# данных читается с той же копии, что и сами данные: ключ кэша и ETag
+# описывают ровно то, что на ней видно, и отстающая копия не сохранит
+# старые данные под новой версией
+ANALYTICS_MODELS = frozenset({'studyday', 'studymetric', 'dataversion'})
+
+# запрос, который только что писал, читает с основной базы (read-your-writes)
+_use_primary = ContextVar('tracker_use_primary', default=False)
+
+
+@contextmanager
+def use_primary(enabled=True):
+    token = _use_primary.set(enabled)
+    try:
+        yield
+    finally:
+        _use_primary.reset(token)
+
+
+def analytics_alias():
+    alias = getattr(settings, 'TRACKER_ANALYTICS_DATABASE', 'analytics')
+    if alias not in settings.DATABASES:
+        return None
+    # псевдоним, указывающий на ту же базу (зеркало в тестах), ничего не даёт
+    if connections[alias].settings_dict['NAME'] == connections[DEFAULT_DB_ALIAS].settings_dict['NAME']:
+        return None
+    return alias
+
+
+class AnalyticsRouter:
+    """
+    Аналитические чтения — на псевдоним analytics (копия только для чтения),
+    всё остальное — на default. Внутри транзакции и после собственной записи
+    запрос читает с основной базы, чтобы не увидеть отстающую копию.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != 'tracker' or model._meta.model_name not in ANALYTICS_MODELS:
+            return None
+        if _use_primary.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return analytics_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # копия содержит те же строки, что и основная база
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == getattr(settings, 'TRACKER_ANALYTICS_DATABASE', 'analytics'):
+            return False
+        return None
@@ -0,0 +1,190 @@
+from django.contrib.auth import get_user_model
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import cache, cube, forecast, live, rollups, tasks
+from .models import StudyDay
+
+
+def _date(value):
+    # objects.create(date='2024-01-05') допустим: строку приводит поле модели
+    return StudyDay._meta.get_field('date').to_python(value)
+
+
+def _row(day):
+    return _date(day.date), day.mood, day.fatigue, day.productivity
+
+
+def _owner_deleted(origin):
+    """
+    День удаляется каскадом вместе с владельцем (origin — удаляемый
+    пользователь или их QuerySet). Метрики, куб, версии, события и задачи
+    владельца уходят тем же каскадом; строки, созданные обработчиками на
+    удаляемого пользователя, нарушили бы внешний ключ при COMMIT.
+    """
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model is get_user_model()
+
+
+def _previous_owner(instance):
+    # владелец записи до изменения (запись могли передать другому пользователю)
+    return getattr(instance, '_previous_user_id', instance.user_id)
+
+
+# =========================
+# ИНКРЕМЕНТАЛЬНЫЕ МЕТРИКИ
+# =========================
+@receiver(pre_save, sender=StudyDay)
+def remember_previous_day(sender, instance, raw=False, using=None, **kwargs):
+    # при редактировании нужно вычесть старые значения из метрик
+    # дата приводится до записи: все обработчики ниже получают date, а не строку
+    instance.date = _date(instance.date)
+    instance._previous_row = None
+    instance._previous_user_id = instance.user_id
+    if raw or instance._state.adding or instance.pk is None:
+        return
+
+    # читаем с той базы, куда пишем: копия analytics может отставать
+    previous = (
+        sender.objects
+        .using(using)
+        .filter(pk=instance.pk)
+        .values_list('user', 'date', 'mood', 'fatigue', 'productivity')
+        .first()
+    )
+    if previous:
+        instance._previous_user_id = previous[0]
+        instance._previous_row = previous[1:]
+
+
+@receiver(post_save, sender=StudyDay)
+def update_metrics_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    deltas = rollups.collect_deltas([_row(instance)], sign=1)
+
+    previous = getattr(instance, '_previous_row', None)
+    previous_owner = _previous_owner(instance)
+    if previous and previous_owner != instance.user_id:
+        rollups.remove_days([previous], previous_owner)
+    elif previous:
+        rollups.merge_deltas(deltas, rollups.collect_deltas([previous], sign=-1))
+
+    rollups.apply_deltas(deltas, instance.user_id)
+
+
+@receiver(post_delete, sender=StudyDay)
+def update_metrics_on_delete(sender, instance, origin=None, **kwargs):
+    if _owner_deleted(origin):
+        return
+    rollups.remove_days([_row(instance)], instance.user_id)
+
+
+# =========================
+# КУБ ОЦЕНОК
+# =========================
+@receiver(post_save, sender=StudyDay)
+def update_cube_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    cells = cube.collect([_row(instance)], sign=1)
+
+    previous = getattr(instance, '_previous_row', None)
+    previous_owner = _previous_owner(instance)
+    if previous and previous_owner != instance.user_id:
+        cube.remove_days([previous], previous_owner)
+    elif previous:
+        cube.merge(cells, cube.collect([previous], sign=-1))
+
+    cube.apply(cells, instance.user_id)
+
+
+@receiver(post_delete, sender=StudyDay)
+def update_cube_on_delete(sender, instance, origin=None, **kwargs):
+    if _owner_deleted(origin):
+        return
+    cube.remove_days([_row(instance)], instance.user_id)
+
+
+# =========================
+# МОДЕЛЬ ПРОГНОЗА
+# =========================
+# новые дни после last_date модель дообучит сама при следующем прогнозе,
+# сбрасывать её нужно только при правке уже учтённых дней
+@receiver(post_save, sender=StudyDay)
+def invalidate_forecast_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    forecast.invalidate(instance.date, instance.user_id)
+    previous = getattr(instance, '_previous_row', None)
+    if previous:
+        forecast.invalidate(previous[0], _previous_owner(instance))
+
+
+@receiver(post_delete, sender=StudyDay)
+def invalidate_forecast_on_delete(sender, instance, origin=None, **kwargs):
+    if _owner_deleted(origin):
+        return
+    forecast.invalidate(instance.date, instance.user_id)
+
+
+# =========================
+# ВЕРСИЯ ДАННЫХ ДЛЯ КЭША
+# =========================
+@receiver(post_save, sender=StudyDay)
+@receiver(post_delete, sender=StudyDay)
+def bump_data_version(sender, instance, raw=False, origin=None, **kwargs):
+    if raw:
+        return
+    if _owner_deleted(origin):
+        # сводка по всем пользователям всё же меняется
+        cache.bump_all_users()
+        return
+    cache.bump_version(instance.user_id)
+    if _previous_owner(instance) != instance.user_id:
+        cache.bump_version(_previous_owner(instance))
+
+    # куски таблицы в кэше фрагментов: месяц дня и месяц, откуда день перенесли
+    cache.bump_buckets([instance.date], instance.user_id)
+    previous = getattr(instance, '_previous_row', None)
+    if previous:
+        cache.bump_buckets([previous[0]], _previous_owner(instance))
+
+
+# =========================
+# ФОНОВЫЕ ПЕРЕСЧЁТЫ
+# =========================
+# рекомендации и модель прогноза пересчитывает manage.py run_worker; до пересчёта
+# дашборд показывает прежние рекомендации, а устаревший прогноз запросы досчитывают сами
+@receiver(post_save, sender=StudyDay)
+@receiver(post_delete, sender=StudyDay)
+def schedule_recompute(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or _owner_deleted(origin):
+        return
+    tasks.schedule_recompute(instance.user_id)
+    if _previous_owner(instance) != instance.user_id:
+        tasks.schedule_recompute(_previous_owner(instance))
+
+
+# =========================
+# ЖИВЫЕ ОБНОВЛЕНИЯ ДАШБОРДА
+# =========================
+# после версии данных: событие несёт уже новую версию для картинок-спарклайнов
+@receiver(post_save, sender=StudyDay)
+def publish_day_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    live.publish_day(instance)
+    if _previous_owner(instance) != instance.user_id:
+        live.publish_day_deleted(instance.pk, _previous_owner(instance))
+
+
+@receiver(post_delete, sender=StudyDay)
+def publish_day_on_delete(sender, instance, origin=None, **kwargs):
+    if _owner_deleted(origin):
+        return
+    live.publish_day_deleted(instance.pk, instance.user_id)
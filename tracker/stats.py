@@ -0,0 +1,170 @@
+import math
+from array import array
+from itertools import accumulate
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy необязателен
+    np = None
+
+SCORES = range(1, 6)
+
+
+# =========================
+# ПРЕФИКСНЫЕ СУММЫ И СКОЛЬЗЯЩИЕ ОКНА
+# =========================
+def prefix_sums(values):
+    # prefix[i] — сумма первых i значений, prefix[0] = 0
+    if np is not None:
+        return np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+    return array('d', accumulate(values, initial=0.0))
+
+
+def rolling_mean(values, window):
+    n = len(values)
+    if window <= 0 or n < window:
+        return []
+
+    prefix = prefix_sums(values)
+    if np is not None:
+        return (prefix[window:] - prefix[:-window]) / window
+    return array('d', (
+        (prefix[i + window] - prefix[i]) / window for i in range(n - window + 1)
+    ))
+
+
+def rolling_std(values, window):
+    # σ² = E[x²] − E[x]², обе суммы по окну берутся из префиксных сумм
+    n = len(values)
+    if window <= 0 or n < window:
+        return []
+
+    if np is not None:
+        x = np.asarray(values, dtype=np.float64)
+        prefix = prefix_sums(x)
+        prefix_sq = prefix_sums(x * x)
+        mean = (prefix[window:] - prefix[:-window]) / window
+        mean_sq = (prefix_sq[window:] - prefix_sq[:-window]) / window
+        return np.sqrt(np.maximum(mean_sq - mean * mean, 0.0))
+
+    prefix = prefix_sums(values)
+    prefix_sq = prefix_sums(v * v for v in values)
+    result = array('d')
+    for i in range(n - window + 1):
+        mean = (prefix[i + window] - prefix[i]) / window
+        mean_sq = (prefix_sq[i + window] - prefix_sq[i]) / window
+        result.append(math.sqrt(max(mean_sq - mean * mean, 0.0)))
+    return result
+
+
+# =========================
+# ТРЕНД И КОРРЕЛЯЦИИ
+# =========================
+def trend_slope(values):
+    """Наклон линейной регрессии y = a + b·i по номеру дня i (изменение в день)."""
+    n = len(values)
+    if n < 2:
+        return 0.0
+
+    # Σi и Σi² для i = 0..n-1 считаются по формулам
+    sum_x = n * (n - 1) / 2
+    sum_xx = (n - 1) * n * (2 * n - 1) / 6
+
+    if np is not None:
+        y = np.asarray(values, dtype=np.float64)
+        sum_y = float(y.sum())
+        sum_xy = float(np.dot(np.arange(n, dtype=np.float64), y))
+    else:
+        sum_y = float(sum(values))
+        sum_xy = float(sum(i * v for i, v in enumerate(values)))
+
+    denominator = n * sum_xx - sum_x * sum_x
+    return (n * sum_xy - sum_x * sum_y) / denominator
+
+
+def pearson(xs, ys):
+    n = len(xs)
+    if n < 2:
+        return None
+
+    if np is not None:
+        x = np.asarray(xs, dtype=np.float64)
+        y = np.asarray(ys, dtype=np.float64)
+        sum_x, sum_y = x.sum(), y.sum()
+        sum_xx, sum_yy, sum_xy = np.dot(x, x), np.dot(y, y), np.dot(x, y)
+    else:
+        sum_x = sum_y = sum_xx = sum_yy = sum_xy = 0.0
+        for x, y in zip(xs, ys):
+            sum_x += x
+            sum_y += y
+            sum_xx += x * x
+            sum_yy += y * y
+            sum_xy += x * y
+
+    cov = n * sum_xy - sum_x * sum_y
+    var_x = n * sum_xx - sum_x * sum_x
+    var_y = n * sum_yy - sum_y * sum_y
+    if var_x <= 0 or var_y <= 0:
+        return None
+    return float(cov / math.sqrt(var_x * var_y))
+
+
+def score_ranks(values):
+    # оценки принимают значения 1..5, поэтому ранги (со средним рангом для
+    # одинаковых значений) получаются подсчётом, без сортировки
+    if np is not None:
+        values = np.asarray(values, dtype=np.int64)
+        counts = np.bincount(values, minlength=6).tolist()
+    else:
+        counts = [0] * 6
+        for value in values:
+            counts[value] += 1
+
+    rank_of = [0.0] * 6
+    seen = 0
+    for score in SCORES:
+        rank_of[score] = seen + (counts[score] + 1) / 2
+        seen += counts[score]
+
+    if np is not None:
+        return np.asarray(rank_of, dtype=np.float64)[values]
+    return array('d', (rank_of[value] for value in values))
+
+
+def spearman(xs, ys):
+    if len(xs) < 2:
+        return None
+    return pearson(score_ranks(xs), score_ranks(ys))
+
+
+# =========================
+# СВОДКА ПО РЯДАМ
+# =========================
+class SeriesStats:
+    """
+    Статистика по рядам настроения, усталости и продуктивности (по дате).
+    Всё считается за O(n) через префиксные суммы.
+    """
+
+    def __init__(self, moods, fatigues, productivities, window=7):
+        self.count = len(productivities)
+        self.window = window
+
+        self.rolling_productivity = rolling_mean(productivities, window)
+        self.rolling_productivity_std = rolling_std(productivities, window)
+
+        recent = productivities[-window * 2:] if self.count else []
+        self.recent_slope = trend_slope(recent)
+        self.slope = trend_slope(productivities)
+
+        self.recent_mean = (
+            float(self.rolling_productivity[-1]) if len(self.rolling_productivity) else None
+        )
+        self.recent_std = (
+            float(self.rolling_productivity_std[-1]) if len(self.rolling_productivity_std) else None
+        )
+
+        self.pearson_mood = pearson(moods, productivities)
+        self.pearson_fatigue = pearson(fatigues, productivities)
+        self.spearman_mood = spearman(moods, productivities)
+        self.spearman_fatigue = spearman(fatigues, productivities)
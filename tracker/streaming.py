@@ -0,0 +1,105 @@
+import json
+from datetime import date
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+
+EPOCH = date(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+CHUNK_SIZE = 2000
+
+COLUMNAR_FIELDS = ('date', 'mood', 'fatigue', 'productivity')
+
+
+def _dumps(value):
+    return json.dumps(value, separators=(',', ':'))
+
+
+class ColumnarEncoder:
+    """
+    Колоночный JSON по чанкам строк (date, mood, fatigue, productivity):
+
+        {"chunks": [{"date_deltas": [...], "mood": [...], ...}, ...],
+         "start_day": <дней от 1970-01-01>, "count": <строк>}
+
+    Дата первой строки — start_day, далее каждая дата задаётся разницей
+    с предыдущей. Общий для синхронной и асинхронной потоковой отдачи.
+    """
+
+    def __init__(self):
+        self.start_day = None
+        self.previous = None
+        self.count = 0
+
+    def start(self):
+        return '{"chunks":['
+
+    def chunk(self, rows):
+        deltas, moods, fatigues, productivities = [], [], [], []
+        for day, mood, fatigue, productivity in rows:
+            ordinal = day.toordinal() - EPOCH_ORDINAL
+            if self.previous is None:
+                self.start_day = self.previous = ordinal
+            deltas.append(ordinal - self.previous)
+            self.previous = ordinal
+            moods.append(mood)
+            fatigues.append(fatigue)
+            productivities.append(productivity)
+
+        text = ('' if self.count == 0 else ',') + _dumps({
+            'date_deltas': deltas,
+            'mood': moods,
+            'fatigue': fatigues,
+            'productivity': productivities,
+        })
+        self.count += len(rows)
+        return text
+
+    def end(self):
+        return f'],"start_day":{_dumps(self.start_day)},"count":{self.count}}}'
+
+
+def columnar_json(rows, chunk_size=CHUNK_SIZE):
+    # потоковая сериализация: в памяти одновременно не больше одного чанка
+    rows = iter(rows)
+    encoder = ColumnarEncoder()
+
+    yield encoder.start()
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        yield encoder.chunk(chunk)
+    yield encoder.end()
+
+
+async def acolumnar_json(chunks):
+    # то же по асинхронному итератору чанков (ASGI)
+    encoder = ColumnarEncoder()
+
+    yield encoder.start()
+    async for chunk in chunks:
+        yield encoder.chunk(chunk)
+    yield encoder.end()
+
+
+async def _achunks(rows_qs, chunk_size):
+    # QuerySet.aiterator() в Django 4.2 выполняет values_list прямо в цикле
+    # событий и падает — тот же синхронный итератор, по чанку за вызов в потоке ORM
+    rows = rows_qs.iterator(chunk_size=chunk_size)
+    next_chunk = sync_to_async(lambda: list(islice(rows, chunk_size)))
+    while chunk := await next_chunk():
+        yield chunk
+
+
+def _columns(days_qs):
+    return days_qs.order_by('date').values_list(*COLUMNAR_FIELDS)
+
+
+def stream_queryset(days_qs, chunk_size=CHUNK_SIZE):
+    rows = _columns(days_qs).iterator(chunk_size=chunk_size)
+    return columnar_json(rows, chunk_size=chunk_size)
+
+
+def astream_queryset(days_qs, chunk_size=CHUNK_SIZE):
+    return acolumnar_json(_achunks(_columns(days_qs), chunk_size))
@@ -0,0 +1,36 @@
+import random
+from datetime import date, timedelta
+
+DEFAULT_START = date(2000, 1, 1)
+
+
+def _clip(value):
+    return min(5, max(1, round(value)))
+
+
+def generate_days(count, seed=0, start=DEFAULT_START, per_day=1):
+    """
+    Генератор синтетических учебных дней (date, mood, fatigue, productivity).
+
+    Настроение меняется плавно (случайное блуждание), усталость копится
+    в течение недели и сбрасывается на выходных, а продуктивность растёт
+    с настроением и падает с усталостью — как в реальных данных.
+    """
+    rnd = random.Random(seed)
+    mood = 3.0
+    fatigue = 2.0
+
+    for i in range(count):
+        day = start + timedelta(days=i // per_day)
+
+        mood += rnd.gauss(0, 0.6) + (3.2 - mood) * 0.15
+        if day.weekday() >= 5:
+            fatigue -= rnd.uniform(0.5, 1.5)
+        else:
+            fatigue += rnd.uniform(-0.2, 0.6)
+        fatigue = min(5.0, max(1.0, fatigue))
+
+        productivity = 1.2 + 0.55 * mood - 0.35 * fatigue + rnd.gauss(0, 0.7)
+
+        yield day, _clip(mood), _clip(fatigue), _clip(productivity)
+
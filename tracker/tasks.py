@@ -0,0 +1,31 @@
+from . import analytics, forecast, jobs
+from .models import StudyDay
+from .recommendations import generate_recommendations, refresh_key, store_recommendations
+from .routers import use_primary
+
+
+# =========================
+# ПЕРЕСЧЁТЫ ПОСЛЕ ЗАПИСИ
+# =========================
+# задачи идемпотентны: пересчитывают всё по текущим данным владельца,
+# поэтому повтор после ошибки и объединение постановок безопасны
+@jobs.task('refresh_recommendations')
+def refresh_recommendations(user_id=None):
+    # рекомендации по всем данным — то, что главная показывает без фильтра;
+    # чтение с основной базы, чтобы не посчитать по отстающей копии
+    with use_primary():
+        stats = analytics.analyze_queryset(StudyDay.objects.filter(user_id=user_id))
+        last_day = stats.days[-1].id if stats.days else None
+        store_recommendations(generate_recommendations(stats), study_day_id=last_day, user_id=user_id)
+
+
+@jobs.task('refit_forecast')
+def refit_forecast(user_id=None):
+    with use_primary():
+        forecast.load(user_id)
+
+
+def schedule_recompute(user_id=None):
+    # одна ожидающая задача каждого вида на владельца, сколько бы дней ни сохранили
+    jobs.enqueue('refresh_recommendations', {'user_id': user_id}, key=refresh_key(user_id))
+    jobs.enqueue('refit_forecast', {'user_id': user_id}, key=f'forecast:{user_id}')
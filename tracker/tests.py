@@ -1,3 +1,939 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import re
+import statistics
+from datetime import date
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import (
+    analytics, cube, exporter, forecast, importer, jobs, live, metrics, recommendations, routers,
+    stats, streaming, views,
+)
+from .benchmarks import regressions
+from .cache import response_cache
+from .db import pragma_statements
+from .middleware import STICKY_COOKIE
+from .models import DataVersion, ForecastState, Job, LiveEvent, Recommendation, StudyDay, StudyMetric
+from .routers import AnalyticsRouter, use_primary
+
+
+class StudyDaysListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for day, mood, fatigue, productivity in [
+            (1, 4, 2, 5),
+            (2, 4, 3, 4),
+            (3, 2, 5, 1),
+            (4, 3, 3, 3),
+        ]:
+            StudyDay.objects.create(
+                date=date(2024, 3, day),
+                mood=mood,
+                fatigue=fatigue,
+                productivity=productivity,
+            )
+
+    def setUp(self):
+        response_cache.clear()
+
+    def test_dashboard_queries_skip_full_scan(self):
+        # Строки дней целиком не читаются: итоги и средние — из месячных
+        # метрик, влияние факторов — из куба оценок, таблица — первая
+        # страница по курсору (LIMIT). Рекомендации читаются сохранённые:
+        # их видят и экспорт, и админка, а сохраняет воркер. Перед всем —
+        # чтение версий из DataVersion: версия живёт в базе, чтобы записи
+        # других процессов сбрасывали кэш этого.
+        jobs.run_pending()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('study_days_list'))
+        self.assertEqual(response.status_code, 200)
+        tables = [re.search(r'FROM "(\w+)"', query['sql'])[1] for query in queries.captured_queries]
+        self.assertEqual(tables, [
+            'tracker_dataversion', 'tracker_studymetric', 'tracker_scorecount',
+            'tracker_recommendation', 'tracker_studyday',
+        ])
+        self.assertIn('LIMIT 51', queries.captured_queries[-1]['sql'])
+        self.assertEqual(response.context['days_total'], 4)
+        self.assertEqual(len(response.context['days']), 4)
+
+    def test_dashboard_queries_with_date_filter(self):
+        params = {'date_from': '2024-03-02', 'date_to': '2024-03-04'}
+        self.client.get(reverse('study_days_list'), params)
+        response_cache.clear()
+
+        # версии, метрики по дням, куб по неполному месяцу (из StudyDay по индексу,
+        # с GROUP BY), дни диапазона для рекомендаций, первая страница
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('study_days_list'), params)
+        self.assertEqual(len(response.context['days']), 3)
+        self.assertEqual(response.context['days_total'], 3)
+
+    def test_statistics(self):
+        response = self.client.get(reverse('study_days_list'))
+
+        self.assertEqual(response.context['averages'], {
+            'avg_productivity': 3.25,
+            'avg_mood': 3.25,
+            'avg_fatigue': 3.25,
+        })
+        self.assertEqual(response.context['mood_stats'], [
+            {'mood': 2, 'avg_productivity': 1.0, 'days': 1},
+            {'mood': 3, 'avg_productivity': 3.0, 'days': 1},
+            {'mood': 4, 'avg_productivity': 4.5, 'days': 2},
+        ])
+        self.assertEqual(response.context['fatigue_stats'], [
+            {'fatigue': 2, 'avg_productivity': 5.0, 'days': 1},
+            {'fatigue': 3, 'avg_productivity': 3.5, 'days': 2},
+            {'fatigue': 5, 'avg_productivity': 1.0, 'days': 1},
+        ])
+
+    def test_cached_render_skips_database(self):
+        self.client.get(reverse('study_days_list'))
+        # остаётся только чтение версий
+        with self.assertNumQueries(1):
+            self.client.get(reverse('study_days_list'))
+
+        StudyDay.objects.create(date=date(2024, 3, 5), mood=5, fatigue=1, productivity=5)
+        response = self.client.get(reverse('study_days_list'))
+        self.assertEqual(len(response.context['days']), 5)
+
+
+    def test_new_day_invalidates_only_its_month_fragment(self):
+        march = self.client.get(reverse('study_days_list')).context['day_chunks']
+
+        StudyDay.objects.create(date=date(2024, 4, 1), mood=5, fatigue=1, productivity=5)
+        response = self.client.get(reverse('study_days_list'))
+        chunks = response.context['day_chunks']
+        self.assertEqual(chunks[0]['key'], march[0]['key'])
+        self.assertEqual(len(chunks), 2)
+        self.assertContains(response, 'data-date="2024-04-01"')
+
+        # правка строки в закэшированном месяце меняет его ключ — старый фрагмент не показывается
+        day = StudyDay.objects.get(date=date(2024, 3, 1))
+        day.comment = 'после правки'
+        day.save()
+        response = self.client.get(reverse('study_days_list'))
+        self.assertNotEqual(response.context['day_chunks'][0]['key'], march[0]['key'])
+        self.assertContains(response, 'после правки')
+
+    def shown_recommendations(self):
+        return [item.pk for item in self.client.get(reverse('study_days_list')).context['recommendations']]
+
+    def test_stale_recommendations_are_shown_until_worker_refresh(self):
+        # первый набор считает очередь; пока задача ждёт воркера, список пуст
+        response = self.client.get(reverse('study_days_list'))
+        self.assertEqual(response.context['recommendations'], [])
+        self.assertContains(response, 'Рекомендации пересчитываются')
+
+        jobs.run_pending()
+        stored = Recommendation.objects.filter(range_from=None, range_to=None)
+        first = list(stored.values_list('pk', flat=True))
+        self.assertTrue(first)
+        self.assertFalse(stored.filter(rule='').exists())
+        self.assertEqual(self.shown_recommendations(), first)
+
+        # запись и удаление дня не удаляют набор: запрос отдаёт прежний без прохода по дням
+        self.client.post(reverse('study_days_list'), {
+            'date': '2024-03-05', 'mood': 5, 'fatigue': 1, 'productivity': 5, 'comment': '',
+        })
+        StudyDay.objects.get(date=date(2024, 3, 4)).delete()
+        with mock.patch('tracker.analytics.analyze_queryset') as analyze:
+            self.assertEqual(self.shown_recommendations(), first)
+        analyze.assert_not_called()
+
+        # новый набор воркера виден сразу, хотя версия данных после него не менялась
+        jobs.run_pending()
+        refreshed = list(stored.values_list('pk', flat=True))
+        self.assertNotEqual(refreshed, first)
+        self.assertEqual(self.shown_recommendations(), refreshed)
+
+    def test_ranged_recommendations_are_not_stored(self):
+        # каждый диапазон в GET-запросе не должен добавлять строк в таблицу
+        for day in (2, 3):
+            response = self.client.get(
+                reverse('study_days_list'), {'date_from': f'2024-03-0{day}', 'date_to': '2024-03-04'}
+            )
+            self.assertTrue(response.context['recommendations'])
+        self.assertFalse(Recommendation.objects.exists())
+
+        rules = [item.rule for item in response.context['recommendations']]
+        days = StudyDay.objects.filter(date__range=[date(2024, 3, 3), date(2024, 3, 4)])
+        expected = recommendations.generate_recommendations(analytics.analyze_queryset(days))
+        self.assertEqual(rules, [item['rule'] for item in expected])
+
+    def test_post_pins_reads_to_primary(self):
+        response = self.client.post(reverse('study_days_list'), {
+            'date': '2024-03-05', 'mood': 3, 'fatigue': 3, 'productivity': 3, 'comment': '',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+
+class StudyMetricRollupTests(TestCase):
+    def test_string_date_updates_rollups(self):
+        StudyDay.objects.create(date='2024-01-05', mood=4, fatigue=2, productivity=5)
+
+        month = StudyMetric.objects.get(period=StudyMetric.PERIOD_MONTH)
+        self.assertEqual((month.date, month.days_count, month.productivity_sum), (date(2024, 1, 1), 1, 5))
+        week = StudyMetric.objects.get(period=StudyMetric.PERIOD_WEEK)
+        self.assertEqual(week.date, date(2024, 1, 1))
+
+    def test_failed_receiver_rolls_back_posted_day(self):
+        # метрики уже записаны, куб падает — день и метрики откатываются вместе
+        with mock.patch.object(cube, 'apply', side_effect=RuntimeError('сбой')):
+            with self.assertRaises(RuntimeError):
+                self.client.post(reverse('study_days_list'), {
+                    'date': '2024-03-05', 'mood': 3, 'fatigue': 3, 'productivity': 3, 'comment': '',
+                })
+        self.assertFalse(StudyDay.objects.exists())
+        self.assertFalse(StudyMetric.objects.exists())
+
+
+class StudyDayIndexTests(TestCase):
+    def test_range_query_is_served_from_covering_index(self):
+        # выборка графика по владельцу и диапазону дат не читает саму таблицу
+        StudyDay.objects.create(date=date(2024, 3, 1), mood=4, fatigue=2, productivity=5)
+        queryset = views.chart_rows(views.filtered_days(date(2024, 3, 1), date(2024, 3, 31)))
+
+        plan = queryset.explain()
+        self.assertIn('COVERING INDEX studyday_user_scores_idx', plan)
+        self.assertIn('user_id=? AND date>? AND date<?', plan)
+        self.assertEqual(list(queryset), [(date(2024, 3, 1), 4, 2, 5)])
+
+
+class AnalyticsDataTests(TestCase):
+    def setUp(self):
+        response_cache.clear()
+        StudyDay.objects.create(date=date(2024, 3, 1), mood=4, fatigue=2, productivity=5)
+
+    def test_not_modified_until_data_changes(self):
+        url = reverse('analytics_data')
+        response = self.client.get(url)
+        etag = response['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        StudyDay.objects.create(date=date(2024, 3, 2), mood=3, fatigue=3, productivity=3)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['productivity'], [5, 3])
+
+    def test_write_from_another_process_changes_etag(self):
+        # у другого процесса (импорт, воркер) свой locmem: версия должна дойти через базу
+        url = reverse('analytics_data')
+        etag = self.client.get(url)['ETag']
+
+        with mock.patch('tracker.cache.get_backend', return_value=LocMemCache('other', {})):
+            StudyDay.objects.create(date=date(2024, 3, 2), mood=3, fatigue=3, productivity=3)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['productivity'], [5, 3])
+
+    @override_settings(TRACKER_METRICS_TOKEN='secret')
+    def test_metrics_endpoint_counts_requests(self):
+        self.client.get(reverse('analytics_data'))
+
+        body = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret').content.decode()
+        self.assertIn(
+            'tracker_request_duration_seconds_count{view="analytics_data",method="GET",status="200"}',
+            body,
+        )
+        self.assertIn('tracker_request_db_queries_bucket{view="analytics_data",le="+Inf"}', body)
+
+    @override_settings(TRACKER_METRICS_TOKEN='secret', TRACKER_METRICS_ALLOWED_IPS=[])
+    def test_metrics_endpoint_is_restricted(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+
+        with override_settings(TRACKER_METRICS_ALLOWED_IPS=['127.0.0.1']):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        staff = get_user_model().objects.create_user('staff', password='secret', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    @override_settings(TRACKER_SLOW_REQUEST_MS=0.001, TRACKER_SLOW_REQUEST_TOP_QUERIES=2)
+    def test_slow_request_log_lists_costliest_queries(self):
+        with self.assertLogs('tracker.performance', 'WARNING') as logs:
+            self.client.get(reverse('study_days_list'))
+        lines = logs.records[0].getMessage().split('\n')
+        self.assertIn('Медленный запрос GET /', lines[0])
+        self.assertEqual(len(lines), 3)
+        self.assertRegex(lines[1], r'^  [\d.]+ мс, \d+×: [A-Z]+ ')
+
+    @override_settings(TRACKER_METRICS_TOKEN='secret')
+    def test_async_view_queries_are_counted(self):
+        # ORM асинхронного представления работает на соединении потока sync_to_async,
+        # а не того, где выполняется цикл событий с middleware
+        metrics.clear()
+        async_to_sync(self.async_client.get)(reverse('aanalytics_data'))
+
+        body = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret').content.decode()
+        queries = re.search(r'^tracker_request_db_queries_sum\{view="aanalytics_data"\} (\S+)$', body, re.M)
+        self.assertGreater(float(queries[1]), 0)
+
+    def test_async_summary(self):
+        StudyDay.objects.create(date=date(2024, 3, 2), mood=2, fatigue=4, productivity=3)
+
+        data = self.client.get(reverse('analytics_summary')).json()
+        self.assertEqual(data['days'], 2)
+        self.assertEqual(data['avg_productivity'], 4)
+        self.assertEqual(
+            data['mood_stats'],
+            [
+                {'mood': 2, 'avg_productivity': 3, 'days': 1},
+                {'mood': 4, 'avg_productivity': 5, 'days': 1},
+            ],
+        )
+        self.assertEqual([day['date'] for day in data['recent']], ['2024-03-02', '2024-03-01'])
+
+
+    def aget(self, name, params=None, **extra):
+        # асинхронные представления — через AsyncClient, как под ASGI
+        async def request():
+            response = await self.async_client.get(reverse(name), params or {}, **extra)
+            if response.streaming:
+                return response, b''.join([chunk async for chunk in response.streaming_content])
+            return response, response.content
+        return async_to_sync(request)()
+
+    def test_async_views_match_sync(self):
+        for day in range(2, 6):
+            StudyDay.objects.create(date=date(2024, 3, day), mood=day, fatigue=6 - day, productivity=day)
+
+        for params in [{}, {'date_from': '2024-03-02', 'date_to': '2024-03-04'}, {'format': 'columnar'}]:
+            response_cache.clear()
+            sync = self.client.get(reverse('analytics_data'), params)
+            response_cache.clear()
+            response, body = self.aget('aanalytics_data', params)
+            self.assertEqual(body, b''.join(sync), params)
+            self.assertEqual(response['ETag'], sync['ETag'])
+            self.assertIn('no-cache', response['Cache-Control'])
+
+        etag = self.aget('aanalytics_data')[0]['ETag']
+        response, _ = self.aget('aanalytics_data', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        response_cache.clear()
+        sync = self.client.get(reverse('study_days_list')).context
+        response_cache.clear()
+        context = self.aget('astudy_days_list')[0].context
+        for name in ['days', 'days_total', 'next_cursor', 'averages', 'mood_stats', 'fatigue_stats']:
+            self.assertEqual(context[name], sync[name], name)
+        self.assertEqual(
+            [item.text for item in context['recommendations']],
+            [item.text for item in sync['recommendations']],
+        )
+
+    def test_columnar_stream_decodes_to_plain_series(self):
+        for day in (3, 4, 8):
+            StudyDay.objects.create(date=date(2024, 3, day), mood=day % 5 + 1, fatigue=2, productivity=3)
+
+        response = self.client.get(reverse('analytics_data'), {'format': 'columnar'})
+        self.assertTrue(response.streaming)
+        data = json.loads(b''.join(response.streaming_content))
+        plain = self.client.get(reverse('analytics_data')).json()
+
+        self.assertEqual(data['count'], 4)
+        ordinal = date(1970, 1, 1).toordinal() + data['start_day']
+        dates, columns = [], {'mood': [], 'fatigue': [], 'productivity': []}
+        for chunk in data['chunks']:
+            for delta in chunk['date_deltas']:
+                ordinal += delta
+                dates.append(date.fromordinal(ordinal).isoformat())
+            for name, values in columns.items():
+                values += chunk[name]
+        self.assertEqual({'dates': dates, **columns}, plain)
+
+        # разбиение на чанки не меняет дельты: первая дельта чанка — от конца предыдущего
+        chunks = json.loads(''.join(streaming.stream_queryset(StudyDay.objects.all(), chunk_size=3)))['chunks']
+        self.assertEqual([chunk['date_deltas'] for chunk in chunks], [[0, 2, 1], [4]])
+
+    def test_max_points_downsamples_series(self):
+        # 60 дней подряд с 1 марта (первый — из setUp) и выбросом продуктивности 13 марта;
+        # по одному create, чтобы сигналы обновили свёртки для календарных корзин
+        for i in range(1, 60):
+            StudyDay.objects.create(
+                date=date.fromordinal(date(2024, 3, 1).toordinal() + i), mood=3, fatigue=3,
+                productivity=5 if i == 12 else 3,
+            )
+        url = reverse('analytics_data')
+
+        data = self.client.get(url, {'max_points': 10}).json()
+        self.assertEqual(data['downsampling'], {'method': 'lttb', 'source_points': 60, 'points': 10})
+        self.assertEqual(len(data['dates']), 10)
+        self.assertEqual((data['dates'][0], data['dates'][-1]), ('2024-03-01', '2024-04-29'))
+        self.assertEqual(data['productivity'][data['dates'].index('2024-03-13')], 5)
+        # корзины идут подряд и вместе покрывают весь ряд
+        self.assertEqual(data['buckets'][0], ['2024-03-01', '2024-03-01'])
+        self.assertEqual(data['buckets'][-1], ['2024-04-29', '2024-04-29'])
+        for (_, last), (first, _) in zip(data['buckets'], data['buckets'][1:]):
+            self.assertEqual(date.fromisoformat(first).toordinal(), date.fromisoformat(last).toordinal() + 1)
+
+        data = self.client.get(url, {'max_points': 10, 'downsample': 'calendar'}).json()
+        self.assertEqual(data['downsampling']['period'], 'week')
+        self.assertEqual(sum(data['counts']), 60)
+        self.assertEqual(data['buckets'][0], ['2024-02-26', '2024-03-03'])
+        week = data['dates'].index('2024-03-11')
+        self.assertEqual((data['counts'][week], data['productivity'][week]), (7, round(23 / 7, 2)))
+
+        # короткий ряд отдаётся как есть
+        self.assertNotIn('downsampling', self.client.get(url, {'max_points': 100}).json())
+
+    def test_chart_is_versioned_and_cached_forever(self):
+        url = reverse('analytics_chart', args=['chart'])
+        redirect = self.client.get(url)
+        self.assertEqual(redirect.status_code, 302)
+
+        response = self.client.get(redirect['Location'])
+        self.assertEqual(response['Content-Type'], 'image/svg+xml')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn(b'<polyline', response.content)
+
+        StudyDay.objects.create(date=date(2024, 3, 2), mood=3, fatigue=3, productivity=3)
+        self.assertNotEqual(self.client.get(url)['Location'], redirect['Location'])
+
+class StudyDaysPageTests(TestCase):
+    def test_cursor_pages_cover_all_days_in_order(self):
+        # по три записи на дату: курсор должен различать строки одной даты
+        StudyDay.objects.bulk_create([
+            StudyDay(date=date(2024, 3, 1 + i % 4), mood=3, fatigue=3, productivity=3)
+            for i in range(12)
+        ])
+        expected = list(StudyDay.objects.order_by('date', 'id').values_list('date', flat=True))
+
+        seen, cursor = [], None
+        while True:
+            params = {'limit': 5, **({'cursor': cursor} if cursor else {})}
+            page = self.client.get(reverse('study_days_page'), params).json()
+            seen += [date.fromisoformat(row['date']) for row in page['rows']]
+            cursor = page['next']
+            if not cursor:
+                break
+
+        self.assertEqual(seen, expected)
+
+    def test_bad_cursor(self):
+        response = self.client.get(reverse('study_days_page'), {'cursor': '!!'})
+        self.assertEqual(response.status_code, 400)
+
+
+class UserScopingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.alice = User.objects.create_user('alice', password='secret')
+        cls.bob = User.objects.create_user('bob', password='secret')
+        StudyDay.objects.create(user=cls.alice, date=date(2024, 3, 1), mood=4, fatigue=2, productivity=5)
+        StudyDay.objects.create(user=cls.bob, date=date(2024, 3, 1), mood=2, fatigue=4, productivity=1)
+
+    def setUp(self):
+        response_cache.clear()
+
+    def test_views_show_only_own_days(self):
+        self.client.force_login(self.alice)
+        response = self.client.get(reverse('analytics_data'))
+        self.assertEqual(response.json()['productivity'], [5])
+
+        response = self.client.get(reverse('study_days_list'))
+        self.assertEqual(response.context['averages']['avg_productivity'], 5)
+
+    def test_other_user_write_keeps_etag(self):
+        self.client.force_login(self.alice)
+        url = reverse('analytics_data')
+        etag = self.client.get(url)['ETag']
+
+        StudyDay.objects.create(user=self.bob, date=date(2024, 3, 2), mood=3, fatigue=3, productivity=3)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_deleting_user_removes_their_data(self):
+        # дни удаляются каскадом: обработчики сигналов не должны заводить
+        # метрики, версии, события и задачи на удаляемого пользователя
+        StudyDay.objects.create(user=self.bob, date=date(2024, 4, 2), mood=3, fatigue=3, productivity=3)
+        self.bob.delete()
+        # SQLite проверяет внешние ключи при COMMIT, которого в TestCase нет
+        connection.check_constraints()
+
+        self.assertFalse(StudyDay.objects.filter(user_id=self.bob.pk).exists())
+        self.assertFalse(StudyMetric.objects.filter(user_id=self.bob.pk).exists())
+        self.assertFalse(LiveEvent.objects.filter(user_id=self.bob.pk).exists())
+        self.assertEqual(StudyDay.objects.filter(user=self.alice).count(), 1)
+
+
+class ScoreCubeTests(TestCase):
+    def test_cube_matches_days_for_any_range(self):
+        for day, mood, fatigue, productivity in [
+            (date(2024, 1, 30), 4, 2, 5),
+            (date(2024, 2, 1), 4, 2, 5),
+            (date(2024, 2, 15), 2, 4, 1),
+            (date(2024, 3, 2), 3, 3, 3),
+            (date(2024, 4, 1), 5, 1, 5),
+        ]:
+            StudyDay.objects.create(date=day, mood=mood, fatigue=fatigue, productivity=productivity)
+        edited = StudyDay.objects.get(date=date(2024, 2, 15))
+        edited.productivity = 2
+        edited.save()
+        StudyDay.objects.get(date=date(2024, 4, 1)).delete()
+
+        for date_from, date_to in [
+            (None, None),
+            (date(2024, 1, 1), date(2024, 12, 31)),
+            (date(2024, 1, 31), date(2024, 3, 1)),
+            (date(2024, 2, 10), date(2024, 3, 5)),
+            (date(2024, 2, 1), date(2024, 2, 29)),
+        ]:
+            expected = cube.empty()
+            days = StudyDay.objects.all()
+            if date_from:
+                days = days.filter(date__range=(date_from, date_to))
+            for day in days:
+                expected[day.mood - 1][day.fatigue - 1][day.productivity - 1] += 1
+            self.assertEqual(cube.range_cube(date_from, date_to), expected, (date_from, date_to))
+
+        data = self.client.get(reverse('analytics_cube'), {'x': 'fatigue', 'y': 'productivity'}).json()
+        self.assertEqual(data['days'], 4)
+        self.assertEqual(data['heatmap']['counts'][4][1], 2)
+        self.assertEqual(data['mood_stats'][-1], {'mood': 4, 'avg_productivity': 5, 'days': 2})
+
+
+class ForecastTests(TestCase):
+    def test_state_grows_incrementally_and_resets_on_edit(self):
+        response_cache.clear()
+        for day in range(1, 31):
+            StudyDay.objects.create(
+                date=date(2024, 4, day), mood=3 + day % 2, fatigue=2, productivity=3 + day % 3
+            )
+
+        data = self.client.get(reverse('analytics_forecast'), {'horizon': 3}).json()
+        self.assertEqual(data['method'], 'holt+ridge')
+        self.assertEqual(data['observations'], 30)
+        self.assertEqual([point['date'] for point in data['forecast']],
+                         ['2024-05-01', '2024-05-02', '2024-05-03'])
+        self.assertTrue(all(1 <= point['productivity'] <= 5 for point in data['forecast']))
+
+        # новый день дообучает сохранённую модель, история не перечитывается
+        saved = ForecastState.objects.get(user=None)
+        StudyDay.objects.create(date=date(2024, 5, 1), mood=4, fatigue=2, productivity=4)
+        model, last_date = forecast.load()
+        self.assertEqual((model.observations, last_date), (31, date(2024, 5, 1)))
+        self.assertEqual(ForecastState.objects.get(user=None).pk, saved.pk)
+        self.assertEqual(
+            model.state(), forecast.Forecaster().fit(
+                (m / c, f / c, p / c) for _, c, m, f, p in forecast.daily_means()
+            ).state()
+        )
+
+        StudyDay.objects.filter(date=date(2024, 4, 10)).first().delete()
+        self.assertFalse(ForecastState.objects.exists())
+        self.assertEqual(forecast.load()[0].observations, 30)
+
+
+class JobQueueTests(TestCase):
+    def test_writes_coalesce_into_one_recompute(self):
+        for day in range(1, 4):
+            StudyDay.objects.create(date=date(2024, 5, day), mood=4, fatigue=2, productivity=5)
+        self.assertEqual(Job.objects.count(), 2)
+
+        # пока пересчёт выполняется, новая запись ставит следующий, но он ждёт первый
+        running = jobs.claim()
+        StudyDay.objects.create(date=date(2024, 5, 4), mood=4, fatigue=2, productivity=5)
+        other = jobs.claim()
+        self.assertNotEqual(other.key, running.key)
+        self.assertIsNone(jobs.claim())
+        jobs.execute(running)
+        jobs.execute(other)
+
+        self.assertEqual(jobs.run_pending(), 1)
+        self.assertFalse(Job.objects.exists())
+        self.assertTrue(Recommendation.objects.filter(range_from=None, user=None).exists())
+        self.assertEqual(ForecastState.objects.get(user=None).observations, 4)
+
+    def test_failed_job_is_retried(self):
+        calls = []
+
+        @jobs.task('test_flaky', max_attempts=2)
+        def flaky(value):
+            calls.append(value)
+            if len(calls) == 1:
+                raise RuntimeError('сбой')
+
+        try:
+            jobs.enqueue('test_flaky', {'value': 1}, key='flaky')
+            jobs.enqueue('test_flaky', {'value': 2}, key='flaky')
+            with self.assertLogs('tracker.jobs', 'WARNING'):
+                self.assertEqual(jobs.run_pending(), 1)
+            job = Job.objects.get()
+            self.assertEqual((job.status, job.attempts), (Job.STATUS_PENDING, 1))
+            self.assertIn('сбой', job.last_error)
+
+            Job.objects.update(run_after=job.created_at)
+            self.assertEqual(jobs.run_pending(), 1)
+            self.assertEqual(calls, [2, 2])
+            self.assertFalse(Job.objects.exists())
+        finally:
+            del jobs.TASKS['test_flaky']
+
+
+class LiveEventTests(TestCase):
+    def test_saved_day_publishes_row_and_averages(self):
+        StudyDay.objects.create(date=date(2024, 6, 1), mood=4, fatigue=2, productivity=5)
+        day = StudyDay.objects.create(date=date(2024, 6, 2), mood=2, fatigue=4, productivity=3)
+
+        event = LiveEvent.objects.filter(kind=live.KIND_DAY).latest('id')
+        self.assertEqual(event.payload['day']['id'], day.id)
+        self.assertEqual(event.payload['day']['date'], '2024-06-02')
+        self.assertEqual(event.payload['days_total'], 2)
+        self.assertEqual(event.payload['averages']['avg_productivity'], 4.0)
+
+        day_id = day.id
+        day.delete()
+        event = LiveEvent.objects.latest('id')
+        self.assertEqual((event.kind, event.payload['id']), (live.KIND_DAY_DELETED, day_id))
+        self.assertEqual(event.payload['days_total'], 1)
+
+        # повтор после версии данных страницы находит пропущенные события
+        missed = live.replay(None, live.last_event_id(), since=0)
+        self.assertEqual([kind for _, _, kind, _ in missed][-2:], [live.KIND_DAY, live.KIND_DAY_DELETED])
+
+    def test_broker_fans_out_one_encoded_message(self):
+        async def scenario():
+            broker = live.Broker()
+            first, second = broker.register(), broker.register()
+            other = broker.register(user_id=1)
+            for subscriber in (first, second, other):
+                subscriber.replaying = False
+
+            self.assertEqual(broker.dispatch(7, None, live.KIND_DAY, {'id': 1}), 2)
+            self.assertIs(first.messages[0], second.messages[0])
+            self.assertEqual(other.messages, [])
+            self.assertEqual(await first.drain(), [b'id: 7\nevent: day\ndata: {"id":1}\n\n'])
+
+            # медленный клиент не копит сообщения бесконечно
+            for event_id in range(live.SUBSCRIBER_BUFFER + 1):
+                broker.dispatch(event_id, None, live.KIND_DAY, {})
+            self.assertTrue(second.overflowed)
+            self.assertEqual(len(second.messages), live.SUBSCRIBER_BUFFER)
+
+            broker.unsubscribe(first)
+            self.assertEqual(broker.count(), 2)
+
+        asyncio.run(scenario())
+
+
+class RecommendationStatsTests(SimpleTestCase):
+    @staticmethod
+    def analyze(productivities, moods=None, fatigues=None):
+        moods = moods or [3] * len(productivities)
+        fatigues = fatigues or [6 - value for value in productivities]
+        return analytics.analyze(
+            (i + 1, date.fromordinal(date(2024, 3, 1).toordinal() + i), mood, fatigue, productivity, '')
+            for i, (mood, fatigue, productivity) in enumerate(zip(moods, fatigues, productivities))
+        )
+
+    def test_series_stats_match_direct_computation(self):
+        values = [5, 5, 4, 5, 5, 4, 5, 3, 2, 2, 1, 2, 1, 1]
+        series = self.analyze(values).series
+
+        windows = [values[i:i + 7] for i in range(len(values) - 6)]
+        for got, expected in zip(series.rolling_productivity, map(statistics.fmean, windows)):
+            self.assertAlmostEqual(got, expected)
+        for got, expected in zip(series.rolling_productivity_std, map(statistics.pstdev, windows)):
+            self.assertAlmostEqual(got, expected)
+        self.assertEqual(len(series.rolling_productivity), len(windows))
+
+        slope, _ = statistics.linear_regression(range(len(values)), values)
+        self.assertAlmostEqual(series.slope, slope)
+        self.assertAlmostEqual(stats.trend_slope([1, 2, 3, 4]), 1.0)
+        self.assertAlmostEqual(series.pearson_fatigue, -1.0)
+        self.assertIsNone(series.spearman_mood)
+
+        # одинаковые оценки получают средний ранг
+        xs, ys = [1, 2, 2, 3, 5], [2, 1, 4, 3, 5]
+        self.assertAlmostEqual(
+            stats.spearman(xs, ys),
+            statistics.correlation([1, 2.5, 2.5, 4, 5], [2, 1, 4, 3, 5]),
+        )
+
+    def test_rules_follow_series_statistics(self):
+        falling = self.analyze([5, 5, 4, 5, 5, 4, 5, 3, 2, 2, 1, 2, 1, 1])
+        self.assertEqual(
+            [item['rule'] for item in recommendations.generate_recommendations(falling)],
+            ['medium_productivity', 'trend_down', 'recent_drop', 'fatigue_correlation'],
+        )
+
+        steady = self.analyze([4] * 14, moods=[4] * 14)
+        self.assertEqual(
+            [item['rule'] for item in recommendations.generate_recommendations(steady)],
+            ['high_productivity', 'mood_supports_productivity'],
+        )
+
+        # за последнее окно продуктивность скачет между 1 и 5
+        swinging = self.analyze([3] * 7 + [1, 5] * 3 + [3])
+        rules = [item['rule'] for item in recommendations.generate_recommendations(swinging)]
+        self.assertIn('unstable_productivity', rules)
+        self.assertNotIn('trend_down', rules)
+
+
+class ImporterTests(TestCase):
+    def run_import(self, text, fmt=importer.FORMAT_CSV, **options):
+        return importer.import_stream(io.StringIO(text), fmt, **options)
+
+    def test_upsert_counts_only_existing_days_as_updated(self):
+        StudyDay.objects.create(date=date(2024, 5, 1), mood=1, fatigue=1, productivity=1)
+
+        report = self.run_import(
+            'date,mood,fatigue,productivity,comment\n'
+            '2024-05-01,4,2,5,обновлён\n'
+            '2024-05-02,3,3,3,черновик\n'
+            '2024-05-02,2,4,1,итог\n',
+            upsert=True,
+        )
+        self.assertEqual((report.created, report.updated, report.duplicates), (1, 1, 1))
+        self.assertEqual(StudyDay.objects.count(), 2)
+        self.assertEqual(StudyDay.objects.get(date=date(2024, 5, 1)).productivity, 5)
+        self.assertEqual(StudyDay.objects.get(date=date(2024, 5, 2)).comment, 'итог')
+
+        # метрики пачки — по итоговым строкам, со старыми значениями вычтенными
+        month = StudyMetric.objects.get(period=StudyMetric.PERIOD_MONTH, date=date(2024, 5, 1))
+        self.assertEqual((month.days_count, month.productivity_sum), (2, 6))
+
+    def test_non_integer_scores_are_rejected(self):
+        report = self.run_import(
+            '{"date": "2024-05-01", "mood": 4.7, "fatigue": 2, "productivity": 3}\n'
+            '{"date": "2024-05-02", "mood": "4.7", "fatigue": 2, "productivity": 3}\n'
+            '{"date": "2024-05-03", "mood": true, "fatigue": 2, "productivity": 3}\n'
+            '{"date": "2024-05-04", "mood": 6, "fatigue": 2, "productivity": 3}\n'
+            '{"date": "05/05/2024", "mood": 4, "fatigue": 2, "productivity": 3}\n'
+            'не json\n'
+            '{"date": "2024-05-07", "mood": "4", "fatigue": 2, "productivity": 3}\n',
+            importer.FORMAT_JSONL,
+        )
+        self.assertEqual((report.total, report.created, report.invalid), (7, 1, 6))
+        self.assertEqual([error['line'] for error in report.errors], [1, 2, 3, 4, 5, 6])
+        self.assertIn('mood: ожидается целое число от 1 до 5, получено 4.7', report.errors[0]['error'])
+        self.assertEqual(StudyDay.objects.get().mood, 4)
+
+    def test_rows_are_written_in_batches(self):
+        rows = ''.join(f'2024-05-0{day},3,3,{day}\n' for day in range(1, 6))
+        with CaptureQueriesContext(connection) as queries:
+            report = self.run_import('date,mood,fatigue,productivity\n' + rows, batch_size=2)
+
+        self.assertEqual((report.created, report.batches), (5, 3))
+        inserts = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('INSERT INTO "tracker_studyday"')
+        ]
+        self.assertEqual(len(inserts), 3)
+        self.assertEqual(
+            StudyMetric.objects.get(period=StudyMetric.PERIOD_MONTH, date=date(2024, 5, 1)).days_count, 5
+        )
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        for day, comment in [(1, 'тихо'), (2, 'запятая, "кавычки"'), (3, ''), (5, 'вне диапазона')]:
+            StudyDay.objects.create(date=date(2024, 3, day), mood=day, fatigue=6 - day, productivity=3,
+                                    comment=comment)
+
+    def export(self, **params):
+        response = self.client.get(reverse('export_study_days'), params)
+        return response, b''.join(response.streaming_content) if response.streaming else response.content
+
+    def test_csv_and_jsonl_rows_match_days(self):
+        response, body = self.export(date_from='2024-03-01', date_to='2024-03-03')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="days.csv"')
+        rows = list(csv.reader(io.StringIO(body.decode())))
+        self.assertEqual(rows[0], list(exporter.DAY_FIELDS))
+        self.assertEqual(rows[1:], [
+            ['2024-03-01', '1', '5', '3', 'тихо'],
+            ['2024-03-02', '2', '4', '3', 'запятая, "кавычки"'],
+            ['2024-03-03', '3', '3', '3', ''],
+        ])
+
+        _, body = self.export(format='jsonl')
+        lines = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(lines[1], {
+            'date': '2024-03-02', 'mood': 2, 'fatigue': 4, 'productivity': 3, 'comment': 'запятая, "кавычки"',
+        })
+
+    def test_columnar_round_trip_across_blocks(self):
+        # пачки по две строки: три блока данных и завершающий пустой
+        chunks = list(exporter.export_chunks(exporter.FORMAT_COLUMNAR, chunk_size=2))
+        self.assertEqual(len(chunks), 1 + 2 + 1)
+
+        columns = exporter.read_columnar(io.BytesIO(b''.join(chunks)))
+        self.assertEqual(
+            [date.fromordinal(exporter.EPOCH_ORDINAL + day) for day in columns['day']],
+            [date(2024, 3, day) for day in (1, 2, 3, 5)],
+        )
+        self.assertEqual(list(columns['mood']), [1, 2, 3, 5])
+        self.assertEqual(list(columns['fatigue']), [5, 4, 3, 1])
+
+        with self.assertRaises(ValueError):
+            exporter.read_columnar(io.BytesIO(b'NOTDATA' + bytes(8)))
+
+    def test_columnar_recommendations_are_rejected(self):
+        response, _ = self.export(format='columnar', dataset='recommendations')
+        self.assertEqual(response.status_code, 400)
+
+
+class CommentSearchTests(TestCase):
+    def setUp(self):
+        response_cache.clear()
+        for day, productivity, comment in [
+            (1, 2, 'Готовился к экзамену, <b>не выспался</b>'),
+            (2, 4, 'Экзамен сдан'),
+            (3, 5, 'Спокойный день'),
+        ]:
+            StudyDay.objects.create(
+                date=date(2024, 3, day), mood=3, fatigue=3, productivity=productivity, comment=comment
+            )
+
+    def test_ranked_matches_with_highlight_and_facets(self):
+        data = self.client.get(reverse('search_study_days'), {'q': 'экзамен'}).json()
+
+        self.assertEqual({row['date'] for row in data['results']}, {'2024-03-01', '2024-03-02'})
+        snippets = ' '.join(row['snippet'] for row in data['results'])
+        self.assertIn('<mark>Экзамен</mark>', snippets)
+        self.assertIn('&lt;b&gt;', snippets)
+        self.assertEqual(data['facets']['days'], 2)
+        self.assertEqual(data['facets']['avg_productivity'], 3)
+        self.assertEqual(data['facets']['productivity'], {'1': 0, '2': 1, '3': 0, '4': 1, '5': 0})
+        self.assertAlmostEqual(data['facets']['overall_avg_productivity'], 11 / 3)
+
+        data = self.client.get(
+            reverse('search_study_days'), {'q': 'экзамен', 'date_from': '2024-03-02', 'date_to': '2024-03-31'}
+        ).json()
+        self.assertEqual([row['date'] for row in data['results']], ['2024-03-02'])
+
+
+    def test_older_better_match_outranks_newer_ones(self):
+        # 2500 более новых дней упоминают экзамен мимоходом, в длинном комментарии;
+        # лучшее совпадение — самый старый день, и ранжироваться должны все
+        filler = 'Повторял конспекты, решал задачи и читал учебник перед экзаменом'
+        StudyDay.objects.bulk_create([
+            StudyDay(date=date.fromordinal(date(2020, 1, 1).toordinal() + i), mood=3, fatigue=3,
+                     productivity=3, comment=filler)
+            for i in range(2500)
+        ])
+        StudyDay.objects.filter(date=date(2024, 3, 2)).update(date=date(2019, 1, 1))
+
+        data = self.client.get(reverse('search_study_days'), {'q': 'экзамен', 'limit': 3}).json()
+        self.assertEqual(data['results'][0]['date'], '2019-01-01')
+        self.assertEqual(len(data['results']), 3)
+        self.assertEqual(data['facets']['days'], 2502)
+
+
+class StudyDayAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create_superuser('admin', password='admin')
+        StudyDay.objects.create(date=date(2024, 3, 1), mood=4, fatigue=2, productivity=5,
+                                comment='Решал задачи по математике')
+        StudyDay.objects.create(date=date(2024, 3, 2), mood=3, fatigue=3, productivity=3,
+                                comment='Читал историю')
+        StudyDay.objects.create(date=date(2023, 12, 30), mood=3, fatigue=4, productivity=2)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_comment_search_uses_fulltext_index(self):
+        url = reverse('admin:tracker_studyday_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'q': 'матем'})
+        self.assertEqual([day.date for day in response.context['cl'].result_list], [date(2024, 3, 1)])
+        self.assertTrue(any('tracker_studyday_fts' in query['sql'] for query in queries))
+
+        day = StudyDay.objects.get(date=date(2024, 3, 2))
+        day.comment = 'Математика и история'
+        day.save()
+        response = self.client.get(url, {'q': 'математ'})
+        self.assertEqual(response.context['cl'].result_count, 2)
+
+    def test_unfiltered_changelist_avoids_full_scans(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:tracker_studyday_changelist'))
+        self.assertEqual(response.context['cl'].result_count, 3)
+        self.assertContains(response, '?date__year=2023')
+        self.assertFalse(
+            any('COUNT(*)' in query['sql'] and '"tracker_studyday"' in query['sql'] for query in queries)
+        )
+        # годы для date_hierarchy — поиском по индексу, а не DISTINCT по всей таблице
+        self.assertFalse(any('django_date_trunc' in query['sql'] for query in queries))
+
+
+class SqlitePragmaTests(SimpleTestCase):
+    def test_read_only_connection_skips_journal_settings(self):
+        statements = pragma_statements(
+            {'journal_mode': 'wal', 'synchronous': 'normal', 'cache_size': -2000, 'mmap_size': ''},
+            read_only=True,
+        )
+        self.assertEqual(statements, ['PRAGMA cache_size = -2000', 'PRAGMA query_only = ON'])
+
+
+class AnalyticsRouterTests(SimpleTestCase):
+    @mock.patch('tracker.routers.analytics_alias', return_value='analytics')
+    def test_analytics_reads_unless_pinned(self, _):
+        router = AnalyticsRouter()
+        self.assertEqual(router.db_for_read(StudyDay), 'analytics')
+        self.assertIsNone(router.db_for_read(Recommendation))
+        self.assertEqual(router.db_for_write(StudyDay), 'default')
+        # версия — с той же копии, что и данные, которые под ней кэшируются
+        self.assertEqual(router.db_for_read(DataVersion), 'analytics')
+
+        with use_primary():
+            self.assertEqual(router.db_for_read(StudyDay), 'default')
+
+
+class PersistedResultsTests(TestCase):
+    # то, что сохраняется в базу, считается по основной базе, а не по копии
+    def pinned(self, function):
+        calls = []
+
+        def wrapper(*args, **kwargs):
+            calls.append(routers._use_primary.get())
+            return function(*args, **kwargs)
+        return calls, wrapper
+
+    def test_regenerated_recommendations_read_primary(self):
+        # набор без задачи в очереди (дни появились раньше очереди) считает сам запрос
+        StudyDay.objects.create(date=date(2024, 3, 1), mood=4, fatigue=2, productivity=5)
+        Job.objects.all().delete()
+        calls, wrapper = self.pinned(analytics.analyze_queryset)
+        with mock.patch('tracker.analytics.analyze_queryset', wrapper):
+            stored = recommendations.get_recommendations(StudyDay.objects.all())
+        self.assertEqual(calls, [True])
+        self.assertTrue(Recommendation.objects.filter(pk=stored[0].pk).exists())
+
+    def test_forecast_reads_primary_before_saving(self):
+        StudyDay.objects.create(date=date(2024, 3, 1), mood=4, fatigue=2, productivity=5)
+        calls, wrapper = self.pinned(forecast.daily_means)
+        with mock.patch('tracker.forecast.daily_means', wrapper):
+            forecast.load()
+        self.assertEqual(calls, [True])
+        self.assertEqual(ForecastState.objects.get().observations, 1)
+
+
+class BenchRegressionTests(SimpleTestCase):
+    def test_only_slowdowns_past_threshold_are_reported(self):
+        baseline = {'1000': {'list_all': {'p50': 10.0}, 'import': {'p50': 100.0}}}
+        results = {
+            '1000': {'list_all': {'p50': 12.5}, 'import': {'p50': 115.0}, 'export_csv': {'p50': 1.0}},
+        }
+        self.assertEqual(regressions(results, baseline, 0.2), [('1000', 'list_all', 10.0, 12.5)])
@@ -3,5 +3,18 @@ from . import views
 
 urlpatterns = [
     path('', views.study_days_list, name='study_days_list'),
+    path('async/', views.astudy_days_list, name='astudy_days_list'),
     path('analytics/data/', views.analytics_data, name='analytics_data'),
+    path('analytics/data/async/', views.aanalytics_data, name='aanalytics_data'),
+    path('analytics/cube/', views.analytics_cube, name='analytics_cube'),
+    path('analytics/forecast/', views.analytics_forecast, name='analytics_forecast'),
+    path('analytics/chart/<str:kind>.svg', views.analytics_chart, name='analytics_chart'),
+    path('analytics/summary/', views.analytics_summary, name='analytics_summary'),
+    path('analytics/cohort/', views.cohort_analytics, name='cohort_analytics'),
+    path('days/page/', views.study_days_page, name='study_days_page'),
+    path('days/search/', views.search_study_days, name='search_study_days'),
+    path('days/import/', views.import_study_days, name='import_study_days'),
+    path('days/export/', views.export_study_days, name='export_study_days'),
+    path('live/', views.live_events, name='live_events'),
+    path('metrics', views.metrics_view, name='metrics'),
 ]
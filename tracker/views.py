@@ -1,9 +1,75 @@
+import asyncio
+import functools
+import io
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
 from django.shortcuts import render, redirect
-from django.db.models import Avg
-from django.http import JsonResponse
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth import get_user_model
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_date
+from django.utils.http import http_date, quote_etag, urlencode
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_POST
 
-from .models import StudyDay
+from . import (
+    cache, charts, cube, downsample, exporter, forecast, fulltext, importer,
+    live, metrics, pagination, rollups, streaming,
+)
+from .analytics import DayRow
+from .models import StudyDay, StudyMetric
 from .forms import StudyDayForm
+from .recommendations import get_recommendations
+
+# границы параметра max_points для графиков
+MIN_POINTS = 10
+MAX_POINTS = 5000
+
+
+def get_date_range(request):
+    try:
+        date_from = parse_date(request.GET.get('date_from') or '')
+        date_to = parse_date(request.GET.get('date_to') or '')
+    except ValueError:
+        return None, None
+
+    if date_from and date_to:
+        return date_from, date_to
+    return None, None
+
+
+def get_owner_id(request):
+    # вошедший пользователь видит только свои данные, гость — общие (user = NULL)
+    if request.user.is_authenticated:
+        return request.user.pk
+    return None
+
+
+def request_version(request):
+    # версия данных владельца — одна на запрос: ETag, Last-Modified и ключ
+    # кэша ответа берут одно и то же значение одним запросом к БД
+    if not hasattr(request, '_data_version'):
+        request._data_version = cache.data_version(get_owner_id(request))
+    return request._data_version
+
+
+def filtered_days(date_from=None, date_to=None, user_id=None):
+    # фильтр по (user, date) идёт по составному индексу: время запроса зависит
+    # от числа дней пользователя, а не от размера всей таблицы
+    days_qs = StudyDay.objects.filter(user_id=user_id)
+
+    if date_from and date_to:
+        days_qs = days_qs.filter(date__range=[date_from, date_to])
+
+    return days_qs
+
 
 # =========================
 # СПИСОК УЧЕБНЫХ ДНЕЙ + ФОРМА + ФИЛЬТР
@@ -13,218 +79,764 @@ def study_days_list(request):
     if request.method == 'POST':
         form = StudyDayForm(request.POST)
         if form.is_valid():
-            form.save()
+            form.instance.user_id = get_owner_id(request)
+            # день и всё, что пересчитывают сигналы (метрики, куб, очередь задач), —
+            # одна транзакция: сбой посередине не оставит метрики без дня
+            with transaction.atomic():
+                form.save()
             return redirect('study_days_list')
     else:
         form = StudyDayForm()
 
     # ---------- ФИЛЬТР ----------
-    days_qs = StudyDay.objects.all()
+    date_from, date_to = get_date_range(request)
+    user_id = get_owner_id(request)
+    # версии (данных и месяцев таблицы) читаются одним запросом до данных:
+    # фрагменты под ними и поток событий с них не могут оказаться новее
+    # того, что показывает страница
+    versions = cache.owner_versions(user_id)
+    version = versions[cache.SCOPE_DATA]
+
+    # сохранённые рекомендации обновляет воркер без смены версии данных
+    context = cache.response_cache.get_or_compute(
+        'dashboard', date_from, date_to,
+        lambda: dashboard_context(date_from, date_to, user_id),
+        extra=cache.recommendations_version(versions),
+        user_id=user_id,
+        version=version,
+    )
+
+    with metrics.time_template('tracker/study_days_list.html'):
+        return render(
+            request,
+            'tracker/study_days_list.html',
+            {
+                **fragment_context(context, versions, date_from, date_to, user_id),
+                'form': form,
+                'chart_query': chart_query(version, date_from, date_to),
+            }
+        )
+
+
+def fragment_context(context, versions, date_from=None, date_to=None, user_id=None):
+    # ключи {% cache %}: разделы страницы — по владельцу, версии данных и диапазону,
+    # строки таблицы — кусками по месяцам со своими версиями (versions — owner_versions)
+    return {
+        **context,
+        'owner_id': user_id,
+        'data_version': versions[cache.SCOPE_DATA],
+        'recommendations_version': cache.recommendations_version(versions),
+        'date_range': f'{date_from}:{date_to}',
+        'day_chunks': pagination.row_chunks(context['days'], versions),
+    }
+
+
+def dashboard_context(date_from=None, date_to=None, user_id=None):
+    days_qs = filtered_days(date_from, date_to, user_id)
+
+    # ---------- ИТОГИ И СРЕДНИЕ — ИЗ МЕТРИК, ВЛИЯНИЕ ФАКТОРОВ — ИЗ КУБА ----------
+    # стоимость — O(периодов в диапазоне), а не O(дней)
+    totals = rollups.range_totals(date_from, date_to, user_id)
+    scores = cube.range_cube(date_from, date_to, user_id)
+
+    # ---------- РЕКОМЕНДАЦИИ (по всем данным — сохранённые, за диапазон — по его дням) ----------
+    with metrics.time_recommendations():
+        recommendations = get_recommendations(days_qs, date_from, date_to, user_id)
+
+    # ---------- ПЕРВАЯ СТРАНИЦА ТАБЛИЦЫ, ОСТАЛЬНОЕ ПОДГРУЖАЕТСЯ ПРИ ПРОКРУТКЕ ----------
+    page = pagination.keyset_page(days_qs)
+
+    return dashboard_result(totals, scores, page, recommendations)
+
+
+def dashboard_result(totals, scores, page, recommendations):
+    rows, next_cursor = page
+    return {
+        'days': [DayRow._make(row) for row in rows],
+        'days_total': totals[0],
+        'next_cursor': next_cursor,
+        'averages': rollups.averages(totals),
+        'mood_stats': cube.impact(scores, 'mood'),
+        'fatigue_stats': cube.impact(scores, 'fatigue'),
+        'recommendations': recommendations,
+    }
+
+
+# =========================
+# API ДЛЯ CHART.JS
+# =========================
+def analytics_etag(request):
+    return cache.make_etag(request_version(request), get_owner_id(request), sorted(request.GET.lists()))
+
+
+def analytics_last_modified(request):
+    return cache.version_datetime(request_version(request))
+
+
+@cache_control(no_cache=True)
+@condition(etag_func=analytics_etag, last_modified_func=analytics_last_modified)
+def analytics_data(request):
+    date_from, date_to = get_date_range(request)
+    user_id = get_owner_id(request)
+
+    period = request.GET.get('period')
+    if period not in (StudyMetric.PERIOD_WEEK, StudyMetric.PERIOD_MONTH):
+        period = None
+
+    # ---------- ПОТОКОВЫЙ КОЛОНОЧНЫЙ ФОРМАТ ДЛЯ БОЛЬШИХ ДИАПАЗОНОВ ----------
+    if request.GET.get('format') == 'columnar' and not period:
+        return StreamingHttpResponse(
+            streaming.stream_queryset(filtered_days(date_from, date_to, user_id)),
+            content_type='application/json',
+        )
+
+    # ---------- ПРОРЕЖИВАНИЕ НА СЕРВЕРЕ ----------
+    max_points = get_max_points(request)
+    method = request.GET.get('downsample')
+    if method not in downsample.METHODS:
+        method = downsample.METHOD_LTTB
+
+    payload = cache.response_cache.get_or_compute(
+        'analytics', date_from, date_to,
+        lambda: analytics_payload(period, date_from, date_to, max_points, method, user_id),
+        extra=f'{period}:{max_points}:{method}',
+        user_id=user_id,
+        version=request_version(request),
+    )
+    return JsonResponse(payload)
+
+
+def get_max_points(request):
+    try:
+        max_points = int(request.GET.get('max_points', ''))
+    except ValueError:
+        return None
+    return min(max(max_points, MIN_POINTS), MAX_POINTS)
+
 
-    date_from = request.GET.get('date_from')
-    date_to = request.GET.get('date_to')
+def analytics_payload(period=None, date_from=None, date_to=None, max_points=None, method=None,
+                      user_id=None):
+    if period:
+        return period_series(period, date_from, date_to, user_id)
 
+    if max_points and method == downsample.METHOD_CALENDAR:
+        first, last = downsample.data_span(date_from, date_to, user_id)
+        bucket = first and last and downsample.calendar_period(first, last, max_points)
+        if bucket:
+            return downsample.calendar_payload(
+                rollups.series(bucket, date_from, date_to, user_id),
+                bucket, date_from, date_to,
+            )
+
+    days = list(chart_rows(filtered_days(date_from, date_to, user_id)))
+    return days_payload(days, max_points)
+
+
+def chart_rows(days_qs):
+    # только поля покрывающего индекса — запрос не обращается к самой таблице
+    return days_qs.order_by('date').values_list('date', 'mood', 'fatigue', 'productivity')
+
+
+def days_payload(days, max_points=None):
+    if max_points and len(days) > max_points:
+        return downsample.lttb_payload(days, max_points)
+
+    return {
+        'dates': [day.strftime('%Y-%m-%d') for day, _, _, _ in days],
+        'mood': [mood for _, mood, _, _ in days],
+        'fatigue': [fatigue for _, _, fatigue, _ in days],
+        'productivity': [productivity for _, _, _, productivity in days],
+    }
+
+
+def period_series(period, date_from=None, date_to=None, user_id=None):
+    payload = downsample.calendar_payload(
+        rollups.series(period, date_from, date_to, user_id),
+        period, date_from, date_to,
+    )
+    del payload['downsampling']
+
+    return {'period': period, **payload}
+
+
+# =========================
+# КУБ ОЦЕНОК ДЛЯ ТЕПЛОВЫХ КАРТ
+# =========================
+@cache_control(no_cache=True)
+@condition(etag_func=analytics_etag, last_modified_func=analytics_last_modified)
+def analytics_cube(request):
+    date_from, date_to = get_date_range(request)
+    user_id = get_owner_id(request)
+
+    x = request.GET.get('x', 'mood')
+    y = request.GET.get('y', 'productivity')
+    if x not in cube.AXES or y not in cube.AXES or x == y:
+        return JsonResponse(
+            {'error': f'x и y — две разные оси из {", ".join(cube.AXES)}'}, status=400
+        )
+
+    payload = cache.response_cache.get_or_compute(
+        'cube', date_from, date_to,
+        lambda: cube_payload(x, y, date_from, date_to, user_id),
+        extra=f'{x}:{y}',
+        user_id=user_id,
+        version=request_version(request),
+    )
+    return JsonResponse(payload)
+
+
+def cube_payload(x, y, date_from=None, date_to=None, user_id=None):
+    scores = cube.range_cube(date_from, date_to, user_id)
+    return {
+        'days': cube.total(scores),
+        'axes': cube.AXES,
+        # cube[mood - 1][fatigue - 1][productivity - 1]
+        'cube': scores,
+        'heatmap': {
+            'x': x,
+            'y': y,
+            'values': list(cube.SCORES),
+            # counts[y - 1][x - 1] — число дней с такой парой оценок
+            'counts': cube.joint(scores, x, y),
+        },
+        'mood_stats': cube.impact(scores, 'mood'),
+        'fatigue_stats': cube.impact(scores, 'fatigue'),
+    }
+
+
+# =========================
+# ПРОГНОЗ ПРОДУКТИВНОСТИ
+# =========================
+FORECAST_HORIZON = 7
+
+
+@cache_control(no_cache=True)
+@condition(etag_func=analytics_etag, last_modified_func=analytics_last_modified)
+def analytics_forecast(request):
+    try:
+        horizon = int(request.GET.get('horizon') or FORECAST_HORIZON)
+    except ValueError:
+        return JsonResponse({'error': 'horizon должен быть числом'}, status=400)
+    horizon = min(max(horizon, 1), forecast.MAX_HORIZON)
+    user_id = get_owner_id(request)
+
+    payload = cache.response_cache.get_or_compute(
+        'forecast', None, None,
+        lambda: forecast_payload(horizon, user_id),
+        extra=str(horizon),
+        user_id=user_id,
+        version=request_version(request),
+    )
+    return JsonResponse(payload)
+
+
+def forecast_payload(horizon, user_id=None):
+    # модель дообучается только на днях после сохранённого состояния
+    model, last_date = forecast.load(user_id)
+    points = model.forecast(horizon)
+    return {
+        'method': 'holt+ridge' if model.weights is not None else 'holt',
+        'observations': model.observations,
+        'last_date': last_date.isoformat() if last_date else None,
+        # шаг прогноза — следующий день с записью, даты подписаны по календарю
+        'forecast': [
+            {
+                'date': (last_date + timedelta(days=step)).isoformat(),
+                'mood': round(mood, 2),
+                'fatigue': round(fatigue, 2),
+                'productivity': round(productivity, 2),
+            }
+            for step, (mood, fatigue, productivity) in enumerate(points, start=1)
+        ],
+    }
+
+
+# =========================
+# SVG-ГРАФИКИ, НАРИСОВАННЫЕ НА СЕРВЕРЕ
+# =========================
+# адрес картинки содержит версию данных: по одному адресу содержимое
+# не меняется, поэтому браузер может хранить его сколько угодно
+CHART_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def chart_query(version, date_from=None, date_to=None):
+    params = {}
     if date_from and date_to:
-        days_qs = days_qs.filter(date__range=[date_from, date_to])
+        params.update(date_from=date_from.isoformat(), date_to=date_to.isoformat())
+    params['v'] = version
+    return urlencode(params)
 
-    days = list(days_qs.order_by('date'))
 
-    # ---------- СРЕДНИЕ ----------
-    averages = days_qs.aggregate(
-        avg_productivity=Avg('productivity'),
-        avg_mood=Avg('mood'),
-        avg_fatigue=Avg('fatigue'),
+def get_chart_size(request, kind):
+    width, height = charts.SIZES[kind]
+    try:
+        width = int(request.GET.get('width') or width)
+        height = int(request.GET.get('height') or height)
+    except ValueError:
+        pass
+    return (
+        min(max(width, charts.MIN_SIZE), charts.MAX_SIZE),
+        min(max(height, charts.MIN_SIZE), charts.MAX_SIZE),
     )
 
-    # ---------- ВЛИЯНИЕ НАСТРОЕНИЯ ----------
-    mood_stats = (
-        days_qs
-        .values('mood')
-        .annotate(avg_productivity=Avg('productivity'))
-        .order_by('mood')
+
+def analytics_chart(request, kind):
+    if kind not in charts.KINDS:
+        raise Http404('Неизвестный вид графика')
+
+    date_from, date_to = get_date_range(request)
+    user_id = get_owner_id(request)
+
+    # устаревшая или пропущенная версия — перенаправление на актуальный адрес
+    version = str(request_version(request))
+    if request.GET.get('v') != version:
+        query = request.GET.copy()
+        query['v'] = version
+        response = redirect(f'{request.path}?{query.urlencode()}')
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    names = [name for name in request.GET.getlist('series') if name in charts.SERIES]
+    names = names or list(charts.SERIES)
+    if kind == charts.KIND_SPARKLINE:
+        names = names[:1]
+    width, height = get_chart_size(request, kind)
+
+    svg = cache.response_cache.get_or_compute(
+        'chart', date_from, date_to,
+        lambda: chart_svg(kind, names, width, height, date_from, date_to, user_id),
+        extra=f'{kind}:{",".join(names)}:{width}x{height}',
+        user_id=user_id,
+        version=request_version(request),
     )
+    response = HttpResponse(svg, content_type='image/svg+xml')
+    patch_cache_control(response, private=True, max_age=CHART_MAX_AGE, immutable=True)
+    return response
 
-    # ---------- ВЛИЯНИЕ УСТАЛОСТИ ----------
-    fatigue_stats = (
-        days_qs
-        .values('fatigue')
-        .annotate(avg_productivity=Avg('productivity'))
-        .order_by('fatigue')
+
+def chart_svg(kind, names, width, height, date_from=None, date_to=None, user_id=None):
+    # двух пикселей на точку хватает для линии; длинные диапазоны
+    # читаются из понедельных и помесячных метрик, а не из всех дней
+    payload = analytics_payload(
+        None, date_from, date_to, max(MIN_POINTS, width // 2), downsample.METHOD_CALENDAR, user_id
     )
+    if kind == charts.KIND_SPARKLINE:
+        return charts.sparkline(payload[names[0]], names[0], width, height)
+    return charts.chart(payload['dates'], {name: payload[name] for name in names}, width, height)
+
+
+# =========================
+# ПОЛНОТЕКСТОВЫЙ ПОИСК ПО КОММЕНТАРИЯМ
+# =========================
+SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
 
-    # ---------- РЕКОМЕНДАЦИИ ----------
-    recommendations = generate_recommendations(days)
+@cache_control(no_cache=True)
+@condition(etag_func=analytics_etag, last_modified_func=analytics_last_modified)
+def search_study_days(request):
+    expression = fulltext.match_expression(request.GET.get('q', ''))
+    if expression is None:
+        return JsonResponse({'error': 'Укажите слова для поиска в параметре q'}, status=400)
 
-    return render(
-        request,
-        'tracker/study_days_list.html',
+    try:
+        limit = int(request.GET.get('limit') or SEARCH_LIMIT)
+    except ValueError:
+        return JsonResponse({'error': 'limit должен быть числом'}, status=400)
+    limit = min(max(limit, 1), MAX_SEARCH_LIMIT)
+
+    date_from, date_to = get_date_range(request)
+    user_id = get_owner_id(request)
+
+    payload = cache.response_cache.get_or_compute(
+        'search', date_from, date_to,
+        lambda: search_payload(expression, limit, date_from, date_to, user_id),
+        extra=f'{expression}:{limit}',
+        user_id=user_id,
+        version=request_version(request),
+    )
+    return JsonResponse(payload)
+
+
+def search_payload(expression, limit, date_from=None, date_to=None, user_id=None):
+    bounds = fulltext.id_bounds(user_id, date_from, date_to)
+    if date_from and date_to and bounds is None:
+        matches, totals, distribution = [], (0, 0, 0, 0), dict.fromkeys(range(1, 6), 0)
+    else:
+        matches = fulltext.ranked_matches(expression, user_id, date_from, date_to, limit, bounds)
+        totals, distribution = fulltext.facets(expression, user_id, date_from, date_to, bounds)
+
+    # для сравнения — средние по всем дням диапазона из готовых метрик
+    overall = rollups.range_averages(date_from, date_to, user_id)
+
+    return {
+        'query': expression,
+        'results': [
+            {
+                'date': day.date.isoformat(),
+                'mood': day.mood,
+                'fatigue': day.fatigue,
+                'productivity': day.productivity,
+                'snippet': fulltext.highlight(day.snippet),
+                'score': round(-day.rank, 3),
+            }
+            for day in matches
+        ],
+        'facets': {
+            'days': totals[0],
+            **rollups.averages(totals),
+            'productivity': distribution,
+            'overall_avg_productivity': overall['avg_productivity'],
+        },
+    }
+
+
+# =========================
+# ПОСТРАНИЧНАЯ ВЫДАЧА ДНЕЙ (КУРСОР ПО (date, id))
+# =========================
+@cache_control(no_cache=True)
+@condition(etag_func=analytics_etag, last_modified_func=analytics_last_modified)
+def study_days_page(request):
+    date_from, date_to = get_date_range(request)
+
+    try:
+        limit = int(request.GET.get('limit') or pagination.PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({'error': 'limit должен быть числом'}, status=400)
+    limit = min(max(limit, 1), pagination.MAX_PAGE_SIZE)
+
+    try:
+        rows, next_cursor = pagination.keyset_page(
+            filtered_days(date_from, date_to, get_owner_id(request)),
+            request.GET.get('cursor'),
+            limit,
+        )
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    return JsonResponse(pagination.page_payload(rows, next_cursor))
+
+
+# =========================
+# АСИНХРОННАЯ СВОДКА (ASGI)
+# =========================
+# Под ASGI (uvicorn config.asgi:application) представление не занимает поток
+# воркера на время запросов к БД; под WSGI Django выполняет его в своём
+# цикле событий, так что оба режима работают с одним и тем же URL.
+RECENT_DAYS = 7
+
+
+async def analytics_summary(request):
+    date_from, date_to = get_date_range(request)
+    # request.user загружается лениво и синхронно
+    user_id = await sync_to_async(get_owner_id)(request)
+    days_qs = filtered_days(date_from, date_to, user_id)
+
+    totals, scores, recent = await asyncio.gather(
+        rollups.arange_totals(date_from, date_to, user_id),
+        cube.arange_cube(date_from, date_to, user_id),
+        arecent_days(days_qs),
+    )
+
+    return JsonResponse({
+        'days': totals[0],
+        **rollups.averages(totals),
+        # влияние факторов — из куба оценок за O(месяцев), а не GROUP BY по дням
+        'mood_stats': cube.impact(scores, 'mood'),
+        'fatigue_stats': cube.impact(scores, 'fatigue'),
+        'recent': recent,
+    })
+
+
+async def arecent_days(days_qs):
+    rows = days_qs.order_by('-date').values_list(
+        'date', 'mood', 'fatigue', 'productivity'
+    )[:RECENT_DAYS]
+    return [
         {
-            'days': days,
-            'form': form,
-            'averages': averages,
-            'mood_stats': mood_stats,
-            'fatigue_stats': fatigue_stats,
-            'recommendations': recommendations,
+            'date': day.strftime('%Y-%m-%d'),
+            'mood': mood,
+            'fatigue': fatigue,
+            'productivity': productivity,
         }
+        async for day, mood, fatigue, productivity in rows
+    ]
+
+
+# =========================
+# АСИНХРОННЫЕ ДАШБОРД И ДАННЫЕ ГРАФИКОВ (ASGI)
+# =========================
+# Те же страница и JSON, что study_days_list и analytics_data, и те же
+# записи кэша ответов. Независимые запросы идут через asyncio.gather;
+# то, что по-прежнему синхронно (рендер шаблона, сохранение рекомендаций,
+# ряды по периодам из метрик), выполняется через sync_to_async.
+def aconditional(view):
+    """
+    @cache_control(no_cache=True) и @condition(analytics_etag, analytics_last_modified)
+    для асинхронных представлений: декораторы Django 4.2 их не оборачивают.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user_id = await sync_to_async(get_owner_id)(request)
+        request._data_version = await cache.adata_version(user_id)
+        etag = quote_etag(cache.make_etag(request._data_version, user_id, sorted(request.GET.lists())))
+        # Last-Modified — секунды версии, как у version_datetime
+        last_modified = request._data_version // 1000
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = await view(request, user_id, *args, **kwargs)
+        if request.method in ('GET', 'HEAD'):
+            response.headers.setdefault('ETag', etag)
+            response.headers.setdefault('Last-Modified', http_date(last_modified))
+        patch_cache_control(response, no_cache=True)
+        return response
+    return wrapper
+
+
+async def astudy_days_list(request):
+    # сохранение дня — синхронный путь: форма, сигналы и транзакция те же
+    if request.method == 'POST':
+        return await sync_to_async(study_days_list)(request)
+
+    date_from, date_to = get_date_range(request)
+    user_id = await sync_to_async(get_owner_id)(request)
+    # версии читаются до данных, как в study_days_list
+    versions = await cache.aowner_versions(user_id)
+    version = versions[cache.SCOPE_DATA]
+
+    context = await cache.response_cache.aget_or_compute(
+        'dashboard', date_from, date_to,
+        lambda: adashboard_context(date_from, date_to, user_id),
+        version,
+        extra=cache.recommendations_version(versions),
+        user_id=user_id,
+    )
+
+    # шаблон обращается к request.user (контекстный процессор auth) — рендер в потоке
+    with metrics.time_template('tracker/study_days_list.html'):
+        return await sync_to_async(render)(
+            request,
+            'tracker/study_days_list.html',
+            {
+                **fragment_context(context, versions, date_from, date_to, user_id),
+                'form': StudyDayForm(),
+                'chart_query': chart_query(version, date_from, date_to),
+            }
+        )
+
+
+async def adashboard_context(date_from=None, date_to=None, user_id=None):
+    days_qs = filtered_days(date_from, date_to, user_id)
+
+    totals, scores, page, recommendations = await asyncio.gather(
+        rollups.arange_totals(date_from, date_to, user_id),
+        cube.arange_cube(date_from, date_to, user_id),
+        pagination.akeyset_page(days_qs),
+        arecommendations(days_qs, date_from, date_to, user_id),
     )
+    return dashboard_result(totals, scores, page, recommendations)
+
+
+async def arecommendations(days_qs, date_from=None, date_to=None, user_id=None):
+    # чтение сохранённых и, если нужно, пересчёт с записью — синхронный код
+    with metrics.time_recommendations():
+        return await sync_to_async(get_recommendations)(days_qs, date_from, date_to, user_id)
+
+
+@aconditional
+async def aanalytics_data(request, user_id):
+    date_from, date_to = get_date_range(request)
+
+    period = request.GET.get('period')
+    if period not in (StudyMetric.PERIOD_WEEK, StudyMetric.PERIOD_MONTH):
+        period = None
+
+    if request.GET.get('format') == 'columnar' and not period:
+        return StreamingHttpResponse(
+            streaming.astream_queryset(filtered_days(date_from, date_to, user_id)),
+            content_type='application/json',
+        )
+
+    max_points = get_max_points(request)
+    method = request.GET.get('downsample')
+    if method not in downsample.METHODS:
+        method = downsample.METHOD_LTTB
+
+    payload = await cache.response_cache.aget_or_compute(
+        'analytics', date_from, date_to,
+        lambda: aanalytics_payload(period, date_from, date_to, max_points, method, user_id),
+        request._data_version,
+        extra=f'{period}:{max_points}:{method}',
+        user_id=user_id,
+    )
+    return JsonResponse(payload)
+
+
+async def aanalytics_payload(period=None, date_from=None, date_to=None, max_points=None, method=None,
+                             user_id=None):
+    # ряды по периодам и календарное прореживание собираются из метрик
+    # несколькими зависимыми запросами — их считает синхронная версия
+    if period or (max_points and method == downsample.METHOD_CALENDAR):
+        return await sync_to_async(analytics_payload)(
+            period, date_from, date_to, max_points, method, user_id
+        )
+
+    days = [row async for row in chart_rows(filtered_days(date_from, date_to, user_id))]
+    return days_payload(days, max_points)
 
 
 # =========================
-# РЕКОМЕНДАТЕЛЬНАЯ СИСТЕМА
+# ЖИВЫЕ ОБНОВЛЕНИЯ (SSE, только под ASGI)
 # =========================
-def generate_recommendations(days):
-    recommendations = []
+async def live_events(request):
+    # под WSGI поток занял бы поток воркера навсегда; 204 говорит EventSource
+    # не переподключаться — страница работает как раньше, без живых обновлений
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
 
-    if not days:
-        return [{
-            'type': 'info',
-            'icon': 'ℹ️',
-            'text': 'Недостаточно данных для формирования рекомендаций.'
-        }]
+    try:
+        after_id = request.headers.get('Last-Event-ID') or request.GET.get('after')
+        after_id = int(after_id) if after_id else None
+        since = int(request.GET['since']) if request.GET.get('since') else None
+    except ValueError:
+        return JsonResponse({'error': 'after и since должны быть числами'}, status=400)
 
-    moods = [d.mood for d in days]
-    fatigues = [d.fatigue for d in days]
-    productivities = [d.productivity for d in days]
+    user_id = await sync_to_async(get_owner_id)(request)
+    subscriber = await live.broker.subscribe(user_id, after_id=after_id, since=since)
 
-    avg_mood = sum(moods) / len(moods)
-    avg_fatigue = sum(fatigues) / len(fatigues)
-    avg_productivity = sum(productivities) / len(productivities)
+    response = StreamingHttpResponse(
+        live.stream(subscriber, request.scope.get('tracker.receive')),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # nginx и другие прокси не должны копить события в буфере
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
-    # =========================
-    # ОБЩАЯ ОЦЕНКА СОСТОЯНИЯ
-    # =========================
-    if avg_productivity >= 4:
-        recommendations.append({
-            'type': 'success',
-            'icon': '🟢',
-            'text': (
-                "В целом наблюдается высокий уровень учебной продуктивности. "
-                "Текущий учебный режим можно считать эффективным."
-            )
-        })
-    elif avg_productivity <= 2.5:
-        recommendations.append({
-            'type': 'danger',
-            'icon': '🔴',
-            'text': (
-                "Средний уровень учебной продуктивности находится на низком уровне. "
-                "Рекомендуется пересмотреть организацию учебного процесса."
-            )
-        })
-    else:
-        recommendations.append({
-            'type': 'info',
-            'icon': '🔵',
-            'text': (
-                "Учебная продуктивность находится на среднем уровне. "
-                "Существует потенциал для её повышения."
-            )
-        })
 
-    # =========================
-    # НАСТРОЕНИЕ + ПРОДУКТИВНОСТЬ
-    # =========================
-    if avg_mood >= 4 and avg_productivity < 3.5:
-        recommendations.append({
-            'type': 'warning',
-            'icon': '🟡',
-            'text': (
-                "Несмотря на положительное эмоциональное состояние, уровень продуктивности остаётся невысоким. "
-                "Возможно, проблема связана с планированием или отвлекающими факторами."
-            )
-        })
+# =========================
+# СВОДКА ПО ВСЕМ ПОЛЬЗОВАТЕЛЯМ
+# =========================
+@staff_member_required
+def cohort_analytics(request):
+    date_from, date_to = get_date_range(request)
 
-    if avg_mood >= 4 and avg_productivity >= 4:
-        recommendations.append({
-            'type': 'success',
-            'icon': '✨',
-            'text': (
-                "Положительное настроение способствует высокой учебной эффективности. "
-                "Рекомендуется планировать сложные задачи на такие периоды."
-            )
-        })
+    payload = cache.response_cache.get_or_compute(
+        'cohort', date_from, date_to,
+        lambda: cohort_payload(date_from, date_to),
+        user_id=cache.ALL_USERS,
+    )
+    return JsonResponse(payload)
 
-    # =========================
-    # УСТАЛОСТЬ + ПРОДУКТИВНОСТЬ
-    # =========================
-    if avg_fatigue >= 4 and avg_productivity >= 3:
-        recommendations.append({
-            'type': 'warning',
-            'icon': '⚠️',
-            'text': (
-                "Высокая усталость сочетается с сохранением продуктивности. "
-                "Это может указывать на риск переутомления."
-            )
-        })
 
-    if avg_fatigue >= 4 and avg_productivity < 3:
-        recommendations.append({
-            'type': 'danger',
-            'icon': '😴',
-            'text': (
-                "Повышенная усталость негативно влияет на учебную эффективность. "
-                "Рекомендуется сократить нагрузку и уделить внимание восстановлению."
-            )
-        })
+def cohort_payload(date_from=None, date_to=None):
+    rows = rollups.cohort_totals(date_from, date_to)
+    users = dict(
+        get_user_model().objects.filter(pk__in=[row[0] for row in rows if row[0]])
+        .values_list('pk', 'username')
+    )
 
-    # =========================
-    # АНАЛИЗ ДИНАМИКИ
-    # =========================
-    if len(productivities) >= 4:
-        last = productivities[-4:]
-
-        if last == sorted(last):
-            recommendations.append({
-                'type': 'success',
-                'icon': '📈',
-                'text': (
-                    "Отмечается положительная динамика учебной продуктивности за последние дни. "
-                    "Текущий подход к обучению даёт хорошие результаты."
-                )
-            })
-
-        if last == sorted(last, reverse=True):
-            recommendations.append({
-                'type': 'danger',
-                'icon': '📉',
-                'text': (
-                    "Наблюдается устойчивая тенденция к снижению продуктивности. "
-                    "Рекомендуется скорректировать учебный режим."
-                )
-            })
-
-    # =========================
-    # НЕСТАБИЛЬНОСТЬ
-    # =========================
-    if max(productivities) - min(productivities) >= 3:
-        recommendations.append({
-            'type': 'info',
-            'icon': '🔄',
-            'text': (
-                "Учебная продуктивность характеризуется резкими колебаниями. "
-                "Рекомендуется стабилизировать расписание и нагрузку."
-            )
+    total = [0, 0, 0, 0]
+    per_user = []
+    for user_id, count, mood, fatigue, productivity in rows:
+        for i, value in enumerate((count, mood, fatigue, productivity)):
+            total[i] += value
+        per_user.append({
+            'user': users.get(user_id),
+            'days': count,
+            'avg_mood': round(mood / count, 2),
+            'avg_fatigue': round(fatigue / count, 2),
+            'avg_productivity': round(productivity / count, 2),
         })
 
-    return recommendations
+    count, mood, fatigue, productivity = total
+    return {
+        'users': len(per_user),
+        'days': count,
+        'avg_mood': round(mood / count, 2) if count else None,
+        'avg_fatigue': round(fatigue / count, 2) if count else None,
+        'avg_productivity': round(productivity / count, 2) if count else None,
+        'per_user': per_user,
+    }
+
 
 # =========================
-# API ДЛЯ CHART.JS
+# ИМПОРТ ИСТОРИИ (CSV / JSONL)
 # =========================
-def analytics_data(request):
-    days_qs = StudyDay.objects.all()
+@require_POST
+def import_study_days(request):
+    upload = request.FILES.get('file')
+    if upload is None:
+        return JsonResponse({'error': 'Файл не передан'}, status=400)
 
-    date_from = request.GET.get('date_from')
-    date_to = request.GET.get('date_to')
+    fmt = request.POST.get('format') or importer.detect_format(upload.name)
+    if fmt not in importer.FORMATS:
+        return JsonResponse({'error': f'Неизвестный формат: {fmt}'}, status=400)
 
-    if date_from and date_to:
-        days_qs = days_qs.filter(date__range=[date_from, date_to])
+    try:
+        batch_size = max(1, int(request.POST.get('batch_size') or 1000))
+    except ValueError:
+        return JsonResponse({'error': 'batch_size должен быть числом'}, status=400)
 
-    days = list(days_qs.order_by('date'))
+    upload.seek(0)
+    stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+    try:
+        report = importer.import_stream(
+            stream,
+            fmt,
+            batch_size=batch_size,
+            upsert=request.POST.get('upsert') in ('1', 'true', 'on'),
+            user_id=get_owner_id(request),
+        )
+    except UnicodeDecodeError:
+        return JsonResponse({'error': 'Файл должен быть в кодировке UTF-8'}, status=400)
+    finally:
+        stream.detach()
 
-    return JsonResponse({
-        'dates': [d.date.strftime('%Y-%m-%d') for d in days],
-        'mood': [d.mood for d in days],
-        'fatigue': [d.fatigue for d in days],
-        'productivity': [d.productivity for d in days],
-    })
\ No newline at end of file
+    return JsonResponse(report.as_dict())
+
+
+# =========================
+# ВЫГРУЗКА (CSV / JSONL / КОЛОНОЧНЫЙ ФОРМАТ)
+# =========================
+def export_study_days(request):
+    date_from, date_to = get_date_range(request)
+
+    fmt = request.GET.get('format', exporter.FORMAT_CSV)
+    dataset = request.GET.get('dataset', exporter.DATASET_DAYS)
+    if fmt not in exporter.FORMATS or dataset not in exporter.DATASETS:
+        return JsonResponse({'error': 'Неизвестный формат или набор данных'}, status=400)
+
+    try:
+        chunks = exporter.export_chunks(
+            fmt, dataset, date_from, date_to, user_id=get_owner_id(request)
+        )
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    response = StreamingHttpResponse(chunks, content_type=exporter.CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = (
+        f'attachment; filename="{dataset}.{exporter.EXTENSIONS[fmt]}"'
+    )
+    return response
+
+
+# =========================
+# МЕТРИКИ ДЛЯ PROMETHEUS
+# =========================
+def metrics_allowed(request):
+    # персонал, сборщик с токеном или адрес из списка; остальным — 403
+    if request.user.is_staff:
+        return True
+    token = getattr(settings, 'TRACKER_METRICS_TOKEN', '')
+    if token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    return request.META.get('REMOTE_ADDR') in getattr(settings, 'TRACKER_METRICS_ALLOWED_IPS', ())
+
+
+def metrics_view(request):
+    # имена представлений, число запросов и задержки не для посторонних
+    if not metrics_allowed(request):
+        raise PermissionDenied
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')